@@ -0,0 +1,125 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compares the process_incoming_txns messages pubsub enqueues, encoded with
+pickle (the former dramatiq encoder, shipping deserialized metadata) and with
+the compact message encoder (raw metadata, deserialized on first read).
+
+    $ pipenv run python -m benchmarks.dramatiq_codec --messages 20000 --events 10
+
+Messages/sec covers building the events and encoding them in pubsub, and
+decoding them and reading their metadata in the worker. With --redis the messages are also written to
+REDIS_HOST:REDIS_PORT, and the Redis memory used by each encoding is printed.
+"""
+
+import argparse
+import os
+import time
+import typing
+
+import dramatiq
+from diem import txnmetadata
+from pubsub.types import LRWPubSubEvent
+from wallet.background_tasks.background import process_incoming_txns
+from wallet.encoder import CompactEncoder
+
+
+class FormerEvent:
+    """LRWPubSubEvent as it was pickled: metadata deserialized by pubsub"""
+
+    def __init__(self, event: LRWPubSubEvent) -> None:
+        self.sender = event.sender
+        self.receiver = event.receiver
+        self.amount = event.amount
+        self.currency = event.currency
+        self.version = event.version
+        self.sequence = event.sequence
+        self.metadata = event.metadata
+
+
+def events(count: int) -> typing.List[LRWPubSubEvent]:
+    return [
+        LRWPubSubEvent(
+            sender="f72589b71ff4f8d139674a3f7369c69b",
+            receiver="c513562a07b06203acfe83b956ddaef4",
+            amount=1_000_000 + i,
+            currency="XUS",
+            metadata=txnmetadata.general_metadata(
+                bytes.fromhex("8e298f642d08d1af"), bytes.fromhex("f4cd2d8a18cfd8a1")
+            ),
+            version=1_000 + i,
+            sequence=i,
+        )
+        for i in range(count)
+    ]
+
+
+def measure(
+    title,
+    encoder: dramatiq.Encoder,
+    make_message: typing.Callable[[], dramatiq.Message],
+    messages: int,
+    redis_client,
+) -> None:
+    start = time.perf_counter()
+    encoded = [encoder.encode(make_message().asdict()) for _ in range(messages)]
+    for data in encoded:
+        for event in encoder.decode(data)["args"][0]:
+            event.metadata
+    elapsed = time.perf_counter() - start
+
+    size = sum(len(data) for data in encoded) / len(encoded)
+    print(
+        f"{title:<10} {messages / elapsed:>12,.0f} messages/sec"
+        f" {size:>10,.0f} bytes/message"
+    )
+
+    if redis_client is not None:
+        key = f"lrw:benchmark:{title}"
+        redis_client.delete(key)
+        before = redis_client.info("memory")["used_memory"]
+        for start in range(0, len(encoded), 1000):
+            redis_client.rpush(key, *encoded[start : start + 1000])
+        used = redis_client.info("memory")["used_memory"] - before
+        redis_client.delete(key)
+        print(f"{'':<10} {used / 1024 / 1024:>12,.1f} MiB in Redis")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--events", type=int, default=10)
+    parser.add_argument("--redis", action="store_true")
+    args = parser.parse_args()
+
+    redis_client = None
+    if args.redis:
+        import redis
+
+        redis_client = redis.StrictRedis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", 6379)),
+        )
+
+    print(f"{args.messages} messages of {args.events} events")
+    measure(
+        "pickle",
+        dramatiq.PickleEncoder(),
+        lambda: process_incoming_txns.message(
+            [FormerEvent(event) for event in events(args.events)]
+        ),
+        args.messages,
+        redis_client,
+    )
+    measure(
+        "compact",
+        CompactEncoder(),
+        lambda: process_incoming_txns.message(events(args.events)),
+        args.messages,
+        redis_client,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compares sorting an account history by fiat amount with a Decimal valuation per
+transaction (the former account service sort key) and with the integer
+fixed-point key of the fiat rate snapshot.
+
+    $ pipenv run python -m benchmarks.fiat_sort --transactions 500000
+
+Rates are fixed, no liquidity provider is needed. The DB-side first page query
+drops and re-creates all tables in BENCHMARK_DB_URL
+(default: sqlite:////tmp/lrw_benchmark.db).
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime
+
+os.environ["DB_URL"] = os.getenv("BENCHMARK_DB_URL", "sqlite:////tmp/lrw_benchmark.db")
+
+from diem_utils.precise_amount import Amount  # noqa: E402
+from diem_utils.types.currencies import DiemCurrency, FiatCurrency  # noqa: E402
+from wallet.services import account as account_service  # noqa: E402
+from wallet.services.account import FiatRateSnapshot  # noqa: E402
+from wallet.storage import Account, Base, Transaction, db_session, engine  # noqa: E402
+from wallet.types import (  # noqa: E402
+    TransactionSortOption,
+    TransactionStatus,
+    TransactionType,
+)
+
+ACCOUNT_ID = 1
+XUS_JPY = 107_500_000
+
+
+def seed(transactions: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    random.seed(0)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": f"tx-{i}",
+            "type": TransactionType.INTERNAL.value,
+            "amount": random.randrange(1, 10 ** 12),
+            "currency": DiemCurrency.XUS.value,
+            "status": TransactionStatus.COMPLETED.value,
+            "destination_id": ACCOUNT_ID,
+            "created_timestamp": now,
+        }
+        for i in range(transactions)
+    ]
+    with engine.begin() as connection:
+        connection.execute(
+            Account.__table__.insert(), [{"id": ACCOUNT_ID, "name": "benchmark"}]
+        )
+        for start in range(0, len(rows), 50_000):
+            connection.execute(
+                Transaction.__table__.insert(), rows[start : start + 50_000]
+            )
+
+    return [(row["amount"], row["currency"]) for row in rows]
+
+
+def decimal_sort(transactions, rates):
+    def tx_fiat_amount(tx):
+        rate = rates[f"{tx[1]}_{FiatCurrency.JPY.value}"]
+        tx_amount = Amount().deserialize(tx[0])
+        fiat_amount = rate * tx_amount
+        return fiat_amount.serialize()
+
+    return sorted(transactions, key=tx_fiat_amount, reverse=True)
+
+
+def fixed_point_sort(transactions, snapshot: FiatRateSnapshot):
+    return sorted(
+        transactions, key=lambda tx: snapshot.fiat_amount_key(*tx), reverse=True
+    )
+
+
+def db_first_page(snapshot: FiatRateSnapshot):
+    return account_service.get_account_transactions(
+        account_id=ACCOUNT_ID,
+        sort=TransactionSortOption.FIAT_AMOUNT_DESC,
+        limit=50,
+        rates=snapshot,
+    )
+
+
+def measure(title, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{title:<28} {elapsed:>10.3f}s")
+    db_session.remove()
+    return elapsed, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transactions", type=int, default=500_000)
+    args = parser.parse_args()
+
+    print(f"seeding {args.transactions} transactions into {os.environ['DB_URL']}")
+    transactions = seed(args.transactions)
+
+    decimal_rates = {
+        f"{DiemCurrency.XUS.value}_{FiatCurrency.JPY.value}": Amount().deserialize(
+            XUS_JPY
+        )
+    }
+    snapshot = FiatRateSnapshot(
+        fiat_currency=FiatCurrency.JPY, rates={DiemCurrency.XUS.value: XUS_JPY}
+    )
+
+    decimal, by_decimal = measure(
+        "decimal key sort", decimal_sort, transactions, decimal_rates
+    )
+    fixed, by_fixed = measure(
+        "fixed-point key sort", fixed_point_sort, transactions, snapshot
+    )
+    assert [tx[0] for tx in by_decimal] == [tx[0] for tx in by_fixed]
+    measure("DB first page (limit 50)", db_first_page, snapshot)
+    print(f"in-memory speedup x{decimal / fixed:.1f}")
+
+
+if __name__ == "__main__":
+    main()
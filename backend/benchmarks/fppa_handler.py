@@ -0,0 +1,152 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Measures the overhead of handle_fund_pull_pre_approval_command: the role
+reducer alone, as the former dict lookup on an FppaState and as the compiled
+role table, then whole inbound funds pull pre-approval requests from another
+VASP, new ones and updates of existing ones.
+
+    $ pipenv run python -m benchmarks.fppa_handler --calls 1000000 --commands 500
+
+It needs the same environment as the web app (VASP_ADDR, ...), the biller
+account lookup on chain is stubbed. The benchmark drops and re-creates all
+tables in BENCHMARK_DB_URL (default: sqlite:////tmp/lrw_benchmark.db).
+"""
+
+import argparse
+import os
+import time
+import typing
+from dataclasses import asdict
+
+os.environ["DB_URL"] = os.getenv("BENCHMARK_DB_URL", "sqlite:////tmp/lrw_benchmark.db")
+
+import context  # noqa: E402
+import offchain  # noqa: E402
+from diem import LocalAccount, identifier  # noqa: E402
+from diem_utils.types.currencies import FiatCurrency  # noqa: E402
+from offchain import FundPullPreApprovalStatus  # noqa: E402
+from wallet.services.account import generate_new_subaddress  # noqa: E402
+from wallet.services.offchain.fund_pull_pre_approval import (  # noqa: E402
+    handle_fund_pull_pre_approval_command,
+)
+from wallet.services.offchain.fund_pull_pre_approval_sm import (  # noqa: E402
+    FppaState,
+    all_possible_states,
+    build_role_reducer,
+    reduce_role,
+)
+from wallet.storage import Account, Base, User, db_session, engine  # noqa: E402
+from wallet.types import RegistrationStatus  # noqa: E402
+
+
+def measure(title: str, run: typing.Callable[[], int]) -> None:
+    start = time.perf_counter()
+    calls = run()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{title:<20} {calls / elapsed:>12,.0f} calls/sec"
+        f" {elapsed / calls * 1_000_000:>10.2f} us/call"
+    )
+
+
+def reduce_states(reducer, states, calls: int) -> int:
+    done = 0
+    while done < calls:
+        for state in states:
+            try:
+                reducer(state)
+            except Exception:
+                pass
+        done += len(states)
+    return done
+
+
+def seed_payer_address() -> str:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    user = User(
+        username="benchmark",
+        registration_status=RegistrationStatus.Approved,
+        selected_fiat_currency=FiatCurrency.USD,
+        selected_language="en",
+        password_salt="123",
+        password_hash="deadbeef",
+    )
+    user.account = Account(name="benchmark")
+    db_session.add(user)
+    db_session.commit()
+
+    return identifier.encode_account(
+        context.get().config.vasp_address,
+        generate_new_subaddress(user.account_id),
+        context.get().config.diem_address_hrp(),
+    )
+
+
+def new_command(
+    payer_address: str, biller_address: str, fppa_id: str
+) -> offchain.FundsPullPreApprovalCommand:
+    return offchain.FundsPullPreApprovalCommand(
+        my_actor_address=payer_address,
+        funds_pull_pre_approval=offchain.FundPullPreApprovalObject(
+            funds_pull_pre_approval_id=fppa_id,
+            address=payer_address,
+            biller_address=biller_address,
+            scope=offchain.FundPullPreApprovalScopeObject(
+                type=offchain.FundPullPreApprovalType.consent,
+                expiration_timestamp=int(time.time()) + 3600,
+            ),
+            status=FundPullPreApprovalStatus.pending,
+            description="benchmark",
+        ),
+        inbound=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--commands", type=int, default=500)
+    args = parser.parse_args()
+
+    state_args = [asdict(state) for state in all_possible_states()]
+    dict_reducer = build_role_reducer()
+    measure(
+        "dict reducer",
+        lambda: reduce_states(
+            lambda kw: dict_reducer(FppaState(**kw)), state_args, args.calls
+        ),
+    )
+    measure(
+        "role table",
+        lambda: reduce_states(lambda kw: reduce_role(**kw), state_args, args.calls),
+    )
+
+    context.set(context.from_env())
+    context.get().jsonrpc_client.get_account = lambda *_: None
+    payer_address = seed_payer_address()
+    biller_address = identifier.encode_account(
+        LocalAccount.generate().account_address,
+        identifier.gen_subaddress(),
+        context.get().config.diem_address_hrp(),
+    )
+    commands = [
+        new_command(payer_address, biller_address, f"{biller_address}_{i}")
+        for i in range(args.commands)
+    ]
+
+    def handle_all() -> int:
+        for command in commands:
+            handle_fund_pull_pre_approval_command(command)
+        return len(commands)
+
+    measure("handle new", handle_all)
+    measure("handle update", handle_all)
+    db_session.remove()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Measures sending pending funds pull pre-approval commands to counterparty
+VASPs: --commands commands spread over --counterparties VASPs, sent inline one
+after another and in per counterparty batches on the outbound dispatcher.
+
+    $ pipenv run python -m benchmarks.fppa_outbound --commands 1000 --counterparties 10 --latency 0.02
+
+It needs the same environment as the web app (VASP_ADDR, ...). Sending a
+command is stubbed by a --latency seconds sleep, and every --fail-every
+command fails. The benchmark drops and re-creates all tables in
+BENCHMARK_DB_URL (default: sqlite:////tmp/lrw_benchmark.db).
+"""
+
+import argparse
+import os
+import time
+import typing
+from datetime import datetime, timedelta
+
+os.environ["DB_URL"] = os.getenv("BENCHMARK_DB_URL", "sqlite:////tmp/lrw_benchmark.db")
+
+import context  # noqa: E402
+from diem import LocalAccount, identifier  # noqa: E402
+from diem_utils.types.currencies import FiatCurrency  # noqa: E402
+from offchain import FundPullPreApprovalStatus  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from wallet.services.account import generate_new_subaddress  # noqa: E402
+from wallet.services.offchain.dispatcher import OutboundDispatcher  # noqa: E402
+from wallet.services.offchain.fund_pull_pre_approval import (  # noqa: E402
+    Role,
+    process_funds_pull_pre_approvals_requests,
+)
+from wallet.storage import (  # noqa: E402
+    Account,
+    Base,
+    FundsPullPreApprovalCommand,
+    User,
+    db_session,
+    engine,
+    get_commands_by_sent_status,
+)
+from wallet.types import RegistrationStatus  # noqa: E402
+
+
+def seed_commands(commands: int, counterparties: int) -> None:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    user = User(
+        username="benchmark",
+        registration_status=RegistrationStatus.Approved,
+        selected_fiat_currency=FiatCurrency.USD,
+        selected_language="en",
+        password_salt="123",
+        password_hash="deadbeef",
+    )
+    user.account = Account(name="benchmark")
+    db_session.add(user)
+    db_session.commit()
+
+    hrp = context.get().config.diem_address_hrp()
+    address = identifier.encode_account(
+        context.get().config.vasp_address,
+        generate_new_subaddress(user.account_id),
+        hrp,
+    )
+    billers = [
+        identifier.encode_account(LocalAccount.generate().account_address, None, hrp)
+        for _ in range(counterparties)
+    ]
+    for i in range(commands):
+        db_session.add(
+            FundsPullPreApprovalCommand(
+                account_id=user.account_id,
+                address=address,
+                biller_address=billers[i % counterparties],
+                funds_pull_pre_approval_id=f"benchmark-{i}",
+                funds_pull_pre_approval_type="consent",
+                expiration_timestamp=datetime.utcnow() + timedelta(hours=1),
+                description="benchmark",
+                status=FundPullPreApprovalStatus.valid,
+                role=Role.PAYER,
+                offchain_sent=False,
+            )
+        )
+    db_session.commit()
+
+
+def stub_send_command(latency: float, fail_every: int) -> None:
+    def send_command(cmd, *_):
+        time.sleep(latency)
+        fppa_id = cmd.funds_pull_pre_approval.funds_pull_pre_approval_id
+        if fail_every and int(fppa_id.rsplit("-", 1)[1]) % fail_every == 0:
+            raise ValueError("rejected")
+
+    context.get().offchain_client.send_command = send_command
+
+
+def measure(title: str, send: typing.Callable[[], None], commands: int) -> None:
+    FundsPullPreApprovalCommand.query.update({"offchain_sent": False})
+    db_session.commit()
+    updates = []
+
+    def count_updates(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            updates.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_updates)
+    start = time.perf_counter()
+    try:
+        send()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_updates)
+    elapsed = time.perf_counter() - start
+    db_session.remove()
+
+    unsent = len(get_commands_by_sent_status(False))
+    print(
+        f"{title:<12} {(commands - unsent) / elapsed:>10,.0f} commands/sec"
+        f" {unsent:>6} unsent {len(updates):>6} UPDATEs"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=1000)
+    parser.add_argument("--counterparties", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--fail-every", type=int, default=50)
+    args = parser.parse_args()
+
+    context.set(context.from_env())
+    seed_commands(args.commands, args.counterparties)
+    stub_send_command(args.latency, args.fail_every)
+    dispatcher = OutboundDispatcher()
+    print(
+        f"{args.commands} commands, {args.counterparties} counterparties,"
+        f" {dispatcher.workers} workers, {dispatcher.per_destination} per counterparty"
+    )
+
+    measure("inline", process_funds_pull_pre_approvals_requests, args.commands)
+
+    def dispatched() -> None:
+        process_funds_pull_pre_approvals_requests(dispatcher)
+        dispatcher.wait()
+
+    measure("dispatcher", dispatched, args.commands)
+
+
+if __name__ == "__main__":
+    main()
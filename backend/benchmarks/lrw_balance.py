@@ -0,0 +1,122 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compares the wallet-wide balance calculation used by the sync-db job with the
+per-account paginated loop it replaced.
+
+    $ pipenv run python -m benchmarks.lrw_balance --accounts 100000
+
+The benchmark drops and re-creates all tables in BENCHMARK_DB_URL
+(default: sqlite:////tmp/lrw_benchmark.db).
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+
+os.environ["DB_URL"] = os.getenv("BENCHMARK_DB_URL", "sqlite:////tmp/lrw_benchmark.db")
+
+from wallet.services import account as account_service  # noqa: E402
+from wallet.services.system import (
+    calculate_lrw_balance,
+    CURRENCY,
+    PAGE_SIZE,
+)  # noqa: E402
+from wallet.storage import Account, Base, Transaction, db_session, engine  # noqa: E402
+from wallet.types import TransactionStatus, TransactionType  # noqa: E402
+
+VASP_ADDRESS = "c77e1ae3e4a136f070bfcce807747daf"
+OTHER_ADDRESS = "257e50b131150fdb56aeab4ebe4ec2b9"
+
+
+def seed(accounts: int, transactions_per_account: int) -> None:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    now = datetime.utcnow()
+    version = 0
+    with engine.begin() as connection:
+        connection.execute(
+            Account.__table__.insert(),
+            [{"id": i, "name": f"account-{i}"} for i in range(1, accounts + 1)],
+        )
+        rows = []
+        for account_id in range(1, accounts + 1):
+            for i in range(transactions_per_account):
+                version += 1
+                incoming = i % 3 != 2
+                rows.append(
+                    {
+                        "id": f"{account_id}-{i}",
+                        "type": TransactionType.EXTERNAL.value,
+                        "amount": 100 if incoming else 30,
+                        "currency": CURRENCY,
+                        "status": TransactionStatus.COMPLETED.value,
+                        "source_id": None if incoming else account_id,
+                        "source_address": OTHER_ADDRESS if incoming else VASP_ADDRESS,
+                        "destination_id": account_id if incoming else None,
+                        "destination_address": VASP_ADDRESS
+                        if incoming
+                        else OTHER_ADDRESS,
+                        "created_timestamp": now,
+                        "blockchain_version": version,
+                    }
+                )
+            if len(rows) >= 50_000:
+                connection.execute(Transaction.__table__.insert(), rows)
+                rows = []
+        if rows:
+            connection.execute(Transaction.__table__.insert(), rows)
+
+
+def paginated_loop_balance(up_to_version) -> int:
+    # pages are fetched by offset / limit the same way sqlalchemy_paginator does;
+    # the paginator itself is not used because its count query loses the FROM
+    # clause on SQLAlchemy 1.4 and it stops after the first page
+    db_balance = 0
+    offset = 0
+    while True:
+        accounts = Account.query.offset(offset).limit(PAGE_SIZE).all()
+        if not accounts:
+            return db_balance
+
+        for account in accounts:
+            db_balance += account_service.get_account_balance_by_id(
+                account_id=account.id,
+                up_to_version=up_to_version,
+            ).total.get(CURRENCY)
+
+        offset += PAGE_SIZE
+
+
+def measure(title, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{title:<24} {elapsed:>10.3f}s  balance={result}")
+    db_session.remove()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--transactions-per-account", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"seeding {args.accounts} accounts x "
+        f"{args.transactions_per_account} transactions into {os.environ['DB_URL']}"
+    )
+    seed(args.accounts, args.transactions_per_account)
+    up_to_version = args.accounts * args.transactions_per_account
+
+    loop = measure("paginated account loop", paginated_loop_balance, up_to_version)
+    aggregate = measure("aggregate query", calculate_lrw_balance, up_to_version)
+    print(f"speedup x{loop / aggregate:.1f}")
+
+
+if __name__ == "__main__":
+    main()
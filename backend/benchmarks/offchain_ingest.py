@@ -0,0 +1,164 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Load test of the inbound offchain endpoints: --clients threads post signed
+PaymentCommand requests over keep-alive connections, one command per request
+to /offchain/v2/command, then --batch commands per request to
+/offchain/v2/commands, and verified commands/sec is printed.
+
+    $ pipenv run python -m benchmarks.offchain_ingest --commands 5000 --clients 8 --batch 50
+
+It needs the same environment as the web app (VASP_ADDR, ...). The sender
+compliance key lookup and the processing of the commands are stubbed: the
+numbers cover HTTP, JWS verification and decoding. --verify-only skips HTTP
+and compares verifying the commands one by one and on the verify pool.
+"""
+
+import argparse
+import threading
+import time
+import typing
+
+import context
+import offchain
+import requests
+from diem import LocalAccount, identifier
+from wallet.services.offchain import offchain as offchain_service
+from webapp import app
+from werkzeug.serving import make_server
+
+
+def signed_requests(sender: LocalAccount, count: int) -> typing.List[bytes]:
+    hrp = context.get().config.diem_address_hrp()
+    return [
+        offchain.jws.serialize(
+            offchain.PaymentCommand.init(
+                sender_account_id=identifier.encode_account(
+                    sender.account_address, identifier.gen_subaddress(), hrp
+                ),
+                sender_kyc_data=offchain.individual_kyc_data(given_name="Tom"),
+                receiver_account_id=identifier.encode_account(
+                    context.get().config.vasp_address, identifier.gen_subaddress(), hrp
+                ),
+                amount=1_000_000 + i,
+                currency="XUS",
+                inbound=True,
+            ).new_request(),
+            sender.private_key.sign,
+        )
+        for i in range(count)
+    ]
+
+
+def stub_processing(sender: LocalAccount) -> None:
+    client = context.get().offchain_client
+    public_key = sender.private_key.public_key()
+    client.get_base_url_and_compliance_key = lambda *_, **__: ("", public_key)
+
+    def process(request_sender_address, request):
+        return 200, request.cid.encode()
+
+    offchain_service._process_inbound_request = process
+
+
+def measure(title: str, run: typing.Callable[[], int]) -> None:
+    start = time.perf_counter()
+    verified = run()
+    elapsed = time.perf_counter() - start
+    print(f"{title:<12} {verified / elapsed:>10,.0f} verified commands/sec")
+
+
+def post_all(
+    url: str,
+    headers: dict,
+    bodies: typing.List[bytes],
+    clients: int,
+    commands_per_body: int,
+) -> int:
+    verified = []
+
+    def run_client(client_bodies: typing.List[bytes]) -> None:
+        # a keep-alive connection per client
+        with requests.Session() as session:
+            for body in client_bodies:
+                rv = session.post(url, data=body, headers=headers)
+                assert rv.status_code == 200, rv.content
+                verified.append(commands_per_body)
+
+    threads = [
+        threading.Thread(target=run_client, args=(bodies[i::clients],))
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(verified)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--verify-only", action="store_true")
+    args = parser.parse_args()
+
+    context.set(context.from_env())
+    sender = LocalAccount.generate()
+    sender_address = identifier.encode_account(
+        sender.account_address, None, context.get().config.diem_address_hrp()
+    )
+    stub_processing(sender)
+    commands = signed_requests(sender, args.commands)
+    batches = [
+        commands[i : i + args.batch] for i in range(0, len(commands), args.batch)
+    ]
+    print(
+        f"{args.commands} commands, {args.clients} clients, batches of {args.batch},"
+        f" {offchain_service.OFFCHAIN_VERIFY_WORKERS} verify workers"
+    )
+
+    if args.verify_only:
+        measure(
+            "one by one",
+            lambda: sum(
+                len(offchain_service.process_inbound_commands(sender_address, [c]))
+                for c in commands
+            ),
+        )
+        measure(
+            "batched",
+            lambda: sum(
+                len(offchain_service.process_inbound_commands(sender_address, batch))
+                for batch in batches
+            ),
+        )
+        return
+
+    # keep-alive connections, as set up by webapp for `flask run`
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/offchain/v2"
+    headers = {"X-REQUEST-ID": "benchmark", "X-REQUEST-SENDER-ADDRESS": sender_address}
+
+    measure(
+        "one by one",
+        lambda: post_all(f"{base_url}/command", headers, commands, args.clients, 1),
+    )
+    measure(
+        "batched",
+        lambda: post_all(
+            f"{base_url}/commands",
+            headers,
+            [b"\n".join(batch) for batch in batches],
+            args.clients,
+            args.batch,
+        ),
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
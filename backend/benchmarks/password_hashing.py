@@ -0,0 +1,108 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Simulates a login storm: --clients threads verify passwords as fast as they
+can, with the key derivation inline in the request thread and on the password
+hashing worker pool, while another thread serves a cheap request every 10ms.
+
+    $ pipenv run python -m benchmarks.password_hashing --seconds 10 --clients 32
+
+Prints logins/sec, logins/sec per core, the logins rejected by a saturated
+pool, and the latency of the cheap requests during the storm.
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from wallet.services.password import (
+    PASSWORD_HASH_ITERATIONS,
+    PasswordHasher,
+    PasswordHashingBusyError,
+)
+
+PASSWORD = "benchmark-password"
+
+
+def cheap_request() -> None:
+    sum(range(10_000))
+
+
+def measure(title: str, hasher: PasswordHasher, clients: int, seconds: float) -> None:
+    password_hash, salt = hasher.hash(PASSWORD)
+    stop = threading.Event()
+    logins, rejected, latencies = [], [], []
+
+    def login_storm() -> None:
+        while not stop.is_set():
+            try:
+                assert hasher.verify(PASSWORD, password_hash, salt)
+                logins.append(1)
+            except PasswordHashingBusyError:
+                rejected.append(1)
+                # a 503 client backs off before it retries
+                time.sleep(0.1)
+
+    def other_requests() -> None:
+        while not stop.is_set():
+            start = time.perf_counter()
+            cheap_request()
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_storm) for _ in range(clients)]
+    threads.append(threading.Thread(target=other_requests))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    cores = os.cpu_count() or 1
+    latencies.sort()
+    print(
+        f"{title:<8} {len(logins) / seconds:>8,.1f} logins/sec"
+        f" {len(logins) / seconds / cores:>8,.1f} logins/sec/core"
+        f" {len(rejected):>8,} rejected"
+        f" other requests p50 {statistics.median(latencies) * 1000:>6.2f}ms"
+        f" p99 {latencies[int(len(latencies) * 0.99)] * 1000:>6.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--iterations", type=int, default=PASSWORD_HASH_ITERATIONS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue-size", type=int, default=32)
+    args = parser.parse_args()
+
+    print(
+        f"{args.clients} clients, {args.iterations} iterations,"
+        f" {os.cpu_count()} cores, {args.workers} workers"
+    )
+    measure(
+        "inline",
+        PasswordHasher(iterations=args.iterations, workers=0),
+        args.clients,
+        args.seconds,
+    )
+    measure(
+        "pool",
+        PasswordHasher(
+            iterations=args.iterations,
+            workers=args.workers,
+            queue_size=args.queue_size,
+        ),
+        args.clients,
+        args.seconds,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Measures requests/sec of GET /account/transactions with the auth token cache
+on and off.
+
+    $ pipenv run python -m benchmarks.token_cache --requests 2000
+
+It needs the same environment as the web app (VASP_ADDR, WALLET_CUSTODY_ACCOUNT_NAME...).
+The benchmark drops and re-creates all tables in BENCHMARK_DB_URL
+(default: sqlite:////tmp/lrw_benchmark.db).
+"""
+
+import argparse
+import os
+import time
+
+os.environ["DB_URL"] = os.getenv("BENCHMARK_DB_URL", "sqlite:////tmp/lrw_benchmark.db")
+
+import context  # noqa: E402
+from diem_utils.types.currencies import DiemCurrency  # noqa: E402
+from wallet.services import user as user_service  # noqa: E402
+from wallet.services.account import create_account  # noqa: E402
+from wallet.services.token_cache import token_cache  # noqa: E402
+from wallet.storage import (  # noqa: E402
+    Base,
+    add_transaction,
+    db_session,
+    engine,
+    update_user,
+)
+from wallet.types import (  # noqa: E402
+    RegistrationStatus,
+    TransactionStatus,
+    TransactionType,
+)
+from webapp import app  # noqa: E402
+
+
+def seed(transactions: int) -> str:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    user_id = user_service.create_new_user("benchmark", "benchmark-password")
+    update_user(user_id, registration_status=RegistrationStatus.Approved)
+    account = create_account(account_name="benchmark", user_id=user_id)
+    for i in range(transactions):
+        add_transaction(
+            amount=100 + i,
+            currency=DiemCurrency.XUS,
+            payment_type=TransactionType.EXTERNAL,
+            status=TransactionStatus.COMPLETED,
+            destination_id=account.id,
+            source_address="257e50b131150fdb56aeab4ebe4ec2b9",
+            source_subaddress="8e298f642d08d1af",
+            destination_address=os.environ["VASP_ADDR"],
+            destination_subaddress="a4d5bd88ec5be7a8",
+            blockchain_version=i,
+        )
+    return user_service.add_token(user_id)
+
+
+def measure(title: str, client, token: str, requests: int) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    start = time.perf_counter()
+    for _ in range(requests):
+        rv = client.get("/account/transactions", headers=headers)
+        assert rv.status_code == 200, rv.get_json()
+    elapsed = time.perf_counter() - start
+    rate = requests / elapsed
+    print(f"{title:<16} {rate:>10.1f} requests/sec")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--transactions", type=int, default=10)
+    args = parser.parse_args()
+
+    context.set(context.from_env())
+    token = seed(args.transactions)
+
+    with app.test_client() as client:
+        token_cache.enabled = False
+        uncached = measure("cache off", client, token, args.requests)
+        token_cache.enabled = True
+        cached = measure("cache on", client, token, args.requests)
+
+    db_session.remove()
+    print(f"speedup x{cached / uncached:.2f}")
+
+
+if __name__ == "__main__":
+    main()
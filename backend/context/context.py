@@ -3,6 +3,7 @@
 
 import logging
 import time
+import typing
 from dataclasses import dataclass, field
 
 from cryptography.hazmat.primitives.asymmetric.ed25519 import (
@@ -20,9 +21,20 @@ from diem import (
 import offchain
 
 from . import config, stubs
+from .sequence import LocalSequenceAllocator, SequenceAllocator
 
 logger = logging.getLogger(__name__)
 
+TRANSACTION_EXPIRATION_SECS = 30
+# re-signing with a resynced sequence number on SEQUENCE_NUMBER_TOO_OLD
+SUBMIT_ATTEMPTS = 3
+
+BeforeSubmit = typing.Callable[[diem_types.SignedTransaction], None]
+
+
+def is_sequence_number_too_old(e: jsonrpc.JsonRpcError) -> bool:
+    return "SEQUENCE_NUMBER_TOO_OLD" in str(e)
+
 
 @dataclass
 class Context:
@@ -30,6 +42,9 @@ class Context:
     jsonrpc_client: jsonrpc.Client
     custody: stubs.custody.Client
     offchain_client: offchain.Client = field(init=False)
+    sequence_allocator: SequenceAllocator = field(
+        default_factory=LocalSequenceAllocator
+    )
 
     def __post_init__(self) -> None:
         self.offchain_client = offchain.Client(
@@ -41,14 +56,14 @@ class Context:
     # ---- delegate to jsonrpc client start ----
 
     def reset_dual_attestation_info(self):
-        txn = self.create_transaction(
+        txn = self.submit_transaction(
             stdlib.encode_rotate_dual_attestation_info_script(
                 self.config.base_url.encode("UTF-8"),
                 self.config.compliance_public_key_bytes(),
             )
         )
 
-        self._submit_and_wait(txn)
+        self._wait(txn)
 
     def p2p_by_general(
         self,
@@ -58,6 +73,25 @@ class Context:
         receiver_sub_address: str,
         sender_sub_address: str,
     ) -> jsonrpc.Transaction:
+        return self._wait(
+            self.submit_p2p_by_general(
+                currency,
+                amount,
+                receiver_vasp_address,
+                receiver_sub_address,
+                sender_sub_address,
+            )
+        )
+
+    def submit_p2p_by_general(
+        self,
+        currency: str,
+        amount: int,
+        receiver_vasp_address: str,
+        receiver_sub_address: str,
+        sender_sub_address: str,
+        before_submit: typing.Optional[BeforeSubmit] = None,
+    ) -> diem_types.SignedTransaction:
         to_subaddress_bytes = None
         if receiver_sub_address is not None:
             to_subaddress_bytes = bytes.fromhex(receiver_sub_address)
@@ -65,8 +99,8 @@ class Context:
             from_subaddress=bytes.fromhex(sender_sub_address),
             to_subaddress=to_subaddress_bytes,
         )
-        return self._p2p_transfer(
-            currency, amount, receiver_vasp_address, metadata, b""
+        return self._submit_p2p_transfer(
+            currency, amount, receiver_vasp_address, metadata, b"", before_submit
         )
 
     def p2p_by_travel_rule(
@@ -77,8 +111,10 @@ class Context:
         metadata: bytes,
         metadata_signature: bytes,
     ) -> jsonrpc.Transaction:
-        return self._p2p_transfer(
-            currency, amount, receiver_vasp_address, metadata, metadata_signature
+        return self._wait(
+            self._submit_p2p_transfer(
+                currency, amount, receiver_vasp_address, metadata, metadata_signature
+            )
         )
 
     def p2p_by_refund(
@@ -88,16 +124,36 @@ class Context:
         receiver_vasp_address: str,
         original_txn_version: int,
     ) -> jsonrpc.Transaction:
+        return self._wait(
+            self.submit_p2p_by_refund(
+                currency, amount, receiver_vasp_address, original_txn_version
+            )
+        )
+
+    def submit_p2p_by_refund(
+        self,
+        currency: str,
+        amount: int,
+        receiver_vasp_address: str,
+        original_txn_version: int,
+        before_submit: typing.Optional[BeforeSubmit] = None,
+    ) -> diem_types.SignedTransaction:
         metadata = txnmetadata.refund_metadata(
             original_txn_version, diem_types.RefundReason__InvalidSubaddress()
         )
-        return self._p2p_transfer(
-            currency, amount, receiver_vasp_address, metadata, b""
+        return self._submit_p2p_transfer(
+            currency, amount, receiver_vasp_address, metadata, b"", before_submit
         )
 
-    def _p2p_transfer(
-        self, currency, amount, receiver_vasp_address, metadata, signature
-    ) -> jsonrpc.Transaction:
+    def _submit_p2p_transfer(
+        self,
+        currency,
+        amount,
+        receiver_vasp_address,
+        metadata,
+        signature,
+        before_submit: typing.Optional[BeforeSubmit] = None,
+    ) -> diem_types.SignedTransaction:
         script = stdlib.encode_peer_to_peer_with_metadata_script(
             currency=utils.currency_code(currency),
             payee=utils.account_address(receiver_vasp_address),
@@ -106,14 +162,66 @@ class Context:
             metadata_signature=signature,
         )
 
-        txn = self.create_transaction(script)
-        return self._submit_and_wait(txn)
+        return self.submit_transaction(script, before_submit)
 
-    def _submit_and_wait(
-        self, txn: diem_types.SignedTransaction
-    ) -> jsonrpc.Transaction:
-        self.jsonrpc_client.submit(txn)
-        return self.jsonrpc_client.wait_for_transaction(txn, 30)
+    def submit_transaction(
+        self,
+        script: diem_types.Script,
+        before_submit: typing.Optional[BeforeSubmit] = None,
+    ) -> diem_types.SignedTransaction:
+        """
+        Signs the script with a locally reserved sequence number and submits it,
+        without waiting for its execution. before_submit is called with every
+        signed transaction before it is submitted, to record it.
+
+        A transaction rejected on submit raises jsonrpc.JsonRpcError, and its
+        sequence number is released. Any other error leaves the outcome
+        unknown: the transaction may still be executed, until it expires.
+        """
+
+        address = self.config.vasp_account_address().to_hex()
+        for attempt in range(SUBMIT_ATTEMPTS):
+            txn = self.create_transaction(script)
+            if before_submit:
+                before_submit(txn)
+            try:
+                self.jsonrpc_client.submit(txn)
+                return txn
+            except jsonrpc.JsonRpcError as e:
+                if is_sequence_number_too_old(e) and attempt + 1 < SUBMIT_ATTEMPTS:
+                    logger.warning(
+                        f"sequence number {txn.raw_txn.sequence_number} is too old, resync"
+                    )
+                    self.resync_sequence()
+                    continue
+                self.sequence_allocator.release(
+                    address, int(txn.raw_txn.sequence_number)
+                )
+                raise
+
+    def resync_sequence(self) -> int:
+        """Catches the reserved sequence numbers up with the on-chain one"""
+
+        seq = self._chain_sequence()
+        self.sequence_allocator.resync(self.config.vasp_account_address().to_hex(), seq)
+        return seq
+
+    def reset_sequence(self) -> bool:
+        """Reserves from the on-chain sequence number on, after transactions
+        expired without being executed. Returns False, leaving the reserved
+        sequence numbers alone, when one was reserved meanwhile."""
+
+        address = self.config.vasp_account_address().to_hex()
+        # read before the on-chain one, so any reservation in between fails
+        # the reset
+        observed = self.sequence_allocator.peek(address)
+        seq = self._chain_sequence()
+        return self.sequence_allocator.reset(address, seq, observed)
+
+    def _wait(self, txn: diem_types.SignedTransaction) -> jsonrpc.Transaction:
+        return self.jsonrpc_client.wait_for_transaction(
+            txn, TRANSACTION_EXPIRATION_SECS
+        )
 
     # ---- delegate to jsonrpc client end ----
 
@@ -123,7 +231,7 @@ class Context:
         self, script: diem_types.Script
     ) -> diem_types.SignedTransaction:
         address = self.config.vasp_account_address()
-        seq = self.jsonrpc_client.get_account_sequence(address)
+        seq = self.sequence_allocator.reserve(address.to_hex(), self._chain_sequence)
         txn = diem_types.RawTransaction(
             sender=address,
             sequence_number=diem_types.st.uint64(seq),
@@ -131,12 +239,19 @@ class Context:
             max_gas_amount=diem_types.st.uint64(1_000_000),
             gas_unit_price=diem_types.st.uint64(0),
             gas_currency_code=self.config.gas_currency_code,
-            expiration_timestamp_secs=diem_types.st.uint64(int(time.time()) + 30),
+            expiration_timestamp_secs=diem_types.st.uint64(
+                int(time.time()) + TRANSACTION_EXPIRATION_SECS
+            ),
             chain_id=diem_types.ChainId.from_int(self.config.chain_id),
         )
         sig = self.sign(utils.raw_transaction_signing_msg(txn))
         return utils.create_signed_transaction(txn, self.public_key_bytes(), sig)
 
+    def _chain_sequence(self) -> int:
+        return self.jsonrpc_client.get_account_sequence(
+            self.config.vasp_account_address()
+        )
+
     # ---- diem transaction utils end ----
 
     # ---- delegate to custody start ----
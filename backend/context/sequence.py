@@ -0,0 +1,83 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Sequence numbers of the transactions sent from the VASP account, reserved
+locally so several transactions can be in flight without fetching the
+on-chain sequence number before each of them.
+"""
+
+import abc
+import threading
+import typing
+
+
+class SequenceAllocator(abc.ABC):
+    @abc.abstractmethod
+    def reserve(self, address: str, chain_sequence: typing.Callable[[], int]) -> int:
+        """
+        Reserves the next sequence number of the account; chain_sequence gives
+        the on-chain one when none was reserved yet
+        """
+
+    @abc.abstractmethod
+    def resync(self, address: str, chain_sequence: int) -> None:
+        """Catches up with the on-chain sequence number, never goes back"""
+
+    @abc.abstractmethod
+    def peek(self, address: str) -> typing.Optional[int]:
+        """The next sequence number to reserve, None when none was reserved"""
+
+    @abc.abstractmethod
+    def reset(
+        self, address: str, sequence: int, observed: typing.Optional[int]
+    ) -> bool:
+        """
+        Reserves from the given sequence number on, to fill a gap left by
+        transactions that expired. Only when the next sequence number is still
+        the observed one (see peek): a sequence number reserved meanwhile must
+        not be handed out again. Returns whether it was reset.
+        """
+
+    @abc.abstractmethod
+    def release(self, address: str, sequence: int) -> None:
+        """Gives back a sequence number of a transaction rejected on submit,
+        unless a later one was reserved since"""
+
+
+class LocalSequenceAllocator(SequenceAllocator):
+    """Allocator of a single process"""
+
+    def __init__(self) -> None:
+        self._next: typing.Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, address: str, chain_sequence: typing.Callable[[], int]) -> int:
+        with self._lock:
+            seq = self._next.get(address)
+            if seq is None:
+                seq = chain_sequence()
+            self._next[address] = seq + 1
+            return seq
+
+    def resync(self, address: str, chain_sequence: int) -> None:
+        with self._lock:
+            self._next[address] = max(self._next.get(address, 0), chain_sequence)
+
+    def peek(self, address: str) -> typing.Optional[int]:
+        with self._lock:
+            return self._next.get(address)
+
+    def reset(
+        self, address: str, sequence: int, observed: typing.Optional[int]
+    ) -> bool:
+        with self._lock:
+            if self._next.get(address) != observed:
+                return False
+            self._next[address] = sequence
+            return True
+
+    def release(self, address: str, sequence: int) -> None:
+        with self._lock:
+            if self._next.get(address) == sequence + 1:
+                self._next[address] = sequence
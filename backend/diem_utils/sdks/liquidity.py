@@ -4,12 +4,16 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
-from typing import Optional, List
+from typing import Dict, Optional, List, Sequence
 from urllib.parse import urljoin
 from uuid import UUID
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from diem_utils.types.liquidity.currency import CurrencyPair
 from diem_utils.types.liquidity.lp import LPDetails
@@ -18,12 +22,74 @@ from diem_utils.types.liquidity.settlement import DebtData
 from diem_utils.types.liquidity.trade import TradeId, Direction, TradeData
 
 
+LP_CONNECT_TIMEOUT: float = float(os.getenv("LP_CONNECT_TIMEOUT", 3.05))
+LP_READ_TIMEOUT: float = float(os.getenv("LP_READ_TIMEOUT", 10))
+LP_RETRIES: int = int(os.getenv("LP_RETRIES", 3))
+LP_POOL_SIZE: int = int(os.getenv("LP_POOL_SIZE", 10))
+
+_sessions: Dict[int, requests.Session] = {}
+_sessions_lock = threading.Lock()
+# base url -> whether the liquidity provider serves batch quotes
+_batch_quotes: Dict[str, bool] = {}
+
+
+def shared_session() -> requests.Session:
+    """
+    Keep-alive connection pool shared by all the LpClient instances of the
+    process; a forked process gets a pool of its own.
+
+    Failed connections and 502, 503 and 504 responses are retried with a
+    backoff, other requests than GET, PUT and DELETE only when the request
+    was not sent.
+    """
+
+    pid = os.getpid()
+    session = _sessions.get(pid)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(pid)
+            if session is None:
+                session = _new_session()
+                _sessions.clear()
+                _sessions[pid] = session
+    return session
+
+
+def _new_session() -> requests.Session:
+    retry = Retry(
+        total=LP_RETRIES,
+        backoff_factor=0.2,
+        status_forcelist=[
+            HTTPStatus.BAD_GATEWAY,
+            HTTPStatus.SERVICE_UNAVAILABLE,
+            HTTPStatus.GATEWAY_TIMEOUT,
+        ],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=LP_POOL_SIZE, pool_maxsize=LP_POOL_SIZE, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class LpClient:
-    def __init__(self, base_url=None):
+    def __init__(self, base_url=None, session: Optional[requests.Session] = None):
         self._base_url = f"http://{os.getenv('LIQUIDITY_SERVICE_HOST', 'liquidity')}:{os.getenv('LIQUIDITY_SERVICE_PORT', 5000)}"
 
         if base_url:
             self._base_url = base_url
+        self._session = session or shared_session()
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        return self._session.request(
+            method,
+            urljoin(self._base_url, path),
+            timeout=(LP_CONNECT_TIMEOUT, LP_READ_TIMEOUT),
+            **kwargs,
+        )
 
     def get_quote(self, pair: CurrencyPair, amount: int) -> QuoteData:
         data = {
@@ -31,13 +97,49 @@ class LpClient:
             "quote_currency": pair.quote.value,
             "amount": amount,
         }
-        response = requests.post(url=urljoin(self._base_url, "quote"), json=data)
+        response = self._request("POST", "quote", json=data)
         raise_if_failed(response, f"Failed to get quote for {data}")
 
         return QuoteData.from_json(response.text)
 
+    def get_quotes(self, pairs: Sequence[CurrencyPair], amount: int) -> List[QuoteData]:
+        """
+        Quotes of all the pairs, in order, with a single batch request when
+        the liquidity provider supports it, otherwise with concurrent quote
+        requests
+        """
+
+        if not pairs:
+            return []
+
+        if _batch_quotes.get(self._base_url, True):
+            data = {
+                "quotes": [
+                    {
+                        "base_currency": pair.base.value,
+                        "quote_currency": pair.quote.value,
+                        "amount": amount,
+                    }
+                    for pair in pairs
+                ]
+            }
+            response = self._request("POST", "quotes", json=data)
+            if response.status_code not in (
+                HTTPStatus.NOT_FOUND,
+                HTTPStatus.METHOD_NOT_ALLOWED,
+            ):
+                raise_if_failed(response, f"Failed to get quotes for {data}")
+                _batch_quotes[self._base_url] = True
+                return [
+                    QuoteData.from_dict(quote) for quote in response.json()["quotes"]
+                ]
+            _batch_quotes[self._base_url] = False
+
+        with quote_executor(len(pairs)) as pool:
+            return list(pool.map(lambda pair: self.get_quote(pair, amount), pairs))
+
     def lp_details(self) -> LPDetails:
-        response = requests.get(url=urljoin(self._base_url, "details"))
+        response = self._request("GET", "details")
         raise_if_failed(response, "Failed to get Liquidity Provider details")
 
         return LPDetails.from_json(response.text)
@@ -45,7 +147,7 @@ class LpClient:
     def trade_info(self, trade_id: TradeId) -> TradeData:
         trade_id_str = str(trade_id)
 
-        response = requests.get(url=urljoin(self._base_url, f"trade/{trade_id_str}"))
+        response = self._request("GET", f"trade/{trade_id_str}")
         raise_if_failed(response, f"Failed to get info for trade ID {trade_id_str}")
 
         return TradeData.from_json(response.text)
@@ -68,22 +170,21 @@ class LpClient:
         if tx_version:
             request_body["tx_version"] = tx_version
 
-        response = requests.post(
-            url=urljoin(self._base_url, "trade"), json=request_body
-        )
+        response = self._request("POST", "trade", json=request_body)
         raise_if_failed(response, f"Failed to execute trade for {request_body}")
 
         return TradeId(UUID(response.json()["trade_id"]))
 
     def get_debt(self) -> List[DebtData]:
-        response = requests.get(url=urljoin(self._base_url, "debt"))
+        response = self._request("GET", "debt")
         raise_if_failed(response, "Failed to retrieve debt")
 
         return [DebtData.from_dict(debt_dict) for debt_dict in response.json()["debts"]]
 
     def settle(self, debt_id, settlement_confirmation):
-        response = requests.put(
-            url=urljoin(self._base_url, f"debt/{debt_id}"),
+        response = self._request(
+            "PUT",
+            f"debt/{debt_id}",
             json={"settlement_confirmation": settlement_confirmation},
         )
         raise_if_failed(
@@ -93,6 +194,14 @@ class LpClient:
         )
 
 
+def quote_executor(requests_count: int) -> ThreadPoolExecutor:
+    """Pool for concurrent quote requests, bounded by the connection pool"""
+    return ThreadPoolExecutor(
+        max_workers=max(1, min(requests_count, LP_POOL_SIZE)),
+        thread_name_prefix="lp-quote",
+    )
+
+
 def raise_if_failed(response, error_description):
     if response.status_code < 200 or response.status_code >= 300:
         raise LpError(f"{error_description} ({response.status_code})")
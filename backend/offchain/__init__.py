@@ -55,5 +55,6 @@ from .payment_command import PaymentCommand
 from .funds_pull_pre_approval_command import FundsPullPreApprovalCommand
 
 from .client import Client, CommandResponseError
+from .resolver import AccountResolver, AccountMetadata
 
 from . import jws, http_server, state, payment_state
@@ -29,6 +29,7 @@ from .types import (
     to_json,
 )
 from .error import command_error, protocol_error, Error
+from .resolver import AccountResolver
 
 from . import (
     jws,
@@ -39,6 +40,24 @@ from . import (
 
 DEFAULT_CONNECT_TIMEOUT_SECS: float = 2.0
 DEFAULT_TIMEOUT_SECS: float = 30.0
+# connection pools are kept per counterparty host
+DEFAULT_POOL_CONNECTIONS: int = 32
+DEFAULT_POOL_MAXSIZE: int = 4
+
+
+def new_session(
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+) -> requests.Session:
+    """pool_connections counterparty hosts are kept pooled, with at most
+    pool_maxsize idle connections each"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_connections, pool_maxsize=pool_maxsize
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 class CommandResponseError(Exception):
@@ -104,21 +123,22 @@ class Client:
     supported_currency_codes: typing.Optional[typing.List[str]] = dataclasses.field(
         default=None
     )
-    session: requests.Session = dataclasses.field(
-        default_factory=lambda: requests.Session()
-    )
+    session: requests.Session = dataclasses.field(default_factory=new_session)
     timeout: typing.Tuple[float, float] = dataclasses.field(
         default_factory=lambda: (
             DEFAULT_CONNECT_TIMEOUT_SECS,
             DEFAULT_TIMEOUT_SECS,
         )
     )
+    resolver: typing.Optional[AccountResolver] = dataclasses.field(default=None)
     my_compliance_key_account_id: str = dataclasses.field(init=False)
 
     def __post_init__(self) -> None:
         self.my_compliance_key_account_id = self.account_id(
             self.my_compliance_key_account_address
         )
+        if self.resolver is None:
+            self.resolver = AccountResolver(self.jsonrpc_client)
 
     def send_command(
         self, command: Command, sign: typing.Callable[[bytes], bytes]
@@ -151,8 +171,12 @@ class Client:
         if response.status_code not in [200, 400]:
             response.raise_for_status()
 
-        cmd_resp = _deserialize_jws(
-            response.content, CommandResponseObject, public_key, protocol_error
+        cmd_resp = self._deserialize_jws(
+            response.content,
+            CommandResponseObject,
+            counterparty_account_id,
+            public_key,
+            protocol_error,
         )
         if cmd_resp.status == CommandResponseStatus.failure:
             raise CommandResponseError(cmd_resp)
@@ -210,7 +234,16 @@ class Client:
             sig = cmd.payment.recipient_signature
             if sig is None:
                 raise ValueError("recipient_signature is not provided")
-            public_key.verify(bytes.fromhex(sig), msg)
+            try:
+                public_key.verify(bytes.fromhex(sig), msg)
+            except InvalidSignature:
+                # the counterparty may have rotated its compliance key
+                _, fresh_key = self.get_base_url_and_compliance_key(
+                    request_sender_address, refresh=True
+                )
+                if fresh_key is public_key:
+                    raise
+                fresh_key.verify(bytes.fromhex(sig), msg)
         except (ValueError, InvalidSignature) as e:
             raise command_error(
                 ErrorCode.invalid_recipient_signature,
@@ -287,10 +320,10 @@ class Client:
         account_address, _ = identifier.decode_account(account_id, self.hrp)
         if self.my_compliance_key_account_id == self.account_id(account_address):
             return True
-        account = self.jsonrpc_client.get_account(account_address)
-        if account and account.role.parent_vasp_address:
+        parent_vasp_address = self.resolver.get_parent_vasp_address(account_address)
+        if parent_vasp_address:
             return self.my_compliance_key_account_id == self.account_id(
-                account.role.parent_vasp_address
+                parent_vasp_address
             )
         return False
 
@@ -300,10 +333,11 @@ class Client:
         return identifier.encode_account(utils.account_address(address), None, self.hrp)
 
     def get_base_url_and_compliance_key(
-        self, account_id: str
+        self, account_id: str, refresh: bool = False
     ) -> typing.Tuple[str, Ed25519PublicKey]:
+        """Cached by the resolver; refresh=True re-reads the account from chain"""
         account_address, _ = identifier.decode_account(account_id, self.hrp)
-        return self.jsonrpc_client.get_base_url_and_compliance_key(account_address)
+        return self.resolver.get_base_url_and_compliance_key(account_address, refresh)
 
     def create_inbound_funds_pull_pre_approval_command(
         self, cid: str, fund_pull_pre_approval: FundPullPreApprovalObject
@@ -334,10 +368,68 @@ class Client:
 
         _, public_key = self.get_base_url_and_compliance_key(request_sender_address)
 
-        return _deserialize_jws(
-            request_bytes, CommandRequestObject, public_key, command_error
+        return self._deserialize_jws(
+            request_bytes,
+            CommandRequestObject,
+            request_sender_address,
+            public_key,
+            command_error,
         )
 
+    def deserialize_jws_requests(
+        self,
+        request_sender_address,
+        requests_bytes: typing.List[bytes],
+        map_fn: typing.Callable = map,
+    ) -> typing.List[typing.Union[CommandRequestObject, Error]]:
+        """
+        Verifies and decodes a batch of requests of a sender, with map_fn
+        (e.g. a thread pool map). A request that fails is returned as its Error
+        """
+
+        if not request_sender_address:
+            raise protocol_error(
+                ErrorCode.missing_http_header,
+                f"missing {http_header.X_REQUEST_SENDER_ADDRESS}",
+            )
+
+        _, public_key = self.get_base_url_and_compliance_key(request_sender_address)
+
+        def deserialize(request_bytes: bytes):
+            try:
+                return self._deserialize_jws(
+                    request_bytes,
+                    CommandRequestObject,
+                    request_sender_address,
+                    public_key,
+                    command_error,
+                )
+            except Error as e:
+                return e
+
+        return list(map_fn(deserialize, requests_bytes))
+
+    def _deserialize_jws(
+        self,
+        content_bytes: bytes,
+        klass: typing.Type[jws.T],
+        signer_account_id: str,
+        public_key: Ed25519PublicKey,
+        error_fn: typing.Callable[[str, str, typing.Optional[str]], Error],
+    ) -> jws.T:
+        try:
+            return _deserialize_jws(content_bytes, klass, public_key, error_fn)
+        except Error as e:
+            if e.obj.code != ErrorCode.invalid_jws_signature:
+                raise
+            # the signer may have rotated its compliance key since it was cached
+            _, fresh_key = self.get_base_url_and_compliance_key(
+                signer_account_id, refresh=True
+            )
+            if fresh_key is public_key:
+                raise
+            return _deserialize_jws(content_bytes, klass, fresh_key, error_fn)
+
 
 def deserialize_jws_response():
     ...
@@ -1,7 +1,7 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
-import base64, typing
+import base64, functools, typing
 import json
 
 from . import CommandRequestObject, CommandResponseObject, to_json, from_json
@@ -11,9 +11,13 @@ def base64url_encode(json):
     return base64.urlsafe_b64encode(json).rstrip(b"=")
 
 
+PROTECTED_ALG: str = "EdDSA"
 PROTECTED_HEADER: bytes = base64url_encode(b'{"alg":"EdDSA"}')
 ENCODING: str = "UTF-8"
 
+# compared as text first, a header only needs decoding when it differs
+_PROTECTED_HEADER_TEXT: str = PROTECTED_HEADER.decode(ENCODING)
+
 T = typing.TypeVar("T")
 
 
@@ -51,10 +55,7 @@ def deserialize_string(msg: bytes) -> typing.Tuple[str, bytes, bytes]:
         )
 
     header, body, sig = parts
-    if (
-        json.loads(decode(header.encode(ENCODING)).decode(ENCODING))["alg"]
-        != json.loads(decode(PROTECTED_HEADER).decode(ENCODING))["alg"]
-    ):
+    if header != _PROTECTED_HEADER_TEXT and _header_alg(header) != PROTECTED_ALG:
         raise ValueError(
             f"invalid JWS message header: {header}, header must contain {PROTECTED_HEADER}"
         )
@@ -67,6 +68,11 @@ def deserialize_string(msg: bytes) -> typing.Tuple[str, bytes, bytes]:
     )
 
 
+@functools.lru_cache(maxsize=64)
+def _header_alg(header: str) -> str:
+    return json.loads(decode(header.encode(ENCODING)).decode(ENCODING))["alg"]
+
+
 def signing_message(payload: bytes, header: bytes) -> bytes:
     return b".".join([header, payload])
 
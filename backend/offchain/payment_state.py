@@ -126,7 +126,7 @@ MACHINE: Machine[PaymentObject] = build_machine(
         new_transition(R_SOFT_SEND, S_ABORT),
         new_transition(R_SOFT_SEND, READY),
     ]
-)
+).compile()
 
 FOLLOW_UP: typing.Dict[
     State[PaymentObject], typing.Optional[typing.Tuple[Actor, Action]]
@@ -0,0 +1,165 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""Cache of the on-chain account metadata the offchain client needs for every
+inbound and outbound request: the counterparty base url, its compliance key and
+the parent VASP of child VASP accounts, and the name of billers.
+"""
+
+import dataclasses
+import threading
+import time
+import typing
+from concurrent.futures import Future
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from diem import diem_types, jsonrpc, utils
+
+DEFAULT_TTL_SECS: float = 300.0
+DEFAULT_NEGATIVE_TTL_SECS: float = 30.0
+DEFAULT_MIN_REFRESH_INTERVAL_SECS: float = 5.0
+
+
+@dataclasses.dataclass(frozen=True)
+class AccountMetadata:
+    address: str
+    parent_vasp_address: typing.Optional[str] = None
+    base_url: typing.Optional[str] = None
+    compliance_key: typing.Optional[Ed25519PublicKey] = None
+    compliance_key_hex: typing.Optional[str] = None
+    human_name: typing.Optional[str] = None
+
+
+# account address hex -> (account metadata or None when not found on chain,
+# cached until, loaded at)
+Entry = typing.Tuple[typing.Optional[AccountMetadata], float, float]
+
+
+class AccountResolver:
+    """Resolves account metadata through the jsonrpc client, caching it for ttl
+    seconds, and accounts not found on chain for negative_ttl seconds.
+
+    Concurrent lookups of the same account share a single jsonrpc call.
+    refresh=True bypasses the cache, at most once per min_refresh_interval per
+    account, so invalid signatures cannot be used to flood the full node.
+    """
+
+    def __init__(
+        self,
+        jsonrpc_client: jsonrpc.Client,
+        ttl: float = DEFAULT_TTL_SECS,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL_SECS,
+        min_refresh_interval: float = DEFAULT_MIN_REFRESH_INTERVAL_SECS,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.jsonrpc_client = jsonrpc_client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.clock = clock
+        self._entries: typing.Dict[str, Entry] = {}
+        self._inflight: typing.Dict[
+            str, "Future[typing.Optional[AccountMetadata]]"
+        ] = {}
+        self._lock = threading.Lock()
+
+    def get_account(
+        self,
+        address: typing.Union[diem_types.AccountAddress, bytes, str],
+        refresh: bool = False,
+    ) -> typing.Optional[AccountMetadata]:
+        address_hex = utils.account_address_hex(address)
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.get(address_hex)
+            if entry is not None:
+                metadata, cached_until, loaded_at = entry
+                if now < cached_until and (
+                    not refresh or now - loaded_at < self.min_refresh_interval
+                ):
+                    return metadata
+
+            future = self._inflight.get(address_hex)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[address_hex] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            metadata = self._load(address_hex)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[address_hex]
+            future.set_exception(e)
+            raise
+
+        loaded_at = self.clock()
+        ttl = self.ttl if metadata is not None else self.negative_ttl
+        with self._lock:
+            self._entries[address_hex] = (metadata, loaded_at + ttl, loaded_at)
+            del self._inflight[address_hex]
+        future.set_result(metadata)
+        return metadata
+
+    def get_parent_vasp_address(
+        self, address: typing.Union[diem_types.AccountAddress, bytes, str]
+    ) -> typing.Optional[str]:
+        metadata = self.get_account(address)
+        return metadata.parent_vasp_address if metadata else None
+
+    def get_base_url_and_compliance_key(
+        self,
+        address: typing.Union[diem_types.AccountAddress, bytes, str],
+        refresh: bool = False,
+    ) -> typing.Tuple[str, Ed25519PublicKey]:
+        """Same contract as jsonrpc.Client.get_base_url_and_compliance_key"""
+
+        metadata = self.get_account(address, refresh)
+        if metadata is None:
+            raise jsonrpc.AccountNotFoundError(
+                f"account not found by address: {utils.account_address_hex(address)}"
+            )
+        if metadata.base_url and metadata.compliance_key:
+            return metadata.base_url, metadata.compliance_key
+        if metadata.parent_vasp_address:
+            return self.get_base_url_and_compliance_key(
+                metadata.parent_vasp_address, refresh
+            )
+
+        raise ValueError(
+            f"could not find base_url and compliance_key from account: {metadata}"
+        )
+
+    def invalidate(
+        self, address: typing.Union[diem_types.AccountAddress, bytes, str]
+    ) -> None:
+        with self._lock:
+            self._entries.pop(utils.account_address_hex(address), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, address_hex: str) -> typing.Optional[AccountMetadata]:
+        account = self.jsonrpc_client.get_account(address_hex)
+        if account is None:
+            return None
+
+        role = account.role
+        compliance_key_hex = role.compliance_key or None
+        return AccountMetadata(
+            address=address_hex,
+            parent_vasp_address=role.parent_vasp_address or None,
+            base_url=role.base_url or None,
+            compliance_key=Ed25519PublicKey.from_public_bytes(
+                bytes.fromhex(compliance_key_hex)
+            )
+            if compliance_key_hex
+            else None,
+            compliance_key_hex=compliance_key_hex,
+            human_name=role.human_name or None,
+        )
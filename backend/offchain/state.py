@@ -180,6 +180,126 @@ class Machine(typing.Generic[T]):
     ) -> typing.List[typing.Tuple[State[T], MatchResult]]:
         return [(state, state.match(event_data)) for state in self.states]
 
+    def compile(self) -> "CompiledMachine[T]":
+        return CompiledMachine(
+            initials=self.initials, states=self.states, transitions=self.transitions
+        )
+
+
+# path value placeholders in the match keys of CompiledMachine
+_MISSING = object()
+_OTHER = object()
+
+
+@dataclasses.dataclass
+class CompiledMachine(Machine[T]):
+    """
+    Machine with the same results, matching event data with a dict lookup.
+
+    The outcome of every condition only depends on the value at its path: for
+    Field whether it is set, for Value and OneOfValues whether it equals one of
+    the values compared with. So the values at the paths of all conditions,
+    with the values no condition compares with folded together, are a key to
+    the match results; they are computed by Machine once per key.
+
+    Only Require, Field, Value and OneOfValues conditions can be compiled.
+    """
+
+    def __post_init__(self) -> None:
+        self._transitions: typing.Dict[
+            typing.Tuple[State[T], State[T]], Transition[T]
+        ] = {(t.state, t.to): t for t in self.transitions}
+        values: typing.Dict[str, typing.List[typing.Any]] = {}
+        for state in self.states:
+            if state.require:
+                _collect_path_values(state.require, values)
+        # (path split by ".", values compared with at the path)
+        self._paths: typing.List[
+            typing.Tuple[typing.List[str], typing.List[typing.Any]]
+        ] = [(path.split("."), path_values) for path, path_values in values.items()]
+        self._results: typing.Dict[
+            typing.Tuple[typing.Any, ...],
+            typing.Union[
+                typing.Tuple[
+                    typing.List[typing.Tuple[State[T], MatchResult]],
+                    typing.List[State[T]],
+                ],
+                ConditionValidationError,
+            ],
+        ] = {}
+
+    def is_valid_transition(self, state: State[T], to: State[T], event_data: T) -> bool:
+        return (state, to) in self._transitions
+
+    def match_states(self, event_data: T) -> typing.List[State[T]]:
+        return list(self._match(event_data)[1])
+
+    def match_states_and_results(
+        self, event_data: T
+    ) -> typing.List[typing.Tuple[State[T], MatchResult]]:
+        return list(self._match(event_data)[0])
+
+    def _match(
+        self, event_data: T
+    ) -> typing.Tuple[
+        typing.List[typing.Tuple[State[T], MatchResult]], typing.List[State[T]]
+    ]:
+        key = tuple(self._path_key(event_data, path) for path in self._paths)
+        ret = self._results.get(key)
+        if ret is None:
+            try:
+                results = super().match_states_and_results(event_data)
+                ret = (results, [state for state, match in results if match.success])
+            except ConditionValidationError as e:
+                ret = e
+            self._results[key] = ret
+        if isinstance(ret, ConditionValidationError):
+            raise ConditionValidationError(ret.validation, ret.match_result)
+        return ret
+
+    def _path_key(
+        self,
+        event_data: T,
+        path: typing.Tuple[typing.List[str], typing.List[typing.Any]],
+    ) -> typing.Any:
+        fields, values = path
+        val = event_data
+        for f in fields:
+            if val is None or not hasattr(val, f):
+                return _MISSING
+            val = getattr(val, f)
+        if val is None:
+            return None
+        for value in values:
+            if val == value:
+                return value
+        return _OTHER
+
+
+def _collect_path_values(
+    cond: Condition[T], values: typing.Dict[str, typing.List[typing.Any]]
+) -> None:
+    if isinstance(cond, Require):
+        for c in cond.conds:
+            _collect_path_values(c, values)
+        if cond.validation:
+            _collect_path_values(cond.validation, values)
+    elif isinstance(cond, Field):
+        values.setdefault(cond.path, [])
+    elif isinstance(cond, Value):
+        _add_path_value(values.setdefault(cond.path, []), cond.value)
+    elif isinstance(cond, OneOfValues):
+        path_values = values.setdefault(cond.path, [])
+        _add_path_value(path_values, cond.value1)
+        _add_path_value(path_values, cond.value2)
+    else:
+        raise TypeError(f"can not compile condition: {cond}")
+
+
+def _add_path_value(values: typing.List[typing.Any], value: typing.Any) -> None:
+    if value not in values:
+        values.append(value)
+
 
 def new_transition(state: State[T], to: State[T]) -> Transition[T]:
     return Transition(action=f"{state} -> {to}", state=state, to=to)
@@ -51,7 +51,7 @@ from .p2m_payment_types import (
 
 from .cid import generate_cid
 
-import dataclasses, json, re, typing, uuid
+import dataclasses, json, re, threading, typing, uuid
 
 
 class FieldError(ValueError):
@@ -92,12 +92,10 @@ _OBJECT_TYPE_FIELD_NAME = "_ObjectType"
 
 
 def to_json(obj: T, indent: typing.Optional[int] = None) -> str:
-    if dataclasses.is_dataclass(obj):
-        raw = dataclasses.asdict(obj)
-    elif isinstance(obj, list):
-        raw = list(map(dataclasses.asdict, obj))
+    if isinstance(obj, list):
+        raw = [_encode(item) for item in obj]
     else:
-        raw = obj
+        raw = _encode(obj)
     return json.dumps(raw, indent=indent)
 
 
@@ -108,119 +106,262 @@ def from_json(data: str, klass: typing.Optional[typing.Type[T]] = None) -> T:
 def from_dict(
     obj: typing.Any, klass: typing.Optional[typing.Type[T]], field_path: str = ""
 ) -> T:  # pyre-ignore
+    return _decoder(klass)(obj, field_path)
+
+
+# Decoders and encoders are generated once per type, from the dataclass fields,
+# and cached: inbound commands are decoded on every offchain API request.
+
+_Decoder = typing.Callable[[typing.Any, str], typing.Any]  # pyre-ignore
+_Encoder = typing.Callable[[typing.Any], typing.Any]  # pyre-ignore
+
+_DECODERS: typing.Dict[typing.Any, _Decoder] = {}  # pyre-ignore
+_ENCODERS: typing.Dict[typing.Type[typing.Any], _Encoder] = {}  # pyre-ignore
+_COMPILE_LOCK = threading.RLock()
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _decoder(klass: typing.Any) -> _Decoder:  # pyre-ignore
+    decoder = _DECODERS.get(klass)
+    if decoder is None:
+        with _COMPILE_LOCK:
+            decoder = _DECODERS.get(klass) or _compile_decoder(klass, set())
+    return decoder
+
+
+def _compile_decoder(
+    klass: typing.Any, compiling: typing.Set[typing.Any]  # pyre-ignore
+) -> _Decoder:
+    """
+    compiling holds the types being compiled, so a type referring to itself
+    looks its decoder up at decoding time; a decoder is published to _DECODERS
+    once complete.
+    """
+
+    decoder = _DECODERS.get(klass)
+    if decoder is not None:
+        return decoder
+    if klass in compiling:
+        return lambda obj, field_path: _DECODERS[klass](obj, field_path)
+
     if klass is None or _is_union(klass):
-        if not isinstance(obj, dict):
-            code = (
-                ErrorCode.invalid_field_value
-                if field_path
-                else ErrorCode.invalid_object
-            )
-            raise FieldError(
-                code,
-                field_path,
-                f"expect json object, but got {type(obj).__name__}: {obj}",
-            )
-        klass = _find_object_type(obj, field_path)
+        decoder = _decode_typed_object
+    elif dataclasses.is_dataclass(klass):
+        compiling.add(klass)
+        decoder = _compile_dataclass_decoder(klass, compiling)
+    elif (
+        hasattr(klass, "__origin__")
+        and klass.__origin__ == list
+        and hasattr(klass, "__args__")
+    ):
+        decoder = _list_decoder(_compile_decoder(klass.__args__[0], compiling))
+    else:
+        decoder = _type_decoder(klass)
 
-    return _from_dict(obj, klass, field_path)
+    _DECODERS[klass] = decoder
+    return decoder
 
 
-def _from_dict(
-    obj: typing.Any, klass: typing.Type[typing.Any], field_path: str
-) -> typing.Any:  # pyre-ignore
-    if not isinstance(obj, dict) or not dataclasses.is_dataclass(klass):
-        item_type = None
+def _compile_dataclass_decoder(
+    klass: typing.Type[typing.Any],  # pyre-ignore
+    compiling: typing.Set[typing.Any],  # pyre-ignore
+) -> _Decoder:
+    # (name, is optional, valid values list, valid values pattern,
+    #  scalar type checked in place, or decoder of the field value)
+    fields = []
+    for field in dataclasses.fields(klass):
+        field_type, is_optional = _field_type(field)
+        valid_values = field.metadata.get("valid-values")
         if (
-            hasattr(klass, "__origin__")
-            and klass.__origin__ == list
-            and hasattr(klass, "__args__")
+            isinstance(field_type, type)
+            and not dataclasses.is_dataclass(field_type)
+            and field.name != _RESULT_TYPE_FIELD_NAME
         ):
-            item_type = klass.__args__[0]
-            klass = list
-        if not isinstance(obj, klass):
-            code = (
-                ErrorCode.invalid_field_value
-                if field_path
-                else ErrorCode.invalid_object
-            )
-            raise FieldError(
-                code,
-                field_path,
-                f"expect type {klass.__name__}, but got {type(obj).__name__}",
+            scalar_type, decode_value = field_type, None
+        else:
+            scalar_type = None
+            decode_value = _compile_decoder(field_type, compiling)
+            if field.name == _RESULT_TYPE_FIELD_NAME:
+                decode_value = _result_decoder(decode_value)
+        fields.append(
+            (
+                field.name,
+                is_optional,
+                valid_values
+                if valid_values and isinstance(valid_values, list)
+                else None,
+                valid_values if isinstance(valid_values, re.Pattern) else None,
+                scalar_type,
+                decode_value,
             )
-        if klass == list and item_type:
-            return [from_dict(item, item_type, field_path) for item in obj]
-        return obj
-
-    unknown_fields = list(obj.keys())
-    for field in dataclasses.fields(klass):
-        if field.name in unknown_fields:
-            unknown_fields.remove(field.name)
-        obj[field.name] = _field_value_from_dict(field, obj, field_path)
-
-    if len(unknown_fields) > 0:
-        unknown_fields.sort()
-        full_name = _join_field_path(field_path, unknown_fields[0])
-        field_names = ", ".join(unknown_fields)
-        raise FieldError(
-            ErrorCode.unknown_field, full_name, f"{field_path}: {field_names}"
         )
-    return klass(**obj)
+    field_names = frozenset(field[0] for field in fields)
 
+    def decode(obj: typing.Any, field_path: str) -> typing.Any:  # pyre-ignore
+        if not isinstance(obj, dict):
+            if isinstance(obj, klass):
+                return obj
+            raise _type_error(klass, obj, field_path)
+
+        values = {}
+        for (
+            name,
+            is_optional,
+            valid_list,
+            valid_pattern,
+            scalar_type,
+            decode_value,
+        ) in fields:
+            val = obj.get(name)
+            if val is None:
+                if is_optional:
+                    values[name] = None
+                    continue
+                full_name = _join_field_path(field_path, name)
+                raise FieldError(
+                    ErrorCode.missing_field, full_name, f"missing field: {full_name}"
+                )
+            if valid_list is not None and val not in valid_list:
+                raise FieldError(
+                    ErrorCode.invalid_field_value,
+                    _join_field_path(field_path, name),
+                    f"expect one of {valid_list}, but got: {val}",
+                )
+            if valid_pattern is not None and not valid_pattern.match(val):
+                raise FieldError(
+                    ErrorCode.invalid_field_value,
+                    _join_field_path(field_path, name),
+                    f"{val} does not match pattern {valid_pattern.pattern}",
+                )
+            if scalar_type is not None:
+                if not isinstance(val, scalar_type):
+                    raise _type_error(
+                        scalar_type, val, _join_field_path(field_path, name)
+                    )
+                values[name] = val
+            else:
+                values[name] = decode_value(val, _join_field_path(field_path, name))
 
-_RESULT_TYPES = {
-    ResponseType.InitChargePaymentResponse: InitChargePaymentResponse,
-    ResponseType.GetInfoCommandResponse: GetInfoCommandResponse,
-}
-_RESULT_TYPE_FIELD_NAME = "result"
+        if not field_names.issuperset(obj):
+            unknown_fields = sorted(key for key in obj if key not in field_names)
+            full_name = _join_field_path(field_path, unknown_fields[0])
+            field_names_msg = ", ".join(unknown_fields)
+            raise FieldError(
+                ErrorCode.unknown_field, full_name, f"{field_path}: {field_names_msg}"
+            )
+        return klass(**values)
 
+    return decode
 
-def _field_value_from_dict(
-    field: dataclasses.Field, obj: typing.Any, field_path: str
-) -> typing.Any:  # pyre-ignore
-    full_name = _join_field_path(field_path, field.name)
-    field_type = field.type
+
+def _field_type(
+    field: dataclasses.Field,  # pyre-ignore
+) -> typing.Tuple[typing.Any, bool]:  # pyre-ignore
     args = field.type.__args__ if hasattr(field.type, "__args__") else []
 
+    # decided by the last type argument: Optional[X] is Union[X, None]
     is_optional = False
-
     for arg in args:
         if hasattr(arg, "__origin__"):
             is_optional = isinstance(None, arg.__origin__)
         else:
             is_optional = isinstance(None, arg)
 
-    if is_optional:
-        field_type = args[0]
-    val = obj.get(field.name)
-    if val is None:
-        if is_optional:
-            return None
+    return (args[0] if is_optional else field.type), is_optional
+
+
+def _decode_typed_object(obj: typing.Any, field_path: str) -> typing.Any:  # pyre-ignore
+    if not isinstance(obj, dict):
+        code = ErrorCode.invalid_field_value if field_path else ErrorCode.invalid_object
         raise FieldError(
-            ErrorCode.missing_field, full_name, f"missing field: {full_name}"
+            code,
+            field_path,
+            f"expect json object, but got {type(obj).__name__}: {obj}",
         )
+    return _decoder(_find_object_type(obj, field_path))(obj, field_path)
 
-    valid_values = field.metadata.get("valid-values")
-    if valid_values:
-        if isinstance(valid_values, list) and val not in valid_values:
-            raise FieldError(
-                ErrorCode.invalid_field_value,
-                full_name,
-                f"expect one of {valid_values}, but got: {val}",
-            )
-        if isinstance(valid_values, re.Pattern) and not valid_values.match(val):
-            raise FieldError(
-                ErrorCode.invalid_field_value,
-                full_name,
-                f"{val} does not match pattern {valid_values.pattern}",
-            )
 
-    if full_name == _RESULT_TYPE_FIELD_NAME:
-        object_type = val.get("_ObjectType")
-        if object_type in _RESULT_TYPES:
-            return from_dict(val, _RESULT_TYPES[object_type], full_name)
+def _list_decoder(decode_item: _Decoder) -> _Decoder:
+    def decode(obj: typing.Any, field_path: str) -> typing.Any:  # pyre-ignore
+        if not isinstance(obj, list):
+            raise _type_error(list, obj, field_path)
+        return [decode_item(item, field_path) for item in obj]
+
+    return decode
+
+
+def _type_decoder(klass: typing.Type[typing.Any]) -> _Decoder:  # pyre-ignore
+    def decode(obj: typing.Any, field_path: str) -> typing.Any:  # pyre-ignore
+        if not isinstance(obj, klass):
+            raise _type_error(klass, obj, field_path)
+        return obj
+
+    return decode
+
+
+def _result_decoder(decode_default: _Decoder) -> _Decoder:
+    def decode(obj: typing.Any, full_name: str) -> typing.Any:  # pyre-ignore
+        # the result of a command response, typed by its _ObjectType
+        if full_name == _RESULT_TYPE_FIELD_NAME:
+            object_type = obj.get(_OBJECT_TYPE_FIELD_NAME)
+            if object_type in _RESULT_TYPES:
+                return _decoder(_RESULT_TYPES[object_type])(obj, full_name)
+        return decode_default(obj, full_name)
+
+    return decode
 
-    return from_dict(val, field_type, full_name)
+
+def _type_error(
+    klass: typing.Type[typing.Any], obj: typing.Any, field_path: str  # pyre-ignore
+) -> FieldError:
+    code = ErrorCode.invalid_field_value if field_path else ErrorCode.invalid_object
+    return FieldError(
+        code,
+        field_path,
+        f"expect type {klass.__name__}, but got {type(obj).__name__}",
+    )
+
+
+def _encode(obj: typing.Any) -> typing.Any:  # pyre-ignore
+    """
+    Same json value as dataclasses.asdict, without its deep copy of the leaf
+    values, which json.dumps only reads
+    """
+
+    obj_type = type(obj)
+    if obj_type in _SCALAR_TYPES:
+        return obj
+    encoder = _ENCODERS.get(obj_type)
+    if encoder is None:
+        encoder = _compile_encoder(obj_type)
+        _ENCODERS[obj_type] = encoder
+    return encoder(obj)
+
+
+def _compile_encoder(klass: typing.Type[typing.Any]) -> _Encoder:  # pyre-ignore
+    if dataclasses.is_dataclass(klass):
+        field_names = tuple(field.name for field in dataclasses.fields(klass))
+
+        def encode(obj: typing.Any) -> typing.Dict[str, typing.Any]:  # pyre-ignore
+            raw = {}
+            for name in field_names:
+                val = getattr(obj, name)
+                raw[name] = val if type(val) in _SCALAR_TYPES else _encode(val)
+            return raw
+
+        return encode
+    if issubclass(klass, (list, tuple)):
+        return lambda obj: [_encode(item) for item in obj]
+    if issubclass(klass, dict):
+        return lambda obj: {key: _encode(val) for key, val in obj.items()}
+    return lambda obj: obj
+
+
+_RESULT_TYPES = {
+    ResponseType.InitChargePaymentResponse: InitChargePaymentResponse,
+    ResponseType.GetInfoCommandResponse: GetInfoCommandResponse,
+}
+_RESULT_TYPE_FIELD_NAME = "result"
 
 
 def _join_field_path(path: str, field: str) -> str:
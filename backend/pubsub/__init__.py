@@ -9,6 +9,12 @@ JSON_RPC_URL = os.getenv("JSON_RPC_URL")
 DEFL_CONFIG = {
     "diem_node_uri": JSON_RPC_URL,
     "sync_interval_ms": 1000,
+    # file, sql (wallet DB) or redis
+    "progress_storage": os.getenv("PUBSUB_PROGRESS_STORAGE", "file"),
     "progress_file_path": "/tmp/pubsub_progress",
+    "checkpoint_interval_ms": int(os.getenv("PUBSUB_CHECKPOINT_INTERVAL_MS", 0)),
     "accounts": [VASP_ADDR],
+    "min_fetch_batch_size": int(os.getenv("PUBSUB_MIN_FETCH_BATCH_SIZE", 10)),
+    "max_fetch_batch_size": int(os.getenv("PUBSUB_MAX_FETCH_BATCH_SIZE", 1000)),
+    "fetch_concurrency": int(os.getenv("PUBSUB_FETCH_CONCURRENCY", 4)),
 }
@@ -4,30 +4,31 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import time
-from typing import Any, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 
 import logging
-import json
 
-from wallet.background_tasks.background import process_incoming_txn
+from wallet.background_tasks.background import process_incoming_txns
+from .progress import FileProgressStorage, create_progress_storage
 from .types import LRWPubSubEvent
 from diem import jsonrpc
 
+# page size limit of the JSON-RPC get_events method
+MAX_FETCH_BATCH_SIZE = 1000
+MIN_FETCH_BATCH_SIZE = 10
+FETCH_CONCURRENCY = 4
 
-class FileProgressStorage:
-    def __init__(self, path: str) -> None:
-        self.path = path
 
-    def fetch_state(self) -> Dict[str, int]:
-        try:
-            with open(self.path, "r") as file:
-                return json.loads(file.read())
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def save_state(self, state: Dict[str, int]) -> None:
-        with open(self.path, "w") as file:
-            file.write(json.dumps(state))
+@dataclass
+class SyncStats:
+    events: int = 0
+    elapsed_secs: float = 0.0
+    events_per_sec: float = 0.0
+    chain_version: int = 0
+    # per event key, how many versions the last fetched event is behind chain head
+    lag_versions: Dict[str, int] = field(default_factory=dict)
 
 
 class LRWPubSubClient:
@@ -37,48 +38,136 @@ class LRWPubSubClient:
 
         self.diem_node_uri = config["diem_node_uri"]
         self.progress_file_path = config["progress_file_path"]
-        self.fetch_batch_size = 10
-        self.processor = config.get("processor", process_incoming_txn)
+        # 0 saves the progress on every tick that moved it; a longer interval
+        # trades fewer writes for re-fetching at most that much after a crash,
+        # incoming transactions already recorded are skipped by the wallet
+        self.checkpoint_interval_ms: int = config.get("checkpoint_interval_ms", 0)
+        self.last_checkpoint: float = 0.0
+        self.saved_state: Optional[Dict[str, int]] = None
+        self.min_fetch_batch_size: int = config.get(
+            "min_fetch_batch_size", MIN_FETCH_BATCH_SIZE
+        )
+        self.max_fetch_batch_size: int = config.get(
+            "max_fetch_batch_size", MAX_FETCH_BATCH_SIZE
+        )
+        self.fetch_batch_sizes: Dict[str, int] = {}
+        # receives a list of consecutive events of a single event key
+        self.processor = config.get("processor", process_incoming_txns)
+        self.stats = SyncStats()
 
         logging.info(f"Loaded LRWPubSubClient with config: {config}")
 
         self.client = jsonrpc.Client(self.diem_node_uri)
-        self.progress = FileProgressStorage(self.progress_file_path)
+        self.progress = create_progress_storage(config)
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.get("fetch_concurrency", FETCH_CONCURRENCY),
+            thread_name_prefix="pubsub-fetch",
+        )
 
     def start(self) -> None:
         sync_state = self.init_progress_state()
-        while True:
-            sync_state = self.sync(sync_state, catch_error=True)
-            time.sleep(self.sync_interval_ms / 1000)
+        try:
+            while True:
+                sync_state = self.sync(sync_state, catch_error=True)
+                # keep fetching without a pause while catching up
+                if not self.is_behind():
+                    time.sleep(self.sync_interval_ms / 1000)
+        finally:
+            self.checkpoint(sync_state, force=True)
 
     def sync(
         self, state: Dict[str, int], catch_error: Optional[bool] = False
     ) -> Dict[str, int]:
+        start_time = time.time()
         after_sync_state = state.copy()
-        for key in state:
+        fetches = {
+            key: self.executor.submit(
+                self.client.get_events, key, state[key], self.fetch_batch_size(key)
+            )
+            for key in state
+        }
+        processed = 0
+
+        for key, fetch in fetches.items():
             try:
-                sequence_num = state[key]
-                events = self.client.get_events(
-                    key, sequence_num, self.fetch_batch_size
-                )
-                for event in events:
-                    lrw_event = LRWPubSubEvent.from_jsonrpc_event(event)
-                    self.processor.send(lrw_event)
-                    logging.info(f"SUCCESS: sent to wallet onchain {lrw_event}")
-
-                after_sync_state[key] = sequence_num + len(events)
+                events = fetch.result()
+                if events:
+                    lrw_events = [LRWPubSubEvent.from_jsonrpc_event(e) for e in events]
+                    self.processor.send(lrw_events)
+                    logging.info(
+                        f"SUCCESS: sent {len(events)} events of {key} to wallet onchain"
+                    )
+
+                after_sync_state[key] = state[key] + len(events)
+                processed += len(events)
+                self.update_lag(key, events)
+                self.adapt_fetch_batch_size(key, len(events))
             except Exception as exc:
                 logging.error(f"failed to perform sync for event key {key}: {exc}")
                 if not catch_error:
                     raise exc
 
-        self.progress.save_state(after_sync_state)
-        logging.info(f"processed next chunk. New state is {after_sync_state}")
+        if after_sync_state != state:
+            logging.info(f"processed next chunk. New state is {after_sync_state}")
+        self.checkpoint(after_sync_state)
+
+        self.update_stats(processed, time.time() - start_time)
 
         return after_sync_state
 
+    def checkpoint(self, state: Dict[str, int], force: bool = False) -> None:
+        if state == self.saved_state:
+            return
+        now = time.time()
+        if (
+            not force
+            and (now - self.last_checkpoint) * 1000 < self.checkpoint_interval_ms
+        ):
+            return
+
+        self.progress.save_state(state)
+        self.saved_state = state.copy()
+        self.last_checkpoint = now
+
+    def fetch_batch_size(self, key: str) -> int:
+        return self.fetch_batch_sizes.get(key, self.min_fetch_batch_size)
+
+    def adapt_fetch_batch_size(self, key: str, fetched: int) -> None:
+        size = self.fetch_batch_size(key)
+        if fetched >= size:
+            # a full page means there are more events waiting, grow the page
+            size = min(size * 2, self.max_fetch_batch_size)
+        else:
+            size = max(size // 2, self.min_fetch_batch_size)
+        self.fetch_batch_sizes[key] = size
+
+    def is_behind(self) -> bool:
+        return any(lag > 0 for lag in self.stats.lag_versions.values())
+
+    def update_lag(self, key: str, events: List[jsonrpc.Event]) -> None:
+        chain_version = self.client.get_last_known_state().version
+        self.stats.chain_version = chain_version
+        if events and len(events) >= self.fetch_batch_size(key):
+            lag = chain_version - events[-1].transaction_version
+            self.stats.lag_versions[key] = max(lag, 1)
+        else:
+            self.stats.lag_versions[key] = 0
+
+    def update_stats(self, processed: int, elapsed_secs: float) -> None:
+        self.stats.events = processed
+        self.stats.elapsed_secs = elapsed_secs
+        self.stats.events_per_sec = processed / elapsed_secs if elapsed_secs else 0.0
+        if processed:
+            logging.info(
+                f"synced {processed} events in {elapsed_secs:.3f}s "
+                f"({self.stats.events_per_sec:.1f} events/sec), "
+                f"chain version {self.stats.chain_version}, "
+                f"lag behind chain head {self.stats.lag_versions}"
+            )
+
     def init_progress_state(self) -> Dict[str, int]:
         state = self.progress.fetch_state()
+        self.saved_state = state.copy()
         for address in self.accounts:
             account = self.client.get_account(address)
             if account is None:
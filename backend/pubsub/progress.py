@@ -0,0 +1,108 @@
+# pyre-strict
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import abc
+import json
+import os
+import tempfile
+from typing import Any, Dict
+
+PROGRESS_REDIS_KEY = "lrw:pubsub:progress"
+
+
+class ProgressStorage(abc.ABC):
+    """Stores the next event sequence number to fetch, per event key"""
+
+    @abc.abstractmethod
+    def fetch_state(self) -> Dict[str, int]:
+        ...
+
+    @abc.abstractmethod
+    def save_state(self, state: Dict[str, int]) -> None:
+        """Must either persist the whole state or nothing"""
+        ...
+
+
+class FileProgressStorage(ProgressStorage):
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def fetch_state(self) -> Dict[str, int]:
+        try:
+            with open(self.path, "r") as file:
+                return json.loads(file.read())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self, state: Dict[str, int]) -> None:
+        # write a temp file next to the target and rename it over, so a crash
+        # mid-write leaves the previous state in place instead of an empty file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".progress-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(json.dumps(state))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class SqlProgressStorage(ProgressStorage):
+    """Keeps the progress in the pubsub_progress table of the wallet DB"""
+
+    def fetch_state(self) -> Dict[str, int]:
+        from wallet.storage import get_pubsub_progress
+
+        return get_pubsub_progress()
+
+    def save_state(self, state: Dict[str, int]) -> None:
+        from wallet.storage import save_pubsub_progress
+
+        save_pubsub_progress(state)
+
+
+class RedisProgressStorage(ProgressStorage):
+    """Keeps the progress in a redis hash, one field per event key"""
+
+    def __init__(self, client: Any, key: str = PROGRESS_REDIS_KEY) -> None:
+        self.client = client
+        self.key = key
+
+    def fetch_state(self) -> Dict[str, int]:
+        return {
+            field.decode(): int(seq)
+            for field, seq in self.client.hgetall(self.key).items()
+        }
+
+    def save_state(self, state: Dict[str, int]) -> None:
+        if state:
+            # a single HSET is atomic
+            self.client.hset(self.key, mapping=state)
+
+
+def create_progress_storage(config: Dict[str, Any]) -> ProgressStorage:
+    backend = config.get("progress_storage", "file")
+    if backend == "file":
+        return FileProgressStorage(config["progress_file_path"])
+    if backend == "sql":
+        return SqlProgressStorage()
+    if backend == "redis":
+        import redis
+        from wallet.config import REDIS_DB, REDIS_HOST, REDIS_PASSWORD, REDIS_PORT
+
+        client = redis.StrictRedis(
+            host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD
+        )
+        return RedisProgressStorage(client)
+    raise ValueError(f"unknown progress storage: {backend}")
@@ -3,6 +3,8 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
+import typing
+
 from diem import diem_types, jsonrpc
 
 
@@ -23,14 +25,33 @@ class LRWPubSubEvent:
         self.currency = currency
         self.version = version
         self.sequence = sequence
+        # raw metadata, as it is sent to the wallet workers; deserialized on
+        # first access
+        self.metadata_bytes = metadata
+        self._metadata: typing.Optional[diem_types.Metadata] = None
+
+    @property
+    def metadata(self) -> diem_types.Metadata:
+        if self._metadata is None:
+            # The metadata deserializer is totally a prickly drama queen
+            # It breaks on data directly from the blockchain without saying much
+            metadata = diem_types.Metadata__Undefined()
+            try:
+                metadata = diem_types.Metadata.bcs_deserialize(self.metadata_bytes)
+            except:
+                pass
+            self._metadata = metadata
+        return self._metadata
 
-        # The metadata deserializer is totally a prickly drama queen
-        # It breaks on data directly from the blockchain without saying much
-        self.metadata = diem_types.Metadata__Undefined()
-        try:
-            self.metadata = diem_types.Metadata.bcs_deserialize(metadata)
-        except:
-            pass
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        # events pickled before the metadata was kept raw have it deserialized
+        if "metadata" in state:
+            state["_metadata"] = state.pop("metadata")
+            try:
+                state["metadata_bytes"] = state["_metadata"].bcs_serialize()
+            except Exception:
+                state["metadata_bytes"] = b""
+        self.__dict__.update(state)
 
     @classmethod
     def from_jsonrpc_event(cls, event: jsonrpc.Event) -> "LRWPubSubEvent":
@@ -48,6 +69,7 @@ class LRWPubSubEvent:
         """
         Print as a nested dict to str
         """
-        d = self.__dict__.copy()
+        d = {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
         d["metadata"] = self.metadata.__dict__
+        del d["metadata_bytes"]
         return str(d)
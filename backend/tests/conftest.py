@@ -28,6 +28,7 @@ from tests.wallet_tests.client_sdk_mocks import (
 )
 from tests.wallet_tests.services.fx.test_fx import rates
 from wallet import services
+from wallet.logging import execution_log_sink
 from wallet.services.transaction import process_incoming_transaction
 from wallet.storage import db_session
 
@@ -52,6 +53,9 @@ def env_context():
 @pytest.fixture(autouse=True)
 def clean_db() -> Generator[None, None, None]:
     yield clear_db()
+    # execution logs are written in the background, don't let them land
+    # in the next test database
+    execution_log_sink.flush()
     db_session.remove()
 
 
@@ -113,6 +117,9 @@ class LpClientMock:
         LpClientMock.QUOTES[quote_id] = quote
         return quote
 
+    def get_quotes(self, pairs: List[CurrencyPair], amount: int) -> List[QuoteData]:
+        return [self.get_quote(pair, amount) for pair in pairs]
+
     def lp_details(self) -> LPDetails:
         return LPDetails(
             vasp=FAKE_LIQUIDITY_VASP_ADDR,
@@ -0,0 +1,107 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import context
+from context.sequence import LocalSequenceAllocator
+from diem import jsonrpc, stdlib, utils
+
+
+class JsonRpcClientStub:
+    def __init__(self, chain_sequence: int) -> None:
+        self.chain_sequence = chain_sequence
+        self.submitted = []
+
+    def get_account_sequence(self, address) -> int:
+        return self.chain_sequence
+
+    def submit(self, txn) -> None:
+        seq = txn.raw_txn.sequence_number
+        if seq < self.chain_sequence:
+            raise jsonrpc.JsonRpcError(
+                "{'code': -32001, 'message': 'Server error: VM Validation error: SEQUENCE_NUMBER_TOO_OLD'}"
+            )
+        if seq > self.chain_sequence + 10:
+            raise jsonrpc.JsonRpcError("SEQUENCE_NUMBER_TOO_NEW")
+        self.submitted.append(seq)
+
+
+def test_local_allocator_reserves_in_order():
+    allocator = LocalSequenceAllocator()
+    calls = []
+
+    def chain_sequence():
+        calls.append(1)
+        return 5
+
+    assert [allocator.reserve("a", chain_sequence) for _ in range(3)] == [5, 6, 7]
+    assert allocator.reserve("b", lambda: 0) == 0
+    assert len(calls) == 1
+
+    # a later sequence number was reserved, nothing to give back
+    allocator.release("a", 6)
+    assert allocator.reserve("a", chain_sequence) == 8
+    allocator.release("a", 8)
+    assert allocator.reserve("a", chain_sequence) == 8
+
+    # resync never goes back, reset does
+    allocator.resync("a", 3)
+    assert allocator.reserve("a", chain_sequence) == 9
+    allocator.resync("a", 20)
+    assert allocator.reserve("a", chain_sequence) == 20
+    assert allocator.reset("a", 12, allocator.peek("a"))
+    assert allocator.reserve("a", chain_sequence) == 12
+
+    # 13 was reserved after the next sequence number was observed
+    observed = allocator.peek("a")
+    assert allocator.reserve("a", chain_sequence) == 13
+    assert not allocator.reset("a", 12, observed)
+    assert allocator.reserve("a", chain_sequence) == 14
+
+
+def test_submit_transaction_without_fetching_sequence():
+    ctx = context.for_local_dev()
+    ctx.jsonrpc_client = JsonRpcClientStub(chain_sequence=3)
+    recorded = []
+
+    for _ in range(3):
+        ctx.submit_transaction(
+            stdlib.encode_rotate_dual_attestation_info_script(b"", b""),
+            lambda txn: recorded.append(txn.raw_txn.sequence_number),
+        )
+
+    assert ctx.jsonrpc_client.submitted == [3, 4, 5]
+    assert recorded == [3, 4, 5]
+
+
+def test_submit_transaction_resyncs_too_old_sequence():
+    ctx = context.for_local_dev()
+    ctx.jsonrpc_client = JsonRpcClientStub(chain_sequence=3)
+    script = stdlib.encode_rotate_dual_attestation_info_script(b"", b"")
+    ctx.submit_transaction(script)
+
+    # another process sent transactions from the same account
+    ctx.jsonrpc_client.chain_sequence = 8
+    recorded = []
+    txn = ctx.submit_transaction(
+        script, lambda txn: recorded.append(txn.raw_txn.sequence_number)
+    )
+
+    assert txn.raw_txn.sequence_number == 8
+    assert recorded == [4, 8]
+    assert ctx.jsonrpc_client.submitted == [3, 8]
+
+
+def test_rejected_transaction_releases_sequence():
+    ctx = context.for_local_dev()
+    ctx.jsonrpc_client = JsonRpcClientStub(chain_sequence=0)
+    script = stdlib.encode_rotate_dual_attestation_info_script(b"", b"")
+    address = utils.account_address_hex(ctx.config.vasp_account_address())
+    ctx.sequence_allocator.reset(address, 11, None)
+
+    with pytest.raises(jsonrpc.JsonRpcError):
+        ctx.submit_transaction(script)
+
+    ctx.jsonrpc_client.chain_sequence = 5
+    assert ctx.submit_transaction(script).raw_txn.sequence_number == 11
+    assert ctx.jsonrpc_client.submitted == [11]
@@ -1,5 +1,12 @@
-from diem import LocalAccount
+import copy
+import dataclasses
+import json
+
+import offchain
+import pytest
+from diem import LocalAccount, identifier
 from offchain import CommandResponseObject, jws, CommandResponseStatus
+from offchain import CommandRequestObject, ErrorCode, FieldError
 
 
 def test_serialize_deserialize():
@@ -16,3 +23,83 @@ def test_serialize_deserialize():
         account.private_key.public_key().verify,
     )
     assert resp == response
+
+
+def test_from_dict_reports_field_errors_with_path():
+    request = json.loads(offchain.to_json(_payment_request()))
+    sender = request["command"]["payment"]["sender"]
+
+    del sender["address"]
+    with pytest.raises(FieldError) as e:
+        offchain.from_dict(copy.deepcopy(request), None)
+    assert e.value.code == ErrorCode.missing_field
+    assert e.value.field == "command.payment.sender.address"
+
+    sender["address"] = "tdm1p7ujcndcl7nudzwt8fglhx6wxn08kgs5tm6mz4ustv0tyx"
+    sender["status"]["status"] = "unknown"
+    with pytest.raises(FieldError) as e:
+        offchain.from_dict(copy.deepcopy(request), None)
+    assert e.value.code == ErrorCode.invalid_field_value
+    assert e.value.field == "command.payment.sender.status.status"
+
+    sender["status"]["status"] = "none"
+    sender["nickname"] = "tom"
+    sender["alias"] = "jack"
+    with pytest.raises(FieldError) as e:
+        offchain.from_dict(copy.deepcopy(request), None)
+    assert e.value.code == ErrorCode.unknown_field
+    assert e.value.field == "command.payment.sender.alias"
+
+    del sender["nickname"], sender["alias"]
+    request["command"]["payment"]["action"]["amount"] = "1000"
+    with pytest.raises(FieldError) as e:
+        offchain.from_dict(request, None)
+    assert e.value.code == ErrorCode.invalid_field_value
+    assert e.value.field == "command.payment.action.amount"
+
+
+def test_to_json_matches_asdict():
+    request = _payment_request()
+    assert offchain.to_json(request) == json.dumps(dataclasses.asdict(request))
+    assert offchain.from_json(offchain.to_json(request), CommandRequestObject) == (
+        request
+    )
+    assert offchain.to_json([request], indent=2) == json.dumps(
+        [dataclasses.asdict(request)], indent=2
+    )
+
+
+def _payment_request() -> CommandRequestObject:
+    return offchain.PaymentCommand.init(
+        identifier.encode_account(
+            LocalAccount.generate().account_address,
+            identifier.gen_subaddress(),
+            identifier.TDM,
+        ),
+        offchain.individual_kyc_data(given_name="Tom", surname="Jack"),
+        identifier.encode_account(
+            LocalAccount.generate().account_address,
+            identifier.gen_subaddress(),
+            identifier.TDM,
+        ),
+        1_000_000_000,
+        "XUS",
+    ).new_request()
+
+
+def test_deserialize_checks_header_algorithm():
+    account = LocalAccount.generate()
+    body = jws.base64url_encode(b'{"cid": "3185027f05746f5526683a38fdb5de98"}')
+
+    def sign_with_header(header: bytes) -> bytes:
+        msg = jws.signing_message(body, jws.base64url_encode(header))
+        return b".".join([msg, jws.base64url_encode(account.private_key.sign(msg))])
+
+    verify = account.private_key.public_key().verify
+    decoded, _, _ = jws.deserialize_string(sign_with_header(b'{"alg": "EdDSA"}'))
+    assert json.loads(decoded)["cid"] == "3185027f05746f5526683a38fdb5de98"
+
+    with pytest.raises(ValueError, match="invalid JWS message header"):
+        jws.deserialize(
+            sign_with_header(b'{"alg": "none"}'), CommandResponseObject, verify
+        )
@@ -15,7 +15,17 @@ from offchain.state import (
     OneOfValues,
 )
 
-import dataclasses, pytest, typing
+from offchain import payment_state
+from offchain.types import (
+    PaymentActionObject,
+    PaymentActorObject,
+    PaymentObject,
+    Status,
+    StatusObject,
+    individual_kyc_data,
+)
+
+import dataclasses, itertools, pytest, typing
 
 
 @dataclasses.dataclass
@@ -186,3 +196,78 @@ def test_require_empty_matches_anything():
 
     assert a.match(None) == MatchResult(success=True)
     assert a.match(Object()) == MatchResult(success=True)
+
+
+def test_compiled_machine_matches_as_machine():
+    a = State(id="a", require=require(Value(path="a", value="hello")))
+    b = State(
+        id="b",
+        require=require(
+            OneOfValues(path="b.a", value1="hello", value2="world"),
+            Field(path="c", not_set=True),
+            validation=Field(path="b.b"),
+        ),
+    )
+    c = State(id="c", require=require(Field(path="c.a"), Field(path="a")))
+    m = build_machine([new_transition(a, b), new_transition(b, c)])
+    compiled = m.compile()
+
+    values = [None, "hello", "world", "other"]
+    objects = [None, Object()]
+    for a_val, b_a, b_b, c_a in itertools.product(values, values, values, values):
+        objects.append(Object(a=a_val, b=Object(a=b_a, b=b_b), c=Object(a=c_a)))
+        objects.append(Object(a=a_val, b=Object(a=b_a, b=b_b)))
+        objects.append(Object(a=a_val, c=Object(a=c_a)))
+
+    for obj in objects:
+        assert _match(compiled, obj) == _match(m, obj), obj
+
+    for state, to in itertools.product(m.states, m.states):
+        assert compiled.is_valid_transition(state, to, None) == m.is_valid_transition(
+            state, to, None
+        )
+
+
+def test_compiled_payment_machine_matches_as_machine():
+    machine = build_machine(payment_state.MACHINE.transitions)
+    statuses = (
+        [None]
+        + [v for k, v in vars(Status).items() if not k.startswith("_")]
+        + ["unknown"]
+    )
+    kyc_data = [None, individual_kyc_data(given_name="Tom")]
+    strings = [None, "", "value"]
+
+    def actor(status, kyc, additional_kyc_data):
+        return PaymentActorObject(
+            address="address",
+            status=StatusObject(status=status),
+            kyc_data=kyc,
+            additional_kyc_data=additional_kyc_data,
+        )
+
+    for sender_status, receiver_status in itertools.product(statuses, statuses):
+        for (
+            sender_kyc,
+            receiver_kyc,
+            sender_more,
+            receiver_more,
+            signature,
+        ) in itertools.product(kyc_data, kyc_data, strings, strings, strings):
+            payment = PaymentObject(
+                reference_id="ref",
+                sender=actor(sender_status, sender_kyc, sender_more),
+                receiver=actor(receiver_status, receiver_kyc, receiver_more),
+                action=PaymentActionObject(amount=1, currency="XUS"),
+                recipient_signature=signature,
+            )
+            assert _match(payment_state.MACHINE, payment) == _match(
+                machine, payment
+            ), payment
+
+
+def _match(machine, obj):
+    try:
+        return machine.match_states_and_results(obj), machine.match_states(obj)
+    except ConditionValidationError as e:
+        return e.validation, e.match_result
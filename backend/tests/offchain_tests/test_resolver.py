@@ -0,0 +1,195 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+from diem import LocalAccount, identifier, jsonrpc
+from offchain import AccountResolver, Client, CommandResponseObject, jws
+from offchain import CommandResponseStatus, Error, protocol_error
+
+BASE_URL = "http://vasp.com/offchain"
+
+
+class JsonRpcClientStub:
+    def __init__(self):
+        self.accounts = {}
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def add_parent_vasp(self, account: LocalAccount) -> None:
+        self.accounts[account.account_address.to_hex()] = SimpleNamespace(
+            role=SimpleNamespace(
+                parent_vasp_address=None,
+                base_url=BASE_URL,
+                compliance_key=account.compliance_public_key_bytes.hex(),
+                human_name="VASP",
+            )
+        )
+
+    def add_child_vasp(self, child: LocalAccount, parent: LocalAccount) -> None:
+        self.accounts[child.account_address.to_hex()] = SimpleNamespace(
+            role=SimpleNamespace(
+                parent_vasp_address=parent.account_address.to_hex(),
+                base_url=None,
+                compliance_key=None,
+                human_name="Child VASP",
+            )
+        )
+
+    def get_account(self, address_hex):
+        self.calls += 1
+        self.release.wait()
+        return self.accounts.get(address_hex)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def rpc():
+    return JsonRpcClientStub()
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def resolver(rpc, clock):
+    return AccountResolver(
+        rpc, ttl=60, negative_ttl=10, min_refresh_interval=5, clock=clock
+    )
+
+
+def test_metadata_is_cached_until_ttl(rpc, clock, resolver):
+    vasp = LocalAccount.generate()
+    rpc.add_parent_vasp(vasp)
+
+    base_url, key = resolver.get_base_url_and_compliance_key(vasp.account_address)
+    assert base_url == BASE_URL
+    assert key.public_bytes_raw() == vasp.compliance_public_key_bytes
+    resolver.get_base_url_and_compliance_key(vasp.account_address)
+    assert rpc.calls == 1
+
+    clock.now += 61
+    resolver.get_base_url_and_compliance_key(vasp.account_address)
+    assert rpc.calls == 2
+
+
+def test_child_vasp_resolves_through_parent(rpc, resolver):
+    parent, child = LocalAccount.generate(), LocalAccount.generate()
+    rpc.add_parent_vasp(parent)
+    rpc.add_child_vasp(child, parent)
+
+    assert (
+        resolver.get_parent_vasp_address(child.account_address)
+        == parent.account_address.to_hex()
+    )
+    _, key = resolver.get_base_url_and_compliance_key(child.account_address)
+    assert key.public_bytes_raw() == parent.compliance_public_key_bytes
+    resolver.get_base_url_and_compliance_key(child.account_address)
+    assert rpc.calls == 2
+
+
+def test_missing_account_is_negatively_cached(rpc, clock, resolver):
+    address = LocalAccount.generate().account_address
+
+    for _ in range(3):
+        with pytest.raises(jsonrpc.AccountNotFoundError):
+            resolver.get_base_url_and_compliance_key(address)
+    assert rpc.calls == 1
+
+    clock.now += 11
+    assert resolver.get_account(address) is None
+    assert rpc.calls == 2
+
+
+def test_concurrent_lookups_share_one_call(rpc, resolver):
+    vasp = LocalAccount.generate()
+    rpc.add_parent_vasp(vasp)
+    rpc.release.clear()
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(resolver.get_account(vasp.account_address))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    while not resolver._inflight:
+        pass
+    rpc.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert rpc.calls == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+def test_refresh_is_rate_limited(rpc, clock, resolver):
+    vasp = LocalAccount.generate()
+    rpc.add_parent_vasp(vasp)
+
+    resolver.get_account(vasp.account_address)
+    resolver.get_account(vasp.account_address, refresh=True)
+    assert rpc.calls == 1
+
+    clock.now += 6
+    resolver.get_account(vasp.account_address, refresh=True)
+    assert rpc.calls == 2
+
+
+def test_client_picks_up_rotated_compliance_key(rpc, clock, resolver):
+    me, counterparty = LocalAccount.generate(), LocalAccount.generate()
+    rpc.add_parent_vasp(counterparty)
+    client = Client(me.account_address, rpc, identifier.TDM, resolver=resolver)
+    sender_address = identifier.encode_account(
+        counterparty.account_address, None, identifier.TDM
+    )
+    client.get_base_url_and_compliance_key(sender_address)
+
+    rotated = LocalAccount.generate()
+    counterparty.compliance_key = rotated.compliance_key
+    rpc.add_parent_vasp(counterparty)
+    response = CommandResponseObject(
+        status=CommandResponseStatus.success, cid="3185027f05746f5526683a38fdb5de98"
+    )
+    response_bytes = jws.serialize(response, rotated.compliance_key.sign)
+
+    # within min_refresh_interval the cached key is kept
+    with pytest.raises(Error):
+        client._deserialize_jws(
+            response_bytes,
+            CommandResponseObject,
+            sender_address,
+            client.get_base_url_and_compliance_key(sender_address)[1],
+            protocol_error,
+        )
+
+    clock.now += 6
+    _, cached_key = client.get_base_url_and_compliance_key(sender_address)
+    assert (
+        client._deserialize_jws(
+            response_bytes,
+            CommandResponseObject,
+            sender_address,
+            cached_key,
+            protocol_error,
+        )
+        == response
+    )
+    assert (
+        client.get_base_url_and_compliance_key(sender_address)[1].public_bytes_raw()
+        == rotated.compliance_public_key_bytes
+    )
@@ -8,7 +8,7 @@ import tempfile
 import typing
 from time import sleep
 
-from diem import testnet, utils
+from diem import jsonrpc, testnet, utils
 from pubsub import types, DEFL_CONFIG
 from pubsub.client import LRWPubSubClient
 
@@ -105,6 +105,76 @@ def test_sync_catch_error():
         assert new_state == {account.received_events_key: 0}
 
 
+def test_fetch_batch_size_adapts_to_backlog():
+    events_key = "00" * 24
+    jsonrpc_client = JsonRpcClientStub(events_key, total_events=100, chain_version=500)
+    processor = ProcessorStub()
+
+    config = DEFL_CONFIG.copy()
+    config["processor"] = processor
+    config["min_fetch_batch_size"] = 10
+    config["max_fetch_batch_size"] = 40
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config["progress_file_path"] = tmpdir + "/progress"
+
+        client = LRWPubSubClient(config)
+        client.client = jsonrpc_client
+
+        state = client.sync({events_key: 0})
+        assert state == {events_key: 10}
+        assert client.fetch_batch_size(events_key) == 20
+        assert client.stats.lag_versions == {events_key: 490}
+        assert client.is_behind()
+
+        state = client.sync(state)
+        state = client.sync(state)
+        assert state == {events_key: 70}
+        assert client.fetch_batch_size(events_key) == 40, "capped by max batch size"
+
+        state = client.sync(state)
+        assert state == {events_key: 100}
+        assert client.fetch_batch_size(events_key) == 20
+        assert client.stats.lag_versions == {events_key: 0}
+        assert not client.is_behind()
+
+        assert [e.version for e in processor.events] == list(range(1, 101))
+        assert client.progress.fetch_state() == state
+
+        # a tick with nothing new does not touch the progress file
+        client.progress.save_state({events_key: 0})
+        assert client.sync(state) == state
+        assert client.progress.fetch_state() == {events_key: 0}
+
+
+class JsonRpcClientStub:
+    def __init__(self, events_key: str, total_events: int, chain_version: int) -> None:
+        self.events_key = events_key
+        self.total_events = total_events
+        self.chain_version = chain_version
+
+    def get_events(
+        self, key: str, start: int, limit: int
+    ) -> typing.List[jsonrpc.Event]:
+        return [
+            jsonrpc.Event(
+                key=key,
+                sequence_number=seq,
+                transaction_version=seq + 1,
+                data=jsonrpc.EventData(
+                    type="receivedpayment",
+                    amount=jsonrpc.Amount(amount=1, currency="XUS"),
+                    sender="00" * 16,
+                    receiver="11" * 16,
+                ),
+            )
+            for seq in range(start, min(start + limit, self.total_events))
+        ]
+
+    def get_last_known_state(self) -> jsonrpc.State:
+        return jsonrpc.State(chain_id=2, version=self.chain_version, timestamp_usecs=0)
+
+
 class ProcessorStub:
     events: typing.List[types.LRWPubSubEvent]
 
@@ -112,7 +182,7 @@ class ProcessorStub:
         self.events = []
         self.raise_error = raise_error
 
-    def send(self, event: types.LRWPubSubEvent) -> None:
+    def send(self, events: typing.List[types.LRWPubSubEvent]) -> None:
         if self.raise_error:
             raise Exception("raise error by test setup")
-        self.events.append(event)
+        self.events.extend(events)
@@ -0,0 +1,71 @@
+# pyre-ignore-all-errors
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import tempfile
+
+import fakeredis
+import pytest
+from pubsub import DEFL_CONFIG
+from pubsub.client import LRWPubSubClient
+from pubsub.progress import (
+    FileProgressStorage,
+    RedisProgressStorage,
+    SqlProgressStorage,
+)
+
+
+def assert_storage_round_trip(storage) -> None:
+    assert storage.fetch_state() == {}
+
+    storage.save_state({"a": 1, "b": 2})
+    assert storage.fetch_state() == {"a": 1, "b": 2}
+
+    storage.save_state({"a": 3, "b": 2})
+    assert storage.fetch_state() == {"a": 3, "b": 2}
+
+
+def test_file_progress_storage():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        assert_storage_round_trip(FileProgressStorage(tmpdir + "/progress"))
+        assert os.listdir(tmpdir) == ["progress"], "no temp file left behind"
+
+
+def test_file_progress_storage_keeps_previous_state_on_failed_write():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = FileProgressStorage(tmpdir + "/progress")
+        storage.save_state({"a": 1})
+
+        with pytest.raises(TypeError):
+            storage.save_state({"a": object()})
+
+        assert storage.fetch_state() == {"a": 1}
+        assert os.listdir(tmpdir) == ["progress"]
+
+
+def test_sql_progress_storage():
+    assert_storage_round_trip(SqlProgressStorage())
+
+
+def test_redis_progress_storage():
+    assert_storage_round_trip(RedisProgressStorage(fakeredis.FakeStrictRedis()))
+
+
+def test_checkpoint_interval():
+    config = DEFL_CONFIG.copy()
+    config["checkpoint_interval_ms"] = 60_000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config["progress_file_path"] = tmpdir + "/progress"
+        client = LRWPubSubClient(config)
+
+        client.checkpoint({"a": 1})
+        assert client.progress.fetch_state() == {"a": 1}, "first checkpoint is saved"
+
+        client.checkpoint({"a": 2})
+        assert client.progress.fetch_state() == {"a": 1}, "within interval"
+
+        client.checkpoint({"a": 2}, force=True)
+        assert client.progress.fetch_state() == {"a": 2}
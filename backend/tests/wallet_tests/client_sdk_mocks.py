@@ -89,6 +89,7 @@ class MockTransactionDetails(object):
 class MockSignedTransaction:
     transaction: MockTransactionDetails
     version: Optional[int] = None
+    hash: Optional[str] = None
 
 
 class AccountMocker:
@@ -247,9 +248,10 @@ class DiemNetworkMock(BlockchainMock):
     ) -> List[MockSignedTransaction]:
         result = []
 
+        # versions without a mocked transaction belong to other accounts
         for j in range(start_version, start_version + limit):
-            tx = self.blockchain.transactions[j]
-            result.append(tx)
+            if j in self.blockchain.transactions:
+                result.append(self.blockchain.transactions[j])
 
         return result
 
@@ -0,0 +1,97 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from diem_utils.sdks import liquidity
+from diem_utils.sdks.liquidity import LpClient, shared_session
+from diem_utils.types.liquidity.currency import Currency, CurrencyPair
+from diem_utils.types.liquidity.quote import QuoteData, QuoteId, Rate
+
+# the tests conftest replaces the LpClient methods with a mock
+get_quote = LpClient.get_quote
+get_quotes = LpClient.get_quotes
+
+PAIRS = [
+    CurrencyPair(Currency.XUS, Currency.USD),
+    CurrencyPair(Currency.XUS, Currency.EUR),
+    CurrencyPair(Currency.XUS, Currency.JPY),
+]
+
+
+def quote_dict(base: str, quote: str, amount: int) -> dict:
+    return QuoteData(
+        quote_id=QuoteId(uuid4()),
+        rate=Rate(pair=CurrencyPair(Currency(base), Currency(quote)), rate=1_000_000),
+        expires_at=datetime.now(),
+        amount=amount,
+    ).to_dict(encode_json=True)
+
+
+class SessionStub:
+    def __init__(self, batch: bool) -> None:
+        self.batch = batch
+        self.requests = []
+
+    def request(self, method, url, timeout=None, json=None):
+        self.requests.append((method, url.rsplit("/", 1)[-1], timeout))
+        if url.endswith("/quotes"):
+            if not self.batch:
+                return self.response(404, {})
+            return self.response(
+                200,
+                {
+                    "quotes": [
+                        quote_dict(q["base_currency"], q["quote_currency"], q["amount"])
+                        for q in json["quotes"]
+                    ]
+                },
+            )
+        return self.response(
+            200,
+            quote_dict(json["base_currency"], json["quote_currency"], json["amount"]),
+        )
+
+    @staticmethod
+    def response(status_code: int, body: dict):
+        text = json.dumps(body)
+        return SimpleNamespace(
+            status_code=status_code, text=text, json=lambda: json.loads(text)
+        )
+
+
+def test_clients_share_a_session():
+    assert LpClient()._session is shared_session()
+    assert LpClient()._session is LpClient()._session
+
+
+def test_get_quotes_in_a_single_batch_request():
+    session = SessionStub(batch=True)
+    client = LpClient("http://lp-batch/", session=session)
+
+    quotes = get_quotes(client, PAIRS, 1)
+
+    assert [quote.rate.pair for quote in quotes] == PAIRS
+    assert [r[:2] for r in session.requests] == [("POST", "quotes")]
+    assert session.requests[0][2] == (
+        liquidity.LP_CONNECT_TIMEOUT,
+        liquidity.LP_READ_TIMEOUT,
+    )
+
+
+def test_get_quotes_falls_back_to_concurrent_requests(monkeypatch):
+    monkeypatch.setattr(LpClient, "get_quote", get_quote)
+    session = SessionStub(batch=False)
+    client = LpClient("http://lp-single/", session=session)
+
+    quotes = get_quotes(client, PAIRS, 1)
+    assert [quote.rate.pair for quote in quotes] == PAIRS
+    assert sorted(r[1] for r in session.requests) == ["quote"] * 3 + ["quotes"]
+
+    # the unsupported batch endpoint is not requested again
+    session.requests.clear()
+    get_quotes(client, PAIRS, 1)
+    assert [r[1] for r in session.requests] == ["quote"] * 3
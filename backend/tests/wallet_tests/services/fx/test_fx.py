@@ -3,9 +3,16 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
+import dataclasses
+import threading
+from time import time
+
+import fakeredis
 import pytest
 
+from diem_utils.sdks.liquidity import LpClient, LpError
 from diem_utils.types.liquidity.currency import CurrencyPairs, Currency
+from wallet.services.fx import fx
 from wallet.services.fx.fx import get_rate
 
 rates = {
@@ -35,3 +42,86 @@ def test_get_rate_direct_conversion_odd_currencies():
 def test_get_rate_non_exist_conversion():
     with pytest.raises(LookupError):
         get_rate(Currency.CHF, Currency.NZD).serialize()
+
+
+@pytest.fixture
+def empty_rates(monkeypatch):
+    monkeypatch.setattr(fx, "_table", fx.RateTable(version=0, timestamp=0.0))
+    monkeypatch.setattr(fx, "_shared", None)
+
+
+@pytest.fixture
+def lp_calls(monkeypatch):
+    calls = []
+    get_quotes = LpClient.get_quotes
+
+    def counted(self, pairs, amount):
+        calls.append(pairs)
+        return get_quotes(self, pairs, amount)
+
+    monkeypatch.setattr(LpClient, "get_quotes", counted)
+    return calls
+
+
+def test_rates_are_swapped_as_immutable_versioned_tables(empty_rates, lp_calls):
+    first = fx.current_rates()
+    assert first.version == 1 and len(lp_calls) == 1
+
+    second = fx.update_rates()
+    assert second.version == 2
+    assert fx.current_rates() is second
+    assert first.rates == second.rates
+    with pytest.raises(TypeError):
+        first.rates[str(CurrencyPairs.XUS_USD.value)] = 0
+
+    # served from the table, not from the liquidity provider
+    get_rate(Currency.XUS, Currency.USD)
+    assert len(lp_calls) == 2
+
+
+def test_stale_rates(empty_rates, monkeypatch):
+    table = fx.update_rates()
+    monkeypatch.setattr(
+        fx, "_table", dataclasses.replace(table, timestamp=time() - 1000)
+    )
+
+    assert get_rate(Currency.XUS, Currency.USD).serialize() == 1000000
+
+    monkeypatch.setattr(fx, "FX_STALE_RATES", "fail")
+    with pytest.raises(fx.StaleRatesError):
+        get_rate(Currency.XUS, Currency.USD)
+    assert fx.current_rates(allow_stale=True).version == table.version
+
+
+def test_processes_share_a_single_refresh(empty_rates, lp_calls, monkeypatch):
+    server = fakeredis.FakeServer()
+    fx.use_shared_rates(fx.SharedRates(fakeredis.FakeStrictRedis(server=server)))
+    leader = fx.refresh_rates()
+    assert len(lp_calls) == 1
+
+    # another process
+    monkeypatch.setattr(fx, "_table", fx.RateTable(version=0, timestamp=0.0))
+    fx.use_shared_rates(fx.SharedRates(fakeredis.FakeStrictRedis(server=server)))
+    assert fx.refresh_rates() == leader
+    assert fx.current_rates() == leader
+    assert get_rate(Currency.XUS, Currency.USD).serialize() == 1000000
+    assert len(lp_calls) == 1
+
+
+def test_rates_are_quoted_pair_by_pair_when_the_batch_fails(empty_rates, monkeypatch):
+    batched = fx.update_rates().rates
+    threads = set()
+    get_quote = LpClient.get_quote
+
+    def failed_batch(self, pairs, amount):
+        raise LpError("Failed to get quotes (500)")
+
+    def quote(self, pair, amount):
+        threads.add(threading.get_ident())
+        return get_quote(self, pair, amount)
+
+    monkeypatch.setattr(LpClient, "get_quotes", failed_batch)
+    monkeypatch.setattr(LpClient, "get_quote", quote)
+
+    assert fx.update_rates().rates == batched
+    assert threading.get_ident() not in threads
@@ -0,0 +1,139 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+
+import requests
+from wallet.services.offchain.dispatcher import OutboundDispatcher
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def new_dispatcher(clock=None, **kwargs) -> OutboundDispatcher:
+    options = dict(
+        workers=4,
+        per_destination=2,
+        backoff_base=1,
+        backoff_max=8,
+        breaker_threshold=3,
+        breaker_cooldown=60,
+    )
+    options.update(kwargs)
+    return OutboundDispatcher(clock=clock or Clock(), **options)
+
+
+def test_slow_destination_does_not_block_others():
+    dispatcher = new_dispatcher()
+    release = threading.Event()
+    sent = []
+
+    assert dispatcher.submit("slow-1", "slow", release.wait)
+    assert dispatcher.submit("slow-2", "slow", release.wait)
+    # per destination limit
+    assert not dispatcher.submit("slow-3", "slow", release.wait)
+    # already in flight
+    assert not dispatcher.submit("slow-1", "slow", release.wait)
+
+    fast_sent = threading.Semaphore(0)
+    for i in range(2):
+        assert dispatcher.submit(
+            f"fast-{i}", "fast", lambda i=i: sent.append(i) or fast_sent.release()
+        )
+    assert fast_sent.acquire(timeout=5) and fast_sent.acquire(timeout=5)
+    assert sorted(sent) == [0, 1]
+    assert dispatcher.destinations["slow"].inflight == 2
+
+    release.set()
+    dispatcher.wait()
+    assert dispatcher.destinations["slow"].sent == 2
+    assert dispatcher.destinations["slow"].inflight == 0
+
+
+def test_failed_command_backs_off_exponentially():
+    clock = Clock()
+    dispatcher = new_dispatcher(clock)
+
+    def fail():
+        raise ValueError("rejected")
+
+    for attempt in range(1, 5):
+        assert dispatcher.submit("cmd", "vasp", fail)
+        dispatcher.wait()
+        assert not dispatcher.submit("cmd", "vasp", fail)
+
+        backoff = min(8, 2 ** (attempt - 1))
+        clock.now += backoff / 2 - 0.01
+        assert not dispatcher.submit("cmd", "vasp", fail)
+        clock.now += backoff / 2 + 0.02
+
+    # not a transport failure, the destination stays healthy
+    assert not dispatcher.is_open("vasp")
+    assert dispatcher.submit("cmd", "vasp", lambda: None)
+    dispatcher.wait()
+    assert dispatcher.submit("cmd", "vasp", lambda: None)
+
+
+def test_circuit_opens_after_transport_failures():
+    clock = Clock()
+    dispatcher = new_dispatcher(clock, per_destination=5)
+
+    def unreachable():
+        raise requests.ConnectionError("connection refused")
+
+    for i in range(3):
+        assert dispatcher.submit(f"cmd-{i}", "down", unreachable)
+    dispatcher.wait()
+    assert dispatcher.is_open("down")
+    assert not dispatcher.submit("other", "down", lambda: None)
+    assert dispatcher.submit("other", "up", lambda: None)
+
+    # half-open: a single probe, which fails and re-opens the circuit
+    clock.now += 61
+    release = threading.Event()
+
+    def probe():
+        release.wait()
+        unreachable()
+
+    assert dispatcher.submit("probe", "down", probe)
+    assert not dispatcher.submit("probe-2", "down", lambda: None)
+    release.set()
+    dispatcher.wait()
+    assert dispatcher.is_open("down")
+
+    # a successful probe closes it
+    clock.now += 61
+    assert dispatcher.submit("probe-2", "down", lambda: None)
+    dispatcher.wait()
+    assert not dispatcher.is_open("down")
+    assert dispatcher.submit("probe-3", "down", lambda: None)
+    assert dispatcher.submit("probe-4", "down", lambda: None)
+    dispatcher.wait()
+
+
+def test_commands_of_a_batch_back_off_on_their_own():
+    clock = Clock()
+    dispatcher = new_dispatcher(clock)
+
+    def send_batch():
+        dispatcher.record("cmd-1", None)
+        dispatcher.record("cmd-2", ValueError("rejected"))
+
+    assert dispatcher.submit("batch", "vasp", send_batch)
+    dispatcher.wait()
+    assert not dispatcher.backing_off("cmd-1")
+    assert dispatcher.backing_off("cmd-2")
+    # the batch itself succeeded
+    assert dispatcher.submit("batch", "vasp", lambda: None)
+    dispatcher.wait()
+
+    clock.now += 1
+    assert not dispatcher.backing_off("cmd-2")
+    dispatcher.record("cmd-2", None)
+    assert dispatcher.destinations["vasp"].failures == 0
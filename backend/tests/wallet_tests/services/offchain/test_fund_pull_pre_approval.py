@@ -1,14 +1,18 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
+import re
 from dataclasses import asdict
+from types import SimpleNamespace
 
 import context
 import pytest
+import requests
 from diem import identifier, LocalAccount
 from offchain import (
     FundPullPreApprovalStatus,
 )
 from diem_utils.types.currencies import FiatCurrency, DiemCurrency
+from sqlalchemy import event
 from tests.wallet_tests.resources.seeds.one_funds_pull_pre_approval import (
     OneFundsPullPreApproval,
     TIMESTAMP,
@@ -28,22 +32,30 @@ from wallet.services.offchain.fund_pull_pre_approval import (
     preapproval_command_to_model,
     get_command_from_bech32,
     get_funds_pull_pre_approvals,
+    handle_fund_pull_pre_approval_command,
 )
+from wallet.services.offchain.dispatcher import OutboundDispatcher
 from wallet.services.offchain.fund_pull_pre_approval_sm import (
     FundsPullPreApprovalStateError,
 )
 from wallet.services.offchain.fund_pull_pre_approval_sm import (
     reduce_role,
     all_possible_states,
+    build_role_reducer,
+    state_index,
+    ROLE_TABLE_SIZE,
 )
 from wallet.services.offchain.offchain import (
     process_inbound_command,
 )
 from wallet.storage import (
     db_session,
+    engine,
     User,
     Account,
+    get_account_command_by_id,
     get_command_by_id,
+    get_commands_by_sent_status,
     update_command,
 )
 from wallet.types import RegistrationStatus
@@ -541,6 +553,78 @@ def test_process_inbound_command_as_both__payee_close_valid_request(mock_method)
     payee_close_request_check(mock_method, payee_bech32, payee_user, payer_bech32)
 
 
+def test_inbound_command_reads_storage_with_a_single_query(mock_method):
+    payer_user = generate_mock_user(user_name="payer_user")
+    payer_bech32 = generate_my_address(payer_user)
+    payee_user = generate_mock_user(user_name="payee_user")
+    payee_bech32 = generate_my_address(payee_user)
+    OneFundsPullPreApproval.run(
+        db_session=db_session,
+        address=payer_bech32,
+        biller_address=payee_bech32,
+        funds_pull_pre_approval_id=FUNDS_PULL_PRE_APPROVAL_ID,
+        status=FundPullPreApprovalStatus.pending,
+        account_id=payee_user.account_id,
+        role=Role.PAYEE,
+    )
+    get_account_calls = mock_method(
+        context.get().jsonrpc_client,
+        "get_account",
+        will_return=SimpleNamespace(
+            role=SimpleNamespace(
+                parent_vasp_address=None,
+                base_url=None,
+                compliance_key=None,
+                human_name="Biller",
+            )
+        ),
+    )
+    selects = []
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_selects)
+    try:
+        for status in [
+            FundPullPreApprovalStatus.pending,
+            FundPullPreApprovalStatus.valid,
+        ]:
+            selects.clear()
+            if status == FundPullPreApprovalStatus.valid:
+                # the payer approves in the DB before sending
+                payer_command = get_account_command_by_id(
+                    payer_user.account_id, FUNDS_PULL_PRE_APPROVAL_ID
+                )
+                payer_command.status = status
+                db_session.commit()
+                selects.clear()
+
+            handle_fund_pull_pre_approval_command(
+                generate_funds_pull_pre_approval_command(
+                    address=payer_bech32,
+                    biller_address=payee_bech32,
+                    status=status,
+                )
+            )
+            assert len(selects) == 1, selects
+    finally:
+        event.remove(engine, "before_cursor_execute", count_selects)
+
+    payer_command = get_account_command_by_id(
+        payer_user.account_id, FUNDS_PULL_PRE_APPROVAL_ID
+    )
+    assert payer_command.role == Role.PAYER
+    assert payer_command.biller_name == "Biller"
+    payee_command = get_account_command_by_id(
+        payee_user.account_id, FUNDS_PULL_PRE_APPROVAL_ID
+    )
+    assert payee_command.status == FundPullPreApprovalStatus.valid
+    assert payee_command.approved_at is not None
+    assert len(get_account_calls) == 1
+
+
 def payee_close_request_check(mock_method, payee_bech32, payee_user, payer_bech32):
     # payee generate closed command to payer
     cmd = generate_funds_pull_pre_approval_command(
@@ -815,6 +899,29 @@ def test_role_calculation():
             continue
 
 
+def test_role_table_matches_role_reducer():
+    reducer = build_role_reducer()
+    indexes = set()
+    for state in all_possible_states():
+        indexes.add(state_index(**asdict(state)))
+        try:
+            expected = reducer(state)
+        except FundsPullPreApprovalStateError as e:
+            with pytest.raises(FundsPullPreApprovalStateError, match=re.escape(str(e))):
+                reduce_role(**asdict(state))
+            continue
+
+        assert reduce_role(**asdict(state)) is expected, str(state)
+        # statuses decoded from json are equal, not identical, strings
+        decoded = {
+            k: "".join(v) if isinstance(v, str) else v for k, v in asdict(state).items()
+        }
+        assert reduce_role(**decoded) is expected, str(state)
+
+    assert len(indexes) == ROLE_TABLE_SIZE
+    assert indexes == set(range(ROLE_TABLE_SIZE))
+
+
 def print_expected_combinations(expected_combinations):
     for comb in expected_combinations:
         print(comb)
@@ -881,3 +988,105 @@ def test_outgoing_command_offchain_sent_true(mock_method):
     # One command should be sent
     process_funds_pull_pre_approvals_requests()
     assert len(send_command_calls) == 0
+
+
+def seed_outgoing_commands(payer_user, biller_addresses):
+    address = generate_my_address(payer_user)
+    for i, biller_address in enumerate(biller_addresses):
+        OneFundsPullPreApproval.run(
+            db_session=db_session,
+            funds_pull_pre_approval_id=f"outgoing-{i}",
+            address=address,
+            biller_address=biller_address,
+            status=FundPullPreApprovalStatus.valid,
+            account_id=payer_user.account_id,
+        )
+
+
+def fail_sending(*ids_and_errors):
+    errors = dict(ids_and_errors)
+    sent = []
+
+    def send_command(cmd, *_):
+        fppa_id = cmd.funds_pull_pre_approval.funds_pull_pre_approval_id
+        if fppa_id in errors:
+            raise errors[fppa_id]
+        sent.append(fppa_id)
+
+    return send_command, sent
+
+
+def test_outgoing_commands_failure_does_not_stop_the_others(monkeypatch):
+    payer_user = generate_mock_user(user_name="payer_user")
+    seed_outgoing_commands(
+        payer_user, [generate_my_address(payer_user) for _ in range(3)]
+    )
+    send_command, sent = fail_sending(("outgoing-0", ValueError("invalid")))
+    monkeypatch.setattr(context.get().offchain_client, "send_command", send_command)
+    updates = []
+
+    def count_updates(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            updates.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_updates)
+    try:
+        process_funds_pull_pre_approvals_requests()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_updates)
+
+    assert sorted(sent) == ["outgoing-1", "outgoing-2"]
+    assert len(updates) == 1, updates
+    assert [
+        get_account_command_by_id(payer_user.account_id, f"outgoing-{i}").offchain_sent
+        for i in range(3)
+    ] == [False, True, True]
+
+
+def test_outgoing_commands_are_batched_per_counterparty(monkeypatch):
+    now = [1000.0]
+    dispatcher = OutboundDispatcher(
+        workers=4,
+        per_destination=2,
+        backoff_base=1,
+        backoff_max=8,
+        breaker_threshold=3,
+        breaker_cooldown=60,
+        clock=lambda: now[0],
+    )
+    hrp = context.get().config.diem_address_hrp()
+    up, down = LocalAccount.generate(), LocalAccount.generate()
+    payer_user = generate_mock_user(user_name="payer_user")
+    seed_outgoing_commands(
+        payer_user,
+        [
+            identifier.encode_account(vasp.account_address, None, hrp)
+            for vasp in [up, up, up, down]
+        ],
+    )
+    send_command, sent = fail_sending(
+        ("outgoing-0", ValueError("invalid")),
+        ("outgoing-3", requests.ConnectionError("down")),
+    )
+    monkeypatch.setattr(context.get().offchain_client, "send_command", send_command)
+
+    process_funds_pull_pre_approvals_requests(dispatcher)
+    dispatcher.wait()
+    assert sorted(sent) == ["outgoing-1", "outgoing-2"]
+    # at most per_destination batches per counterparty
+    assert dispatcher.destinations[up.account_address.to_hex()].sent <= 2
+    assert dispatcher.destinations[down.account_address.to_hex()].failures == 1
+    assert dispatcher.backing_off(f"fppa:{payer_user.account_id}:outgoing-0")
+
+    # the failed commands back off instead of being sent every round
+    send_command, sent = fail_sending()
+    monkeypatch.setattr(context.get().offchain_client, "send_command", send_command)
+    process_funds_pull_pre_approvals_requests(dispatcher)
+    dispatcher.wait()
+    assert sent == []
+
+    now[0] += 8
+    process_funds_pull_pre_approvals_requests(dispatcher)
+    dispatcher.wait()
+    assert sorted(sent) == ["outgoing-0", "outgoing-3"]
+    assert get_commands_by_sent_status(False) == []
@@ -1,6 +1,7 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 import dataclasses
+import time
 
 import context
 import wallet.services.offchain.p2p_payment as pc_service
@@ -56,6 +57,132 @@ def test_save_outbound_payment_command(monkeypatch):
         assert model.status == TransactionStatus.OFF_CHAIN_WAIT
 
 
+def test_state_change_enqueues_offchain_task(monkeypatch):
+    user = OneUser.run(
+        db_session, account_amount=100_000_000_000, account_currency=currency
+    )
+    storage.claim_offchain_tasks()
+    cmd = pc_service.save_outbound_payment_command(
+        user.account_id,
+        LocalAccount.generate().account_address,
+        identifier.gen_subaddress(),
+        10_000_000_000,
+        currency,
+    )
+    assert storage.offchain_tasks_committed.is_set()
+    assert storage.count_offchain_tasks() == 1
+
+    with monkeypatch.context() as m:
+        m.setattr(
+            context.get().offchain_client,
+            "send_command",
+            lambda c, _: offchain.reply_request(c.cid),
+        )
+        assert offchain_service.process_offchain_outbox() == 1
+        offchain_service.outbound_dispatcher.wait()
+
+    model = storage.get_payment_command(cmd.reference_id())
+    assert model.status == TransactionStatus.OFF_CHAIN_WAIT
+    # waiting for the counterparty is not actionable
+    assert storage.count_offchain_tasks() == 0
+
+
+def test_offchain_task_of_processed_command_is_ignored(monkeypatch):
+    user = OneUser.run(
+        db_session, account_amount=100_000_000_000, account_currency=currency
+    )
+    cmd = pc_service.save_outbound_payment_command(
+        user.account_id,
+        LocalAccount.generate().account_address,
+        identifier.gen_subaddress(),
+        10_000_000_000,
+        currency,
+    )
+    with monkeypatch.context() as m:
+        m.setattr(
+            context.get().offchain_client,
+            "send_command",
+            lambda c, _: offchain.reply_request(c.cid),
+        )
+        offchain_service.process_offchain_tasks()
+
+    def fail(*args):
+        raise AssertionError("command sent twice")
+
+    with monkeypatch.context() as m:
+        m.setattr(context.get().offchain_client, "send_command", fail)
+        assert offchain_service.process_offchain_task(
+            storage.PAYMENT_TASK, cmd.reference_id()
+        )
+        assert offchain_service.process_offchain_outbox() == 1
+        offchain_service.outbound_dispatcher.wait()
+
+
+def test_failed_send_is_retried_after_its_backoff(monkeypatch):
+    user = OneUser.run(
+        db_session, account_amount=100_000_000_000, account_currency=currency
+    )
+    storage.claim_offchain_tasks()
+    cmd = pc_service.save_outbound_payment_command(
+        user.account_id,
+        LocalAccount.generate().account_address,
+        identifier.gen_subaddress(),
+        10_000_000_000,
+        currency,
+    )
+    sends = []
+
+    def send_command(c, _):
+        sends.append(c)
+        if len(sends) == 1:
+            raise ValueError("rejected")
+        return offchain.reply_request(c.cid)
+
+    deferred = {}
+    with monkeypatch.context() as m:
+        m.setattr(context.get().offchain_client, "send_command", send_command)
+        m.setattr(offchain_service.outbound_dispatcher, "backoff_base", 0.01)
+        assert offchain_service.process_offchain_outbox(deferred) == 1
+        offchain_service.outbound_dispatcher.wait()
+        assert len(deferred) == 1
+
+        time.sleep(0.02)
+        offchain_service.process_offchain_outbox(deferred)
+        offchain_service.outbound_dispatcher.wait()
+        assert len(sends) == 2
+
+    model = storage.get_payment_command(cmd.reference_id())
+    assert model.status == TransactionStatus.OFF_CHAIN_WAIT
+    offchain_service.process_offchain_outbox(deferred)
+    assert deferred == {}
+
+
+def test_single_process_sweeps_offchain_commands(monkeypatch):
+    user = OneUser.run(
+        db_session, account_amount=100_000_000_000, account_currency=currency
+    )
+    cmd = pc_service.save_outbound_payment_command(
+        user.account_id,
+        LocalAccount.generate().account_address,
+        identifier.gen_subaddress(),
+        10_000_000_000,
+        currency,
+    )
+    assert storage.acquire_lease(
+        offchain_service.OFFCHAIN_SWEEP_LEASE, "other-process", 60
+    )
+
+    def fail(*args):
+        raise AssertionError("swept by two processes")
+
+    with monkeypatch.context() as m:
+        m.setattr(context.get().offchain_client, "send_command", fail)
+        assert not offchain_service.process_offchain_tasks_as_leader()
+
+    model = storage.get_payment_command(cmd.reference_id())
+    assert model.status == TransactionStatus.OFF_CHAIN_OUTBOUND
+
+
 def test_process_inbound_payment_command(monkeypatch):
     hrp = context.get().config.diem_address_hrp()
     user = OneUser.run(
@@ -181,3 +308,54 @@ def jsonrpc_txn_sample(*args):
         transaction=jsonrpc.TransactionData(sequence_number=5),
         hash="3232-hash",
     )
+
+
+def test_process_inbound_commands_verifies_each_request(monkeypatch):
+    sender = LocalAccount.generate()
+    hrp = context.get().config.diem_address_hrp()
+    sender_address = identifier.encode_account(sender.account_address, None, hrp)
+    requests = [
+        offchain.PaymentCommand.init(
+            sender_account_id=identifier.encode_account(
+                sender.account_address, identifier.gen_subaddress(), hrp
+            ),
+            sender_kyc_data=offchain.individual_kyc_data(given_name="Tom"),
+            receiver_account_id=identifier.encode_account(
+                context.get().config.vasp_address, identifier.gen_subaddress(), hrp
+            ),
+            amount=1_000_000,
+            currency=currency.value,
+            inbound=True,
+        ).new_request()
+        for _ in range(3)
+    ]
+    requests_bytes = [
+        offchain.jws.serialize(request, sender.private_key.sign) for request in requests
+    ]
+    # signed by another key
+    requests_bytes[1] = offchain.jws.serialize(
+        requests[1], LocalAccount.generate().private_key.sign
+    )
+    processed = []
+
+    def process(request_sender_address, request):
+        processed.append(request.cid)
+        return 200, request.cid.encode()
+
+    with monkeypatch.context() as m:
+        client = context.get().offchain_client
+        m.setattr(
+            client,
+            "get_base_url_and_compliance_key",
+            lambda *_, **__: ("http://vasp", sender.private_key.public_key()),
+        )
+        m.setattr(offchain_service, "_process_inbound_request", process)
+        responses = offchain_service.process_inbound_commands(
+            sender_address, requests_bytes
+        )
+
+    assert processed == [requests[0].cid, requests[2].cid]
+    assert responses[0] == (200, requests[0].cid.encode())
+    assert responses[2] == (200, requests[2].cid.encode())
+    body, _, _ = offchain.jws.deserialize_string(responses[1][1])
+    assert "invalid_jws_signature" in body
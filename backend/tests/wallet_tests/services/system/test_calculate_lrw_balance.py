@@ -2,10 +2,12 @@ from tests.wallet_tests.services.system.utils import (
     add_incoming_transaction_to_db,
     add_outgoing_transaction_to_db,
 )
+from wallet.services.account import get_accounts_balances, get_account_names
 from wallet.services.system import calculate_lrw_balance
+from wallet.types import DiemCurrency
 
 
-def test_calculate_lrw_balance(patch_blockchain):
+def add_transactions():
     add_incoming_transaction_to_db(
         receiver_sub_address="3538b65dede30950",
         amount=2275,
@@ -42,6 +44,22 @@ def test_calculate_lrw_balance(patch_blockchain):
         account_name="test_account_4",
     )
 
+
+def test_calculate_lrw_balance(patch_blockchain):
+    add_transactions()
+
     lrw_balance = calculate_lrw_balance(6)
 
     assert lrw_balance == 475
+
+
+def test_get_accounts_balances(patch_blockchain):
+    add_transactions()
+
+    names = get_account_names()
+    balances = {
+        names[account_id]: balance.total[DiemCurrency.XUS]
+        for account_id, balance in get_accounts_balances(6).items()
+    }
+
+    assert balances == {"test_account": 2275, "test_account_2": -1800}
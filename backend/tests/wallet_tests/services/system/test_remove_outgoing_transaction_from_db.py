@@ -3,12 +3,15 @@ from tests.wallet_tests.services.system.utils import (
     check_number_of_transactions,
 )
 from tests.wallet_tests.services.system.utils import (
+    add_incoming_transaction_to_blockchain,
+    add_outgoing_transaction_to_blockchain,
     add_outgoing_transaction_to_db,
     setup_inventory_with_initial_transaction,
     setup_outgoing_transaction,
 )
 from wallet.services.system import sync_db
-from wallet.storage import Transaction
+from wallet.storage import Transaction, db_session
+from wallet.types import TransactionStatus
 
 OTHER_ADDRESS_1 = "257e50b131150fdb56aeab4ebe4ec2b9"
 OTHER_ADDRESS_2 = "176b73399b04d9231769614cf22fb5df"
@@ -70,3 +73,80 @@ def test_remove_outgoing_transaction_from_db(patch_blockchain) -> None:
     )
 
     assert Transaction.query.filter_by(blockchain_version=NO_CHANGE_VERSION) is not None
+
+
+def test_submitted_transaction_is_kept_until_settled(patch_blockchain) -> None:
+    setup_inventory_with_initial_transaction(
+        patch_blockchain=patch_blockchain,
+        initial_funds=1000,
+        mock_blockchain_initial_balance=1000,
+    )
+    add_outgoing_transaction_to_db(
+        sender_sub_address=SUB_ADDRESS_1,
+        amount=100,
+        receiver_address=OTHER_ADDRESS_1,
+        sequence=1,
+        version=None,
+        account_name="test_account",
+    )
+    submitted = Transaction.query.filter_by(sequence=1).one()
+    submitted.status = TransactionStatus.PENDING
+    db_session.commit()
+
+    sync_db()
+
+    check_number_of_transactions(2)
+    assert Transaction.query.get(submitted.id).status == TransactionStatus.PENDING
+
+
+def test_submitted_transaction_is_settled_by_sync(patch_blockchain) -> None:
+    setup_inventory_with_initial_transaction(
+        patch_blockchain=patch_blockchain,
+        initial_funds=1000,
+        mock_blockchain_initial_balance=875,
+    )
+    add_outgoing_transaction_to_db(
+        sender_sub_address=SUB_ADDRESS_1,
+        amount=100,
+        receiver_address=OTHER_ADDRESS_1,
+        sequence=2,
+        version=None,
+        account_name="test_account",
+    )
+    submitted = Transaction.query.filter_by(sequence=2).one()
+    submitted.status = TransactionStatus.PENDING
+    db_session.commit()
+    # executed, but not confirmed by the tracker yet
+    add_outgoing_transaction_to_blockchain(
+        patch_blockchain=patch_blockchain,
+        sender_sub_address=SUB_ADDRESS_1,
+        amount=100,
+        receiver_address=OTHER_ADDRESS_1,
+        sequence=2,
+        version=2,
+    )
+    add_incoming_transaction_to_blockchain(
+        patch_blockchain=patch_blockchain,
+        receiver_sub_address=SUB_ADDRESS_1,
+        amount=50,
+        sender_address=OTHER_ADDRESS_2,
+        sequence=3,
+        version=3,
+    )
+    setup_outgoing_transaction(
+        patch_blockchain=patch_blockchain,
+        sender_sub_address=SUB_ADDRESS_2,
+        amount=75,
+        receiver_address=OTHER_ADDRESS_2,
+        sequence=5,
+        version=5,
+        name="test_account_2",
+    )
+
+    sync_db()
+
+    check_number_of_transactions(4)
+    settled = Transaction.query.get(submitted.id)
+    assert settled.status == TransactionStatus.COMPLETED
+    assert settled.blockchain_version == 2
+    check_balance(875)
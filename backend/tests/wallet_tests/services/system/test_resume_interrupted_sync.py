@@ -0,0 +1,89 @@
+import pytest
+from diem.jsonrpc import Client as DiemClient
+from tests.wallet_tests.services.system.utils import (
+    add_incoming_transaction_to_blockchain,
+    add_incoming_transaction_to_db,
+    check_balance,
+    check_number_of_transactions,
+    RECEIVED_EVENTS_KEY,
+    setup_inventory_with_initial_transaction,
+)
+from wallet.services import system
+from wallet.services.system import sync_db, version_windows
+from wallet.storage import ChainSyncProgress, ChainSyncVersion, Transaction
+
+OTHER_ADDRESS_1 = "257e50b131150fdb56aeab4ebe4ec2b9"
+OTHER_ADDRESS_2 = "176b73399b04d9231769614cf22fb5df"
+SUB_ADDRESS_1 = "8e298f642d08d1af"
+SUB_ADDRESS_2 = "a4d5bd88ec5be7a8"
+SUB_ADDRESS_3 = "3b3b97168de2f9de"
+
+
+def test_resume_interrupted_sync(patch_blockchain, monkeypatch) -> None:
+    """
+    Setup:
+        DB:
+            1. inventory account with 1 incoming initial transaction of 1000 coins
+            2. 1 user account with incoming transaction missing on chain
+        Blockchain:
+            1. 1 inventory incoming transaction
+            2. 2 users incoming transactions
+    Action: sync_db() interrupted after the first events page, then again
+        1. first run checkpoints the synced page and removes nothing
+        2. second run continues after the checkpoint, adds the transaction
+           with version 20, removes version 25 and clears the checkpoints
+    """
+    setup_inventory_with_initial_transaction(
+        patch_blockchain, 1000, mock_blockchain_initial_balance=1300
+    )
+    add_incoming_transaction_to_db(
+        receiver_sub_address=SUB_ADDRESS_3,
+        amount=25,
+        sender_address=OTHER_ADDRESS_1,
+        sequence=25,
+        version=25,
+        account_name="test_account_3",
+    )
+    add_incoming_transaction_to_blockchain(
+        patch_blockchain, SUB_ADDRESS_1, 100, OTHER_ADDRESS_1, 1, 10
+    )
+    add_incoming_transaction_to_blockchain(
+        patch_blockchain, SUB_ADDRESS_2, 200, OTHER_ADDRESS_2, 2, 20
+    )
+
+    monkeypatch.setattr(system, "CHAIN_PAGE_SIZE", 2)
+    get_transactions = patch_blockchain.get_transactions
+
+    def interrupted_get_transactions(client, start_version, limit):
+        if start_version == 20:
+            raise ConnectionError("interrupted by test setup")
+        return get_transactions(start_version, limit)
+
+    monkeypatch.setattr(DiemClient, "get_transactions", interrupted_get_transactions)
+    with pytest.raises(ConnectionError):
+        sync_db()
+
+    check_number_of_transactions(3)
+    assert Transaction.query.filter_by(blockchain_version=10).first() is not None
+    progress = ChainSyncProgress.query.get(RECEIVED_EVENTS_KEY)
+    assert progress.next_seq == 2
+    assert {row.version for row in ChainSyncVersion.query} == {0, 10}
+
+    monkeypatch.setattr(DiemClient, "get_transactions", get_transactions)
+    sync_db()
+
+    check_number_of_transactions(3)
+    check_balance(1300)
+    assert Transaction.query.filter_by(blockchain_version=25).first() is None
+    assert Transaction.query.filter_by(blockchain_version=20).first() is not None
+    assert ChainSyncProgress.query.count() == 0
+    assert ChainSyncVersion.query.count() == 0
+
+
+def test_version_windows(monkeypatch) -> None:
+    monkeypatch.setattr(system, "SYNC_MAX_VERSION_GAP", 2)
+    monkeypatch.setattr(system, "CHAIN_PAGE_SIZE", 5)
+
+    assert version_windows([]) == []
+    assert version_windows([7, 1, 2, 4, 5, 9, 10, 11]) == [(1, 5), (7, 5)]
+    assert version_windows([1, 20]) == [(1, 1), (20, 1)]
@@ -0,0 +1,85 @@
+from tests.wallet_tests.services.system.utils import (
+    add_incoming_transaction_to_blockchain,
+    add_incoming_transaction_to_db,
+    check_number_of_transactions,
+    RECEIVED_EVENTS_KEY,
+    SENT_EVENTS_KEY,
+    setup_inventory_with_initial_transaction,
+)
+from wallet.services import system
+from wallet.services.system import sync_new_events
+from wallet.storage import ChainSyncWatermark, Transaction, acquire_lease
+
+OTHER_ADDRESS_1 = "257e50b131150fdb56aeab4ebe4ec2b9"
+OTHER_ADDRESS_2 = "176b73399b04d9231769614cf22fb5df"
+SUB_ADDRESS_1 = "8e298f642d08d1af"
+SUB_ADDRESS_2 = "a4d5bd88ec5be7a8"
+SUB_ADDRESS_3 = "3b3b97168de2f9de"
+
+
+def test_sync_new_events(patch_blockchain) -> None:
+    """
+    Setup:
+        DB:
+            1. inventory account with 1 incoming initial transaction of 1000 coins
+            2. 1 user account with incoming transaction missing on chain
+        Blockchain:
+            1. 1 inventory incoming transaction
+            2. 1 user incoming transaction older than the latest DB version
+            3. 1 user incoming transaction newer than the latest DB version
+    Action: sync_new_events() expected:
+        1. Add transaction with version 10, leave version 30 to pubsub
+        2. Keep transaction with version 25, removal is left to sync_db
+        3. Move the watermark past version 10 only
+    """
+    setup_inventory_with_initial_transaction(
+        patch_blockchain, 1000, mock_blockchain_initial_balance=1300
+    )
+    add_incoming_transaction_to_db(
+        receiver_sub_address=SUB_ADDRESS_3,
+        amount=25,
+        sender_address=OTHER_ADDRESS_1,
+        sequence=25,
+        version=25,
+        account_name="test_account_3",
+    )
+    add_incoming_transaction_to_blockchain(
+        patch_blockchain, SUB_ADDRESS_1, 100, OTHER_ADDRESS_1, 1, 10
+    )
+    add_incoming_transaction_to_blockchain(
+        patch_blockchain, SUB_ADDRESS_2, 200, OTHER_ADDRESS_2, 2, 30
+    )
+
+    sync_new_events()
+
+    check_number_of_transactions(3)
+    assert Transaction.query.filter_by(blockchain_version=10).first() is not None
+    assert Transaction.query.filter_by(blockchain_version=30).first() is None
+
+    watermark = ChainSyncWatermark.query.get(RECEIVED_EVENTS_KEY)
+    assert watermark.next_seq == 2
+    assert watermark.version == 10
+    assert ChainSyncWatermark.query.get(SENT_EVENTS_KEY).next_seq == 0
+    assert system.metrics.last_sync_events == 2
+
+    # nothing new up to the latest DB version, the next run starts at the watermark
+    sync_new_events()
+
+    check_number_of_transactions(3)
+    assert system.metrics.last_sync_events == 0
+
+
+def test_sync_is_skipped_while_another_process_syncs(patch_blockchain) -> None:
+    setup_inventory_with_initial_transaction(
+        patch_blockchain, 1000, mock_blockchain_initial_balance=1100
+    )
+    add_incoming_transaction_to_blockchain(
+        patch_blockchain, SUB_ADDRESS_1, 100, OTHER_ADDRESS_1, 1, 10
+    )
+    assert acquire_lease(system.SYNC_DB_LEASE, "other-process", 60)
+
+    sync_new_events()
+    system.sync_db()
+
+    check_number_of_transactions(1)
+    assert ChainSyncWatermark.query.count() == 0
@@ -3,9 +3,19 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
+from datetime import datetime, timedelta
+
+import pytest
+from diem_utils.types.currencies import DiemCurrency, FiatCurrency
 from tests.wallet_tests.resources.seeds.one_user_seeder import OneUser
 from wallet.services import account as account_service
-from wallet.storage import db_session, User
+from wallet.storage import db_session, User, Transaction, add_transaction
+from wallet.types import (
+    TransactionDirection,
+    TransactionSortOption,
+    TransactionStatus,
+    TransactionType,
+)
 
 
 def test_account_viewable_by_same_user():
@@ -36,3 +46,151 @@ def test_account_viewable_by_admin():
     assert account_service.is_user_allowed_for_account(
         account_name=account_name, user=user
     )
+
+
+def add_transactions(account_id: int, other_account_id: int) -> None:
+    start = datetime(2021, 1, 1)
+    for i in range(10):
+        # amounts 0..900 alternating between received and sent
+        received = i % 2 == 0
+        add_transaction(
+            amount=i * 100,
+            currency=DiemCurrency.XUS,
+            payment_type=TransactionType.INTERNAL,
+            status=TransactionStatus.COMPLETED,
+            source_id=other_account_id if received else account_id,
+            destination_id=account_id if received else other_account_id,
+        )
+    # make created_timestamp deterministic and with a tie
+    for i, tx in enumerate(Transaction.query.order_by(Transaction.amount)):
+        tx.created_timestamp = start + timedelta(days=i // 2)
+    db_session.commit()
+
+
+def read_pages(account_id, limit, **kwargs):
+    ids, cursor = [], None
+    while True:
+        page = account_service.get_account_transactions(
+            account_id=account_id, limit=limit, cursor=cursor, **kwargs
+        )
+        ids.extend(tx.id for tx in page)
+        if len(page) < limit:
+            return ids
+        cursor = account_service.transactions_cursor(
+            account_id, kwargs.get("sort"), page[-1]
+        )
+
+
+def test_get_account_transactions_pages():
+    user = OneUser.run(db_session)
+    other = OneUser.run(db_session, account_name="other", username="other")
+    add_transactions(user.account_id, other.account_id)
+
+    for sort in [None] + list(TransactionSortOption):
+        for direction in [None] + list(TransactionDirection):
+            everything = account_service.get_account_transactions(
+                account_id=user.account_id, sort=sort, direction_filter=direction
+            )
+            assert read_pages(
+                user.account_id, 3, sort=sort, direction_filter=direction
+            ) == [tx.id for tx in everything]
+
+    newest_first = account_service.get_account_transactions(account_id=user.account_id)
+    assert len(newest_first) == 10
+    assert [tx.created_timestamp for tx in newest_first] == sorted(
+        [tx.created_timestamp for tx in newest_first], reverse=True
+    )
+
+    received = account_service.get_account_transactions(
+        account_id=user.account_id,
+        direction_filter=TransactionDirection.RECEIVED,
+        sort=TransactionSortOption.DIEM_AMOUNT_ASC,
+        limit=3,
+    )
+    assert [tx.amount for tx in received] == [0, 200, 400]
+    assert all(tx.destination_id == user.account_id for tx in received)
+
+
+def test_get_account_transactions_rejects_foreign_cursor():
+    user = OneUser.run(db_session)
+    other = OneUser.run(db_session, account_name="other", username="other")
+    add_transactions(user.account_id, other.account_id)
+    tx = account_service.get_account_transactions(account_id=user.account_id)[0]
+    cursor = account_service.transactions_cursor(user.account_id, None, tx)
+
+    with pytest.raises(ValueError):
+        account_service.get_account_transactions(
+            account_id=user.account_id,
+            sort=TransactionSortOption.DIEM_AMOUNT_ASC,
+            cursor=cursor,
+        )
+    with pytest.raises(ValueError):
+        account_service.get_account_transactions(
+            account_id=user.account_id, cursor="not a cursor"
+        )
+
+
+def test_fiat_amount_sort_uses_integer_rate_snapshot():
+    user = OneUser.run(db_session)
+    other = OneUser.run(db_session, account_name="other", username="other")
+    add_transactions(user.account_id, other.account_id)
+
+    rates = account_service.get_fiat_rate_snapshot(FiatCurrency.JPY)
+    assert rates.rates == {DiemCurrency.XUS.value: 107_500_000}
+    assert rates.fiat_amount_key(200, DiemCurrency.XUS.value) == 21_500_000_000
+
+    txs = account_service.get_account_transactions(
+        account_id=user.account_id,
+        sort=TransactionSortOption.FIAT_AMOUNT_DESC,
+        limit=4,
+        rates=rates,
+    )
+    assert [tx.amount for tx in txs] == [900, 800, 700, 600]
+
+    cursor = account_service.transactions_cursor(
+        user.account_id, TransactionSortOption.FIAT_AMOUNT_DESC, txs[-1], rates
+    )
+    next_page = account_service.get_account_transactions(
+        account_id=user.account_id,
+        sort=TransactionSortOption.FIAT_AMOUNT_DESC,
+        limit=4,
+        cursor=cursor,
+        rates=rates,
+    )
+    assert [tx.amount for tx in next_page] == [500, 400, 300, 200]
+
+
+def test_fiat_amount_sort_pages_keep_first_page_rates():
+    user = OneUser.run(db_session)
+    other = OneUser.run(db_session, account_name="other", username="other")
+    add_transactions(user.account_id, other.account_id)
+
+    rates = account_service.get_fiat_rate_snapshot(FiatCurrency.JPY)
+    txs = account_service.get_account_transactions(
+        account_id=user.account_id,
+        sort=TransactionSortOption.FIAT_AMOUNT_DESC,
+        limit=4,
+        rates=rates,
+    )
+    cursor = account_service.transactions_cursor(
+        user.account_id, TransactionSortOption.FIAT_AMOUNT_DESC, txs[-1], rates
+    )
+    assert (
+        account_service.get_cursor_rate_snapshot(
+            TransactionSortOption.FIAT_AMOUNT_DESC, cursor
+        )
+        == rates
+    )
+
+    # the rates moved between the pages
+    moved = account_service.FiatRateSnapshot(
+        fiat_currency=FiatCurrency.JPY, rates={DiemCurrency.XUS.value: 1}
+    )
+    next_page = account_service.get_account_transactions(
+        account_id=user.account_id,
+        sort=TransactionSortOption.FIAT_AMOUNT_DESC,
+        limit=4,
+        cursor=cursor,
+        rates=moved,
+    )
+    assert [tx.amount for tx in next_page] == [500, 400, 300, 200]
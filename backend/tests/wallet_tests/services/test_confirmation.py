@@ -0,0 +1,232 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+from types import SimpleNamespace
+
+import context
+import pytest
+from diem import jsonrpc, utils
+from diem_utils.types.currencies import DiemCurrency
+from wallet import storage
+from wallet.services.confirmation import (
+    TRACKER_LEASE,
+    TRANSACTION_RESUBMIT_LIMIT,
+    confirm_submitted_transactions,
+    confirm_submitted_transactions_as_leader,
+)
+from wallet.services.transaction import submit_onchain
+from wallet.types import TransactionStatus, TransactionType
+
+NOW_SECS = 1_600_000_000
+
+real_time = time.time
+
+
+class JsonRpcClientStub:
+    def __init__(self, address: str) -> None:
+        self.address = address
+        self.chain_sequence = 0
+        self.executed = {}
+        self.submitted = []
+        self.submitted_hashes = []
+        self.scans = 0
+        self.submit_error = None
+        self.now_secs = NOW_SECS
+
+    def get_account_sequence(self, address) -> int:
+        return self.chain_sequence
+
+    def submit(self, txn) -> None:
+        if self.submit_error:
+            raise self.submit_error
+        self.submitted.append(int(txn.raw_txn.sequence_number))
+        self.submitted_hashes.append(utils.transaction_hash(txn))
+
+    def get_account_transactions(self, address, sequence, limit):
+        self.scans += 1
+        return [
+            self.executed[seq]
+            for seq in range(sequence, sequence + limit)
+            if seq in self.executed
+        ]
+
+    def get_last_known_state(self):
+        return SimpleNamespace(timestamp_usecs=self.now_secs * 1_000_000)
+
+    def execute(
+        self,
+        seq: int,
+        version: int,
+        vm_status=jsonrpc.VM_STATUS_EXECUTED,
+        txn_hash=None,
+    ):
+        self.executed[seq] = SimpleNamespace(
+            version=version,
+            hash=txn_hash,
+            vm_status=SimpleNamespace(type=vm_status),
+            transaction=SimpleNamespace(sender=self.address, sequence_number=seq),
+        )
+        self.chain_sequence = max(self.chain_sequence, seq + 1)
+
+
+@pytest.fixture
+def rpc() -> JsonRpcClientStub:
+    ctx = context.get()
+    ctx.jsonrpc_client = JsonRpcClientStub(ctx.config.vasp_account_address().to_hex())
+    return ctx.jsonrpc_client
+
+
+def add_submitted_transaction(
+    sequence: int, expiration_timestamp_secs: int, transaction_hash=None
+) -> int:
+    tx = storage.add_transaction(
+        amount=100,
+        currency=DiemCurrency.XUS,
+        payment_type=TransactionType.EXTERNAL,
+        status=TransactionStatus.PENDING,
+        destination_address="c513562a07b06203acfe83b956ddaef4",
+        destination_subaddress="8e298f642d08d1af",
+        source_subaddress="f4cd2d8a18cfd8a1",
+        sequence=sequence,
+    )
+    storage.update_transaction(
+        tx.id,
+        expiration_timestamp_secs=expiration_timestamp_secs,
+        transaction_hash=transaction_hash,
+    )
+    return tx.id
+
+
+def test_submit_unknown_outcome_is_left_to_tracker(rpc):
+    rpc.submit_error = ConnectionError("timed out")
+    tx = storage.add_transaction(
+        amount=100,
+        currency=DiemCurrency.XUS,
+        payment_type=TransactionType.EXTERNAL,
+        status=TransactionStatus.PENDING,
+        destination_address="c513562a07b06203acfe83b956ddaef4",
+        destination_subaddress="8e298f642d08d1af",
+        source_subaddress="f4cd2d8a18cfd8a1",
+    )
+
+    assert submit_onchain(tx.id) is None
+
+    tx = storage.get_single_transaction(tx.id)
+    assert tx.status == TransactionStatus.PENDING
+    assert tx.sequence == 0
+    assert tx.expiration_timestamp_secs is not None
+
+
+def test_confirm_submitted_transactions_in_one_scan(rpc):
+    executed = add_submitted_transaction(0, NOW_SECS + 30)
+    failed = add_submitted_transaction(1, NOW_SECS + 30)
+    waiting = add_submitted_transaction(2, NOW_SECS + 30)
+    also_executed = add_submitted_transaction(3, NOW_SECS + 30)
+    rpc.execute(0, version=42)
+    rpc.execute(1, version=43, vm_status="move_abort")
+    rpc.execute(3, version=45)
+
+    assert confirm_submitted_transactions() == 3
+    assert rpc.scans == 1
+
+    def status(transaction_id):
+        return storage.get_single_transaction(transaction_id).status
+
+    assert status(executed) == TransactionStatus.COMPLETED
+    assert status(also_executed) == TransactionStatus.COMPLETED
+    assert storage.get_single_transaction(executed).blockchain_version == 42
+    assert status(failed) == TransactionStatus.CANCELED
+    assert status(waiting) == TransactionStatus.PENDING
+
+    assert confirm_submitted_transactions() == 0
+    rpc.execute(2, version=44)
+    assert confirm_submitted_transactions() == 1
+    assert status(waiting) == TransactionStatus.COMPLETED
+    assert confirm_submitted_transactions() == 0
+    assert rpc.scans == 3
+
+
+def test_expired_transaction_is_resubmitted_then_canceled(rpc):
+    ctx = context.get()
+    address = ctx.config.vasp_account_address().to_hex()
+    ctx.sequence_allocator.reset(address, 3, ctx.sequence_allocator.peek(address))
+    rpc.chain_sequence = 2
+    expired = add_submitted_transaction(2, NOW_SECS - 1)
+
+    for resubmit in range(1, TRANSACTION_RESUBMIT_LIMIT + 1):
+        assert confirm_submitted_transactions() == 1
+
+        tx = storage.get_single_transaction(expired)
+        assert tx.status == TransactionStatus.PENDING
+        assert tx.resubmit_count == resubmit
+        # the sequence number left unused is reserved again
+        assert tx.sequence == 2
+        assert rpc.submitted[-1] == 2
+        rpc.now_secs = tx.expiration_timestamp_secs
+
+    assert confirm_submitted_transactions() == 1
+    assert storage.get_single_transaction(expired).status == (
+        TransactionStatus.CANCELED
+    )
+    assert ctx.sequence_allocator.reserve(address, lambda: 0) == 2
+
+
+def test_sequence_is_not_reset_while_a_transaction_waits(rpc):
+    ctx = context.get()
+    address = ctx.config.vasp_account_address().to_hex()
+    ctx.sequence_allocator.reset(address, 4, ctx.sequence_allocator.peek(address))
+    rpc.chain_sequence = 2
+    expired = add_submitted_transaction(2, NOW_SECS - 1)
+    waiting = add_submitted_transaction(3, NOW_SECS + 30)
+
+    assert confirm_submitted_transactions() == 1
+    # 3 may still be executed, the expired transaction takes a new number
+    assert storage.get_single_transaction(expired).sequence == 4
+    assert storage.get_single_transaction(waiting).sequence == 3
+    assert ctx.sequence_allocator.peek(address) == 5
+
+
+def test_transaction_is_matched_by_hash(rpc):
+    replaced = add_submitted_transaction(2, NOW_SECS + 30, transaction_hash="aa")
+    executed = add_submitted_transaction(3, NOW_SECS + 30, transaction_hash="bb")
+    # another transaction took sequence number 2
+    rpc.execute(2, version=42, txn_hash="cc")
+    rpc.execute(3, version=43, txn_hash="bb")
+
+    assert confirm_submitted_transactions() == 2
+
+    tx = storage.get_single_transaction(executed)
+    assert tx.status == TransactionStatus.COMPLETED
+    assert tx.blockchain_version == 43
+    tx = storage.get_single_transaction(replaced)
+    assert tx.status == TransactionStatus.PENDING
+    assert tx.blockchain_version is None
+    assert tx.resubmit_count == 1
+    assert tx.transaction_hash == rpc.submitted_hashes[-1]
+
+
+def test_expired_transaction_is_claimed_once(rpc):
+    expired = add_submitted_transaction(2, NOW_SECS - 1)
+
+    # two trackers read the row before either released it
+    assert storage.release_expired_transactions({expired: 2}) == [expired]
+    assert storage.release_expired_transactions({expired: 2}) == []
+
+    tx = storage.get_single_transaction(expired)
+    assert tx.sequence is None
+    assert tx.resubmit_count == 1
+
+
+def test_single_tracker_holds_the_lease(rpc, monkeypatch):
+    add_submitted_transaction(0, NOW_SECS + 30)
+    rpc.execute(0, version=42)
+    assert storage.acquire_lease(TRACKER_LEASE, "other-process", 10)
+
+    assert confirm_submitted_transactions_as_leader() == 0
+    assert rpc.scans == 0
+
+    # the other process stopped renewing it
+    monkeypatch.setattr(time, "time", lambda: real_time() + 11)
+    assert confirm_submitted_transactions_as_leader() == 1
+    assert not storage.acquire_lease(TRACKER_LEASE, "other-process", 10)
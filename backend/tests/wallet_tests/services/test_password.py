@@ -0,0 +1,76 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+
+import pytest
+from wallet import types
+from wallet.services import user as user_service
+from wallet.services.password import PasswordHasher, PasswordHashingBusyError
+
+PASSWORD = "supersecurepassword"
+USER_NAME = "fakeuserid"
+
+
+def test_hash_and_verify_in_worker_pool() -> None:
+    hasher = PasswordHasher(iterations=1_000, workers=1, queue_size=1)
+
+    password_hash, salt = hasher.hash(PASSWORD)
+
+    assert password_hash.startswith("pbkdf2_sha256$1000$")
+    assert hasher.verify(PASSWORD, password_hash, salt)
+    assert not hasher.verify("wrongpassword", password_hash, salt)
+    assert not hasher.needs_rehash(password_hash)
+    # not forked from the threads of the web process
+    assert hasher._executor._mp_context.get_start_method() == "spawn"
+
+
+def test_verify_legacy_hash() -> None:
+    hasher = PasswordHasher(iterations=1_000, workers=0)
+    salt = bytes(32)
+    legacy_hash = hashlib.pbkdf2_hmac("sha256", PASSWORD.encode(), salt, 100_000)
+
+    assert hasher.verify(PASSWORD, legacy_hash.hex(), salt.hex())
+    assert hasher.needs_rehash(legacy_hash.hex())
+
+
+def test_saturated_pool_rejects_without_waiting() -> None:
+    hasher = PasswordHasher(iterations=1_000, workers=1, queue_size=0)
+
+    hasher._slots.acquire()
+    with pytest.raises(PasswordHashingBusyError):
+        hasher.hash(PASSWORD)
+
+    hasher._slots.release()
+    password_hash, salt = hasher.hash(PASSWORD)
+    assert hasher.verify(PASSWORD, password_hash, salt)
+
+
+def test_login_rehashes_password_with_current_parameters(monkeypatch) -> None:
+    monkeypatch.setattr(
+        user_service, "password_hasher", PasswordHasher(iterations=1_000, workers=0)
+    )
+    user_id = user_service.create_new_user(USER_NAME, PASSWORD)
+
+    monkeypatch.setattr(
+        user_service, "password_hasher", PasswordHasher(iterations=2_000, workers=0)
+    )
+    assert (
+        user_service.authorize(username=USER_NAME, password="wrongpassword")
+        == types.LoginError.WRONG_PASSWORD
+    )
+    assert user_service.get_user(user_id).password_hash.startswith(
+        "pbkdf2_sha256$1000$"
+    )
+
+    assert (
+        user_service.authorize(username=USER_NAME, password=PASSWORD)
+        == types.LoginError.SUCCESS
+    )
+    assert user_service.get_user(user_id).password_hash.startswith(
+        "pbkdf2_sha256$2000$"
+    )
+    assert (
+        user_service.authorize(username=USER_NAME, password=PASSWORD)
+        == types.LoginError.SUCCESS
+    )
@@ -0,0 +1,172 @@
+# pyre-ignore-all-errors
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+from dataclasses import replace
+from datetime import date
+from time import time
+
+import fakeredis
+import pytest
+
+from wallet.services import user as user_service
+from wallet.services.account import create_account
+from wallet.services.token_cache import (
+    AccountSnapshot,
+    TokenCache,
+    UserSnapshot,
+    token_cache,
+)
+from wallet.storage import get_user
+
+PASSWORD = "supersecurepassword"
+USER_NAME = "fakeuserid"
+
+
+@pytest.fixture
+def token_id():
+    token_cache.clear()
+    user_id = user_service.create_new_user(USER_NAME, PASSWORD)
+    yield user_service.add_token(user_id)
+    token_cache.clear()
+
+
+def no_db(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("token should be served from the cache")
+
+    monkeypatch.setattr(user_service, "get_token", fail)
+    monkeypatch.setattr(user_service, "get_user", fail)
+
+
+def test_valid_token_is_served_from_cache(token_id, monkeypatch) -> None:
+    snapshot = user_service.get_user_snapshot_by_token(token_id)
+    assert snapshot.username == USER_NAME
+
+    no_db(monkeypatch)
+    assert user_service.is_valid_token(token_id)
+    assert user_service.get_user_snapshot_by_token(token_id) == snapshot
+
+
+def test_unknown_token_is_not_cached() -> None:
+    assert user_service.get_user_snapshot_by_token("unknown") is None
+    assert token_cache.get("unknown") is None
+
+
+def test_logout_invalidates_token(token_id) -> None:
+    assert user_service.is_valid_token(token_id)
+    user_service.revoke_token(token_id)
+    assert not user_service.is_valid_token(token_id)
+
+
+def test_block_user_invalidates_tokens(token_id) -> None:
+    snapshot = user_service.get_user_snapshot_by_token(token_id)
+    user_service.block_user(snapshot.id)
+    assert not user_service.is_valid_token(token_id)
+
+
+def test_password_change_invalidates_tokens(token_id) -> None:
+    snapshot = user_service.get_user_snapshot_by_token(token_id)
+    user_service.update_password(snapshot.id, "updatedsupersecurepassword")
+    assert token_cache.get(token_id) is None
+
+
+def test_user_changes_refresh_snapshot(token_id) -> None:
+    snapshot = user_service.get_user_snapshot_by_token(token_id)
+    assert snapshot.account is None
+
+    create_account(account_name="test_account", user_id=snapshot.id)
+    user_service.update_user(snapshot.id, selected_language="fr")
+
+    snapshot = user_service.get_user_snapshot_by_token(token_id)
+    assert snapshot.account.name == "test_account"
+    assert snapshot.account_id == snapshot.account.id
+    assert snapshot.selected_language == "fr"
+
+
+def test_lru_is_bounded() -> None:
+    cache = TokenCache(size=2, ttl=60)
+    snapshot = UserSnapshot.from_user(
+        get_user(user_service.create_new_user(USER_NAME, PASSWORD))
+    )
+    expiration_time = time() + 60
+
+    cache.put("a", snapshot, expiration_time)
+    cache.put("b", snapshot, expiration_time)
+    cache.get("a")
+    cache.put("c", snapshot, expiration_time)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_redis_tier_is_shared() -> None:
+    redis_client = fakeredis.FakeStrictRedis()
+    cache_1 = TokenCache(ttl=60, redis_client=redis_client, local_ttl=0)
+    cache_2 = TokenCache(ttl=60, redis_client=redis_client, local_ttl=0)
+    snapshot = UserSnapshot.from_user(
+        get_user(user_service.create_new_user(USER_NAME, PASSWORD))
+    )
+
+    cache_1.put("token", snapshot, time() + 60)
+    assert cache_2.get("token")[0] == snapshot
+
+    cache_1.invalidate_user(snapshot.id)
+    assert cache_2.get("token") is None
+
+
+def test_redis_tier_stores_json() -> None:
+    redis_client = fakeredis.FakeStrictRedis()
+    cache_1 = TokenCache(ttl=60, redis_client=redis_client, local_ttl=0)
+    cache_2 = TokenCache(ttl=60, redis_client=redis_client, local_ttl=0)
+    snapshot = replace(
+        UserSnapshot.from_user(
+            get_user(user_service.create_new_user(USER_NAME, PASSWORD))
+        ),
+        dob=date(1990, 1, 2),
+        account=AccountSnapshot(id=7, name="account"),
+    )
+    expiration_time = time() + 60
+
+    cache_1.put("token", snapshot, expiration_time)
+    assert cache_2.get("token") == (snapshot, expiration_time)
+
+    value = json.loads(redis_client.get(TokenCache._redis_token_key("token")))
+    assert value["user"]["dob"] == "1990-01-02"
+
+    # entries of an older format are cache misses
+    redis_client.set(TokenCache._redis_token_key("old"), b"\x80\x04\x95")
+    assert cache_2.get("old") is None
+
+
+def test_stale_snapshot_is_not_cached() -> None:
+    cache = TokenCache(ttl=60)
+    snapshot = UserSnapshot.from_user(
+        get_user(user_service.create_new_user(USER_NAME, PASSWORD))
+    )
+    generation = cache.generation(snapshot.id)
+    # the user is changed while the snapshot is loaded
+    cache.invalidate_user(snapshot.id)
+
+    cache.put("token", snapshot, time() + 60, generation)
+    assert cache.get("token") is None
+
+    cache.put("token", snapshot, time() + 60, cache.generation(snapshot.id))
+    assert cache.get("token") is not None
+
+
+def test_stale_snapshot_is_not_shared() -> None:
+    redis_client = fakeredis.FakeStrictRedis()
+    cache_1 = TokenCache(ttl=60, redis_client=redis_client, local_ttl=0)
+    cache_2 = TokenCache(ttl=60, redis_client=redis_client, local_ttl=0)
+    snapshot = UserSnapshot.from_user(
+        get_user(user_service.create_new_user(USER_NAME, PASSWORD))
+    )
+    generation = cache_1.generation(snapshot.id)
+    cache_2.invalidate_user(snapshot.id)
+
+    cache_1.put("token", snapshot, time() + 60, generation)
+    assert cache_2.get("token") is None
@@ -0,0 +1,121 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+from diem_utils.types.currencies import DiemCurrency
+from tests.wallet_tests.resources.seeds.one_user_seeder import OneUser
+from wallet.services.account import (
+    calc_account_balance,
+    get_ledger_balance,
+    reconcile_account_balances,
+)
+from wallet.storage import (
+    AccountBalance,
+    add_transaction,
+    db_session,
+    delete_transaction_by_id,
+    get_account_transactions,
+    update_transaction,
+)
+from wallet.storage.setup import backfill_account_balances
+from wallet.types import TransactionStatus, TransactionType
+
+
+def assert_ledger_matches_history(account_id):
+    ledger = get_ledger_balance(account_id)
+    history = calc_account_balance(
+        account_id=account_id, transactions=get_account_transactions(account_id)
+    )
+
+    assert ledger.total == history.total
+    assert ledger.frozen == history.frozen
+
+
+def test_ledger_follows_transaction_changes():
+    sender = OneUser.run(
+        db_session, account_amount=1000, account_currency=DiemCurrency.XUS
+    )
+    receiver = OneUser.run(db_session, account_name="receiver", username="receiver")
+
+    tx = add_transaction(
+        amount=300,
+        currency=DiemCurrency.XUS,
+        payment_type=TransactionType.INTERNAL,
+        status=TransactionStatus.PENDING,
+        source_id=sender.account_id,
+        destination_id=receiver.account_id,
+    )
+
+    assert get_ledger_balance(sender.account_id).total[DiemCurrency.XUS] == 700
+    assert get_ledger_balance(sender.account_id).frozen[DiemCurrency.XUS] == 300
+    assert get_ledger_balance(receiver.account_id).total[DiemCurrency.XUS] == 0
+
+    update_transaction(tx.id, status=TransactionStatus.COMPLETED)
+
+    assert get_ledger_balance(sender.account_id).frozen[DiemCurrency.XUS] == 0
+    assert get_ledger_balance(receiver.account_id).total[DiemCurrency.XUS] == 300
+    assert_ledger_matches_history(sender.account_id)
+    assert_ledger_matches_history(receiver.account_id)
+
+    delete_transaction_by_id(tx.id)
+
+    assert get_ledger_balance(sender.account_id).total[DiemCurrency.XUS] == 1000
+    assert get_ledger_balance(receiver.account_id).total[DiemCurrency.XUS] == 0
+
+
+def test_canceled_transaction_releases_funds():
+    sender = OneUser.run(
+        db_session, account_amount=1000, account_currency=DiemCurrency.XUS
+    )
+
+    tx = add_transaction(
+        amount=400,
+        currency=DiemCurrency.XUS,
+        payment_type=TransactionType.EXTERNAL,
+        status=TransactionStatus.PENDING,
+        source_id=sender.account_id,
+        destination_address="257e50b131150fdb56aeab4ebe4ec2b9",
+    )
+    update_transaction(tx.id, status=TransactionStatus.CANCELED)
+
+    balance = get_ledger_balance(sender.account_id)
+    assert balance.total[DiemCurrency.XUS] == 1000
+    assert balance.frozen[DiemCurrency.XUS] == 0
+    assert_ledger_matches_history(sender.account_id)
+
+
+def test_reconcile_reports_and_rebuilds_drift():
+    user = OneUser.run(
+        db_session, account_amount=1000, account_currency=DiemCurrency.XUS
+    )
+    assert reconcile_account_balances() == []
+
+    AccountBalance.query.filter_by(account_id=user.account_id).update({"total": 5})
+    db_session.commit()
+
+    drifts = reconcile_account_balances(rebuild=False)
+    assert len(drifts) == 1
+    assert drifts[0].ledger_total == 5
+    assert drifts[0].expected_total == 1000
+    assert get_ledger_balance(user.account_id).total[DiemCurrency.XUS] == 5
+
+    assert len(reconcile_account_balances()) == 1
+    assert get_ledger_balance(user.account_id).total[DiemCurrency.XUS] == 1000
+    assert reconcile_account_balances() == []
+
+
+def test_backfill_fills_an_empty_ledger():
+    user = OneUser.run(
+        db_session, account_amount=1000, account_currency=DiemCurrency.XUS
+    )
+    # a DB created before the ledger
+    AccountBalance.query.delete()
+    db_session.commit()
+
+    backfill_account_balances()
+
+    assert get_ledger_balance(user.account_id).total[DiemCurrency.XUS] == 1000
+    assert_ledger_matches_history(user.account_id)
+
+    backfill_account_balances()
+
+    assert get_ledger_balance(user.account_id).total[DiemCurrency.XUS] == 1000
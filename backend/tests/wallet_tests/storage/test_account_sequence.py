@@ -0,0 +1,52 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+from concurrent.futures import ThreadPoolExecutor
+
+from wallet.services.sequence import DbSequenceAllocator
+
+ADDRESS = "c513562a07b06203acfe83b956ddaef4"
+
+
+def test_reserve_from_chain_sequence_once():
+    allocator = DbSequenceAllocator()
+    calls = []
+
+    def chain_sequence():
+        calls.append(1)
+        return 7
+
+    assert [allocator.reserve(ADDRESS, chain_sequence) for _ in range(3)] == [7, 8, 9]
+    assert len(calls) == 1
+
+
+def test_concurrent_reserves_are_unique():
+    allocator = DbSequenceAllocator()
+    assert allocator.reset(ADDRESS, 0, None)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        reserved = list(
+            executor.map(lambda _: allocator.reserve(ADDRESS, lambda: 0), range(40))
+        )
+
+    assert sorted(reserved) == list(range(40))
+
+
+def test_resync_reset_and_release():
+    allocator = DbSequenceAllocator()
+    allocator.resync(ADDRESS, 4)
+    assert allocator.reserve(ADDRESS, lambda: 0) == 4
+
+    allocator.resync(ADDRESS, 2)
+    assert allocator.reserve(ADDRESS, lambda: 0) == 5
+
+    allocator.release(ADDRESS, 5)
+    assert allocator.reserve(ADDRESS, lambda: 0) == 5
+    allocator.reserve(ADDRESS, lambda: 0)
+    allocator.release(ADDRESS, 5)
+    assert allocator.reserve(ADDRESS, lambda: 0) == 7
+
+    assert allocator.peek(ADDRESS) == 8
+    assert not allocator.reset(ADDRESS, 3, 7)
+    assert allocator.reset(ADDRESS, 3, 8)
+    assert allocator.reserve(ADDRESS, lambda: 0) == 3
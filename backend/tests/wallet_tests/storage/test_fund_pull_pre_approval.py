@@ -1,3 +1,5 @@
+from types import SimpleNamespace
+
 from tests.wallet_tests.resources.seeds.one_funds_pull_pre_approval import (
     OneFundsPullPreApproval,
 )
@@ -5,10 +7,14 @@ from wallet.services.offchain.fund_pull_pre_approval_sm import Role
 from wallet.storage import (
     db_session,
     get_command_by_id,
+    get_unsent_commands,
+    mark_commands_sent,
     update_command,
 )
+from wallet.storage.models import FundsPullPreApprovalCommand
 
 FUNDS_PULL_PRE_APPROVAL_ID = "5fc49fa0-5f2a-4faa-b391-ac1652c57e4d"
+FUNDS_PULL_PRE_APPROVAL_ID_2 = "e1f7f846-f9e6-46f9-b184-c949f8d6b197"
 
 
 def test_update_at(random_bech32_address, my_user):
@@ -37,3 +43,42 @@ def test_update_at(random_bech32_address, my_user):
     assert updated_command.updated_at > updated_at
     assert updated_command.created_at == created_at
     assert updated_command.status == "valid"
+
+
+def test_mark_commands_sent_skips_changed_status(random_bech32_address, my_user):
+    for fppa_id in [FUNDS_PULL_PRE_APPROVAL_ID, FUNDS_PULL_PRE_APPROVAL_ID_2]:
+        OneFundsPullPreApproval.run(
+            db_session=db_session,
+            account_id=my_user.account_id,
+            address=random_bech32_address,
+            biller_address=my_user.address,
+            funds_pull_pre_approval_id=fppa_id,
+            status="pending",
+            role=Role.PAYEE,
+        )
+    commands = get_unsent_commands(
+        [
+            (my_user.account_id, FUNDS_PULL_PRE_APPROVAL_ID),
+            (my_user.account_id, FUNDS_PULL_PRE_APPROVAL_ID_2),
+        ]
+    )
+    assert len(commands) == 2
+    # as read before sending
+    sent = [
+        SimpleNamespace(
+            account_id=c.account_id,
+            funds_pull_pre_approval_id=c.funds_pull_pre_approval_id,
+            status=c.status,
+        )
+        for c in commands
+    ]
+
+    # approved while the pending status was being sent
+    db_session.query(FundsPullPreApprovalCommand).filter_by(
+        funds_pull_pre_approval_id=FUNDS_PULL_PRE_APPROVAL_ID_2
+    ).update({"status": "valid"})
+    db_session.commit()
+
+    assert mark_commands_sent(sent) == 1
+    assert get_command_by_id(FUNDS_PULL_PRE_APPROVAL_ID).offchain_sent
+    assert not get_command_by_id(FUNDS_PULL_PRE_APPROVAL_ID_2).offchain_sent
@@ -0,0 +1,82 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+from uuid import uuid4
+
+import dramatiq
+import pytest
+from diem import diem_types, txnmetadata
+from dramatiq.errors import DecodeError
+from pubsub.types import LRWPubSubEvent
+from wallet.background_tasks.background import process_incoming_txns
+from wallet.encoder import CompactEncoder
+
+
+def event(metadata: bytes) -> LRWPubSubEvent:
+    return LRWPubSubEvent(
+        sender="f72589b71ff4f8d139674a3f7369c69b",
+        receiver="c513562a07b06203acfe83b956ddaef4",
+        amount=1_000_000,
+        currency="XUS",
+        metadata=metadata,
+        version=42,
+        sequence=7,
+    )
+
+
+def test_message_round_trip():
+    metadata = txnmetadata.general_metadata(bytes.fromhex("8e298f642d08d1af"))
+    events = [event(metadata), event(b"\x99 not metadata")]
+    message = process_incoming_txns.message(events)
+    encoder = CompactEncoder()
+
+    decoded = dramatiq.Message(**encoder.decode(encoder.encode(message.asdict())))
+
+    assert decoded.message_id == message.message_id
+    received = decoded.args[0]
+    assert [e.__dict__ for e in received] == [e.__dict__ for e in events]
+    # deserialized only when read
+    assert received[0]._metadata is None
+    assert isinstance(received[0].metadata, diem_types.Metadata__GeneralMetadata)
+    assert isinstance(received[1].metadata, diem_types.Metadata__Undefined)
+
+
+def test_encodes_bytes_and_uuids():
+    encoder = CompactEncoder()
+    order_id = uuid4()
+    data = {"args": [order_id, b"\x00\x01", {"$": 1}], "kwargs": {}}
+
+    assert encoder.decode(encoder.encode(data)) == data
+
+
+def test_rejects_unsupported_types():
+    encoder = CompactEncoder()
+    with pytest.raises(TypeError):
+        encoder.encode({"args": [object()]})
+    with pytest.raises(DecodeError):
+        encoder.decode(b"\x80\x04pickle")
+
+
+def test_decodes_messages_pickled_before_the_upgrade():
+    metadata = txnmetadata.general_metadata(bytes.fromhex("8e298f642d08d1af"))
+    legacy = event(metadata)
+    # the former LRWPubSubEvent state, metadata deserialized by pubsub
+    legacy.__dict__ = {
+        "sender": legacy.sender,
+        "receiver": legacy.receiver,
+        "amount": legacy.amount,
+        "currency": legacy.currency,
+        "version": legacy.version,
+        "sequence": legacy.sequence,
+        "metadata": legacy.metadata,
+    }
+    message = process_incoming_txns.message([legacy])
+
+    decoded = dramatiq.Message(
+        **CompactEncoder().decode(dramatiq.PickleEncoder().encode(message.asdict()))
+    )
+
+    received = decoded.args[0][0]
+    assert isinstance(received.metadata, diem_types.Metadata__GeneralMetadata)
+    assert received.metadata_bytes == metadata
+    assert received.sequence == 7
@@ -0,0 +1,76 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+
+from wallet.logging import ExecutionLogSink, execution_log_sink, log_execution
+from wallet.storage import get_execution_logs
+
+
+def test_log_execution_is_written_in_background():
+    for i in range(5):
+        log_execution(f"message {i}")
+    execution_log_sink.flush()
+
+    logs = get_execution_logs(limit=3)
+    assert [log.log.split(":")[0] for log in logs] == [
+        "message 4",
+        "message 3",
+        "message 2",
+    ]
+    assert "test_log_execution_is_written_in_background" in logs[0].log
+
+    older = get_execution_logs(limit=3, before_id=logs[-1].id)
+    assert [log.log.split(":")[0] for log in older] == ["message 1", "message 0"]
+
+    # an unbounded or negative limit is clamped
+    assert len(get_execution_logs(limit=-1)) == 1
+    assert len(get_execution_logs(limit=10 ** 9)) == 5
+
+
+def test_sink_writes_in_batches():
+    batches = []
+    sink = ExecutionLogSink(
+        write=batches.append, batch_size=4, flush_interval=60, max_pending=100
+    )
+    for i in range(10):
+        sink.add(str(i))
+    sink.flush()
+
+    assert [message for batch in batches for message, _ in batch] == [
+        str(i) for i in range(10)
+    ]
+    assert all(len(batch) <= 4 for batch in batches)
+    assert sink.written == 10
+    assert sink.pending() == 0
+
+
+def test_sink_drops_records_when_full():
+    release = threading.Event()
+    written = []
+
+    def slow_write(batch):
+        release.wait()
+        written.extend(batch)
+
+    sink = ExecutionLogSink(
+        write=slow_write, batch_size=1, flush_interval=0, max_pending=2
+    )
+    for i in range(10):
+        sink.add(str(i))
+
+    assert sink.dropped >= 7
+    release.set()
+    sink.flush()
+    assert sink.written == len(written) == 10 - sink.dropped
+
+
+def test_sink_counts_failed_batches():
+    def failing_write(batch):
+        raise RuntimeError("db is down")
+
+    sink = ExecutionLogSink(write=failing_write, background=False)
+    sink.add("lost")
+
+    assert sink.failed == 1
+    assert sink.written == 0
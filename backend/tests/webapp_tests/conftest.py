@@ -83,6 +83,7 @@ class UsersService:
 
         monkeypatch.setattr(user, "is_valid_token", mock_is_valid_token)
         monkeypatch.setattr(user, "get_user_by_token", mock_get_user_by_token)
+        monkeypatch.setattr(user, "get_user_snapshot_by_token", mock_get_user_by_token)
 
     def get_user_token(self) -> str:
         return self.user_token
@@ -153,10 +153,13 @@ def account_transactions_mock(monkeypatch):
         direction_filter: Optional[TransactionDirection] = None,
         limit: Optional[int] = None,
         sort: Optional[TransactionSortOption] = None,
+        cursor: Optional[str] = None,
+        rates=None,
     ):
         saved["account_id"] = account_id
         saved["account_name"] = account_name
         saved["currency"] = currency
+        saved["cursor"] = cursor
         return [INTERNAL_TX]
 
     monkeypatch.setattr(account_service, "get_account_transactions", get_mock)
@@ -7,14 +7,15 @@ import pytest
 from flask import Response
 from flask.testing import Client
 
+import wallet.services.account
 import wallet.services.user
-from diem_utils.types.currencies import FiatCurrency
+from diem_utils.types.currencies import DiemCurrency, FiatCurrency
 from wallet.services.user import UsersFilter
 from wallet.storage import (
     RegistrationStatus,
     User,
 )
-from wallet.types import UsernameExistsError
+from wallet.types import Balance, UsernameExistsError
 
 NON_UNIQUE_USERNAME = "non_unique"
 
@@ -133,3 +134,42 @@ class TestAdminCreateUsers:
         )
 
         assert rv.status_code == 409
+
+
+class TestAdminGetAccountsBalances:
+    def test_get_accounts_balances(self, admin_client: Client, monkeypatch) -> None:
+        saved = {}
+
+        def get_accounts_balances(up_to_version=None):
+            saved["up_to_version"] = up_to_version
+            balance = Balance()
+            balance.total[DiemCurrency.XUS] = 100
+            return {7: balance}
+
+        monkeypatch.setattr(
+            wallet.services.account, "get_accounts_balances", get_accounts_balances
+        )
+        monkeypatch.setattr(
+            wallet.services.account, "get_account_names", lambda: {7: "account"}
+        )
+
+        rv: Response = admin_client.get("/admin/accounts/balances?up_to_version=12")
+
+        assert rv.status_code == 200
+        assert saved["up_to_version"] == 12
+        assert rv.get_json()["accounts"] == [
+            {
+                "account_id": 7,
+                "account_name": "account",
+                "balances": [{"currency": "XUS", "balance": 100}],
+            }
+        ]
+
+
+class TestAdminGetSyncDbMetrics:
+    def test_get_sync_db_metrics(self, admin_client: Client) -> None:
+        rv: Response = admin_client.get("/admin/sync-db")
+
+        assert rv.status_code == 200
+        assert rv.get_json()["watermarks"] == []
+        assert "last_sync_duration_secs" in rv.get_json()
@@ -248,3 +248,56 @@ class TestOffchainV2View:
 
         assert rv.status_code == 200
         assert rv.data == response_data
+
+
+class TestOffchainV2BatchView:
+    def test_success(self, authorized_client: Client, monkeypatch):
+        x_request_id = "f7ed63c3-eab9-4bd5-8094-497ba626e564"
+
+        def mock(sender_address, requests_bytes):
+            assert sender_address == ADDRESS
+            assert requests_bytes == [b"jws-1", b"jws-2"]
+
+            return [(200, b"response-1"), (400, b"response-2")]
+
+        monkeypatch.setattr(offchain_service, "process_inbound_commands", mock)
+
+        rv: Response = authorized_client.post(
+            "/offchain/v2/commands",
+            data=b"jws-1\njws-2\n",
+            headers={"X-REQUEST-ID": x_request_id, "X-REQUEST-SENDER-ADDRESS": ADDRESS},
+        )
+
+        assert rv.status_code == 200
+        assert rv.data == b"response-1\nresponse-2"
+        assert rv.headers["X-REQUEST-ID"] == x_request_id
+
+    def test_too_many_commands(self, authorized_client: Client, monkeypatch):
+        monkeypatch.setattr(offchain_service, "OFFCHAIN_BATCH_MAX_COMMANDS", 1)
+
+        rv: Response = authorized_client.post(
+            "/offchain/v2/commands",
+            data=b"jws-1\njws-2",
+            headers={"X-REQUEST-ID": "id", "X-REQUEST-SENDER-ADDRESS": ADDRESS},
+        )
+
+        assert rv.status_code == 413
+
+    def test_too_large_batch_is_rejected_unread(
+        self, authorized_client: Client, monkeypatch
+    ):
+        monkeypatch.setattr(offchain_service, "OFFCHAIN_BATCH_MAX_BYTES", 8)
+
+        def fail(*args):
+            raise AssertionError("too large batch processed")
+
+        monkeypatch.setattr(offchain_service, "process_inbound_commands", fail)
+
+        rv: Response = authorized_client.post(
+            "/offchain/v2/commands",
+            data=b"jws-1\njws-2",
+            headers={"X-REQUEST-ID": "id", "X-REQUEST-SENDER-ADDRESS": ADDRESS},
+        )
+
+        assert rv.status_code == 413
+        assert rv.headers["Connection"] == "close"
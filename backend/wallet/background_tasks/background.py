@@ -1,8 +1,10 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
+import logging
 import sys
 from time import sleep
+from typing import List
 
 import dramatiq
 
@@ -22,8 +24,10 @@ from diem_utils.types.currencies import DiemCurrency
 
 TIME_BEFORE_KYC_APPROVAL = 5
 
+logger = logging.getLogger(__name__)
 
-@dramatiq.actor(store_results=True)
+
+@dramatiq.actor
 @debug_log(None)
 def async_start_kyc(user_id: int) -> None:
     sys.stdout.write("hhhhhhhhh")
@@ -32,28 +36,28 @@ def async_start_kyc(user_id: int) -> None:
     verify_kyc(user_id)
 
 
-@dramatiq.actor(store_results=True)
+@dramatiq.actor
 @debug_log(None)
 def async_execute_order(order_id, payment_method) -> None:
     log_execution("Enter async_execute_order")
     execute_order(order_id, payment_method)
 
 
-@dramatiq.actor(store_results=True)
+@dramatiq.actor
 @debug_log(None)
 def async_cover_order(order_id) -> None:
     log_execution("Enter async_cover")
     cover_order(order_id)
 
 
-@dramatiq.actor(store_results=True)
+@dramatiq.actor
 @debug_log(None)
 def async_external_transaction(transaction_id: int) -> None:
     log_execution("Enter async_external_transaction")
     submit_onchain(transaction_id=transaction_id)
 
 
-@dramatiq.actor(store_results=True)
+@dramatiq.actor
 @retry(Exception, delay=1)
 def process_incoming_txn(txn: LRWPubSubEvent) -> None:
     metadata = txn.metadata
@@ -72,3 +76,16 @@ def process_incoming_txn(txn: LRWPubSubEvent) -> None:
         currency=currency,
         metadata=metadata,
     )
+
+
+@dramatiq.actor
+def process_incoming_txns(txns: List[LRWPubSubEvent]) -> None:
+    # a batch of consecutive events of one event stream, enqueued by pubsub
+    # as a single message; an event failing here is handed over to
+    # process_incoming_txn so it is retried alone, without replaying the batch
+    for txn in txns:
+        try:
+            process_incoming_txn(txn)
+        except Exception:
+            logger.exception(f"failed to process incoming txn {txn}, re-enqueue it")
+            process_incoming_txn.send(txn)
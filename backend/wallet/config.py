@@ -11,12 +11,13 @@ from typing import Optional
 import dramatiq
 import redis
 from dramatiq.brokers.redis import RedisBroker, Broker
-from dramatiq.encoder import PickleEncoder
 from dramatiq.results import Results
 from dramatiq.results.backends.redis import RedisBackend
 
 import logging
 
+from .encoder import CompactEncoder
+
 logging.basicConfig(
     format="[%(asctime)s][%(threadName)s][%(levelname)s] %(name)s: %(message)s",
     datefmt="%Y-%m-%d %I:%M:%S %p",
@@ -37,6 +38,8 @@ ADMIN_LOGIN_ENABLED: bool = (
 )
 
 SECRET_KEY: str = os.getenv("SECRET_KEY", "you-will-never-guess")
+# request bodies above it are rejected with 413 before being read
+MAX_CONTENT_LENGTH: int = int(os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))
 SESSION_TYPE: str = "redis"
 
 
@@ -46,7 +49,8 @@ def setup_redis_broker() -> None:
         host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD
     )
     _redis_db: redis.StrictRedis = redis.StrictRedis(connection_pool=_connection_pool)
-    _result_backend = RedisBackend(encoder=PickleEncoder(), client=_redis_db)
+    # results are stored only for the actors with store_results=True
+    _result_backend = RedisBackend(encoder=CompactEncoder(), client=_redis_db)
     _result_middleware = Results(backend=_result_backend)
     broker: Broker = RedisBroker(
         connection_pool=_connection_pool,
@@ -54,11 +58,13 @@ def setup_redis_broker() -> None:
         namespace="lrw",
     )
     dramatiq.set_broker(broker)
-    dramatiq.set_encoder(dramatiq.PickleEncoder())
+    dramatiq.set_encoder(CompactEncoder())
 
 
 if dramatiq.broker.global_broker is None:
     if "VASP_ADDR" in os.environ:
-        context.set(context.from_env())
+        from .services.sequence import with_db_sequence_allocator
+
+        context.set(with_db_sequence_allocator(context.from_env()))
 
     setup_redis_broker()
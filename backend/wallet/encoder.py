@@ -0,0 +1,104 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Dramatiq message encoder: compact JSON, with the actor argument types that
+JSON lacks encoded as single key objects tagged by type:
+
+    {"$e": [sender, receiver, amount, currency, metadata, version, sequence]}
+        pubsub LRWPubSubEvent, its raw metadata bytes in base64; the worker
+        deserializes the metadata only when it reads it
+    {"$b": "<base64>"}  bytes
+    {"$u": "<hex>"}     UUID
+
+Unlike pickle, decoding a message never runs code of a class named by the
+message.
+
+Messages queued by the former pickle encoder are still decoded with pickle
+during the upgrade, unless DRAMATIQ_PICKLE_FALLBACK is "0". The fallback is
+to be removed in the next release; deployments that turn it off should drain
+the lrw queues before upgrading.
+"""
+
+import base64
+import json
+import os
+import pickle
+import typing
+from uuid import UUID
+
+import dramatiq
+from dramatiq.encoder import MessageData
+from dramatiq.errors import DecodeError
+from pubsub.types import LRWPubSubEvent
+
+DRAMATIQ_PICKLE_FALLBACK: bool = os.getenv("DRAMATIQ_PICKLE_FALLBACK", "1") != "0"
+
+# the first byte of pickle protocol 2 and later
+_PICKLE_PROTO = b"\x80"
+
+
+def _default(obj: typing.Any) -> typing.Any:
+    if isinstance(obj, LRWPubSubEvent):
+        return {
+            "$e": [
+                obj.sender,
+                obj.receiver,
+                obj.amount,
+                obj.currency,
+                _b64(obj.metadata_bytes),
+                obj.version,
+                obj.sequence,
+            ]
+        }
+    if isinstance(obj, bytes):
+        return {"$b": _b64(obj)}
+    if isinstance(obj, UUID):
+        return {"$u": obj.hex}
+    raise TypeError(f"{type(obj).__name__} is not supported by the message encoder")
+
+
+def _object_hook(obj: typing.Dict[str, typing.Any]) -> typing.Any:
+    if len(obj) == 1:
+        if "$e" in obj:
+            sender, receiver, amount, currency, metadata, version, sequence = obj["$e"]
+            return LRWPubSubEvent(
+                sender=sender,
+                receiver=receiver,
+                amount=amount,
+                currency=currency,
+                metadata=base64.b64decode(metadata),
+                version=version,
+                sequence=sequence,
+            )
+        if "$b" in obj:
+            return base64.b64decode(obj["$b"])
+        if "$u" in obj:
+            return UUID(obj["$u"])
+    return obj
+
+
+def _b64(value: bytes) -> str:
+    return base64.b64encode(value).decode("ascii")
+
+
+class CompactEncoder(dramatiq.Encoder):
+    def encode(self, data: MessageData) -> bytes:
+        return json.dumps(data, separators=(",", ":"), default=_default).encode("utf-8")
+
+    def decode(self, data: bytes) -> MessageData:
+        try:
+            if DRAMATIQ_PICKLE_FALLBACK and data[:1] == _PICKLE_PROTO:
+                # queued before the upgrade
+                return pickle.loads(data)
+            return json.loads(data, object_hook=_object_hook)
+        except (
+            UnicodeDecodeError,
+            ValueError,
+            TypeError,
+            pickle.UnpicklingError,
+            EOFError,
+            AttributeError,
+            ImportError,
+        ) as e:
+            raise DecodeError(f"failed to decode message {data!r}", data, e)
@@ -3,15 +3,152 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
+from datetime import datetime
 from functools import wraps
 import typing
-import logging, inspect
+import atexit, logging, inspect, os, queue, threading, time
 
-from wallet.storage.logs import add_execution_log
+from wallet.storage.logs import add_execution_logs
 
 RT = typing.TypeVar("RT")
 TFun = typing.Callable[..., typing.Optional[RT]]
 
+EXECUTION_LOG_ASYNC: bool = os.getenv("EXECUTION_LOG_ASYNC", "1") != "0"
+EXECUTION_LOG_BATCH_SIZE: int = int(os.getenv("EXECUTION_LOG_BATCH_SIZE", 500))
+EXECUTION_LOG_FLUSH_INTERVAL: float = float(
+    os.getenv("EXECUTION_LOG_FLUSH_INTERVAL", 1)
+)
+EXECUTION_LOG_MAX_PENDING: int = int(os.getenv("EXECUTION_LOG_MAX_PENDING", 10_000))
+EXECUTION_LOG_BLOCK_SECS: float = float(os.getenv("EXECUTION_LOG_BLOCK_SECS", 0))
+
+LogRecord = typing.Tuple[str, datetime]
+
+_FLUSH: typing.Any = object()
+
+
+class ExecutionLogSink:
+    """
+    Buffers execution log records and writes them in bulk from a background
+    thread, once batch_size records are pending or flush_interval seconds
+    after the first of them.
+
+    The buffer holds at most max_pending records. When it is full, add waits
+    up to block_secs for room, then drops the record and counts it in dropped.
+    Batches failing to be written are counted in failed and not retried.
+    """
+
+    def __init__(
+        self,
+        write: typing.Callable[[typing.List[LogRecord]], None],
+        batch_size: int = EXECUTION_LOG_BATCH_SIZE,
+        flush_interval: float = EXECUTION_LOG_FLUSH_INTERVAL,
+        max_pending: int = EXECUTION_LOG_MAX_PENDING,
+        block_secs: float = EXECUTION_LOG_BLOCK_SECS,
+        background: bool = EXECUTION_LOG_ASYNC,
+    ) -> None:
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_secs = block_secs
+        self.background = background
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: "queue.Queue[LogRecord]" = queue.Queue(maxsize=max_pending)
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread_pid: typing.Optional[int] = None
+
+    def add(self, message: str) -> None:
+        record = (message, datetime.utcnow())
+        if not self.background:
+            with self._write_lock:
+                self._write_unlocked([record], queued=False)
+            return
+
+        self._ensure_started()
+        try:
+            if self.block_secs > 0:
+                self._queue.put(record, timeout=self.block_secs)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Writes all the pending records before returning"""
+        if not self.background or (
+            self._thread_pid != os.getpid() and self._queue.empty()
+        ):
+            return
+
+        self._ensure_started()
+        # records are only written by the background thread, in order; the
+        # marker makes it write its current batch right away
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def _ensure_started(self) -> None:
+        # a forked worker (gunicorn, dramatiq) does not inherit the thread
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                threading.Thread(
+                    target=self._run, name="execution-log-sink", daemon=True
+                ).start()
+                self._thread_pid = os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            batch: typing.List[LogRecord] = []
+            flush = False
+            deadline = None
+            while not flush and len(batch) < self.batch_size:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is _FLUSH:
+                    flush = True
+                else:
+                    batch.append(record)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+
+            if batch:
+                with self._write_lock:
+                    self._write_unlocked(batch)
+            if flush:
+                self._queue.task_done()
+
+    def _write_unlocked(
+        self, batch: typing.List[LogRecord], queued: bool = True
+    ) -> None:
+        try:
+            self.write(batch)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logging.getLogger(__name__).exception(
+                "failed to write %i execution logs", len(batch)
+            )
+        finally:
+            if queued:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+execution_log_sink = ExecutionLogSink(write=add_execution_logs)
+atexit.register(execution_log_sink.flush)
+
 
 def log_execution(message: str) -> None:
     frame = inspect.currentframe()
@@ -26,7 +163,7 @@ def log_execution(message: str) -> None:
         func.co_firstlineno,
     )
     logging.debug(log_str)
-    add_execution_log(log_str)
+    execution_log_sink.add(log_str)
 
 
 def debug_log(
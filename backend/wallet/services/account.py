@@ -1,17 +1,19 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
-import context, secrets
-from operator import attrgetter
-from typing import Dict, List, Optional
+import base64
+import context, json, secrets
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 from diem import identifier
-from diem_utils.precise_amount import Amount
 from diem_utils.types.currencies import DiemCurrency, FiatCurrency
-from diem_utils.types.liquidity.currency import Currency
 from wallet import storage
-from wallet.services import transaction as transaction_service
-from wallet.services.fx.fx import get_rate
+from diem_utils.types.liquidity.currency import Currency, CurrencyPair
+from wallet.services.fx import fx
+from sqlalchemy import BigInteger, Numeric, case, cast, type_coerce
 from wallet.storage import (
     get_account_id_from_subaddr,
     Transaction,
@@ -20,6 +22,7 @@ from wallet.storage import (
     is_subaddress_exists,
     Account,
     User,
+    BalanceDrift,
 )
 from wallet.types import (
     Balance,
@@ -58,92 +61,176 @@ def get_account_transactions(
     limit: Optional[int] = None,
     sort: Optional[TransactionSortOption] = None,
     up_to_version=None,
+    cursor: Optional[str] = None,
+    rates: Optional["FiatRateSnapshot"] = None,
 ) -> List[Transaction]:
+    """
+    Filtered, sorted and limited in the DB; newest first unless sorted otherwise.
+    cursor is the next_cursor of the previous page, see transactions_cursor.
+    Fiat sorts use the rates of the cursor, rates, or a snapshot of the
+    account owner fiat rates.
+    """
     if not account_id:
         account = get_account(account_name=account_name)
         account_id = account.id
 
-    txs = storage.get_account_transactions(
-        account_id=account_id, currency=currency, up_to_version=up_to_version
-    )
-
-    if direction_filter:
-        txs[:] = [
-            tx
-            for tx in txs
-            if transaction_service.get_transaction_direction(account_id, tx)
-            == direction_filter
-        ]
+    sort = sort or TransactionSortOption.DATE_DESC
+    if sort in FIAT_SORT_OPTIONS:
+        rates = (
+            (get_cursor_rate_snapshot(sort, cursor) if cursor else None)
+            or rates
+            or get_account_fiat_rate_snapshot(account_id)
+        )
 
-    fiat_currency = None
+    return storage.get_sorted_account_transactions(
+        account_id=account_id,
+        sort_key=_sort_key(sort, rates),
+        descending=sort in _DESCENDING_SORT_OPTIONS,
+        currency=currency,
+        direction=direction_filter,
+        limit=limit,
+        after=_decode_cursor(sort, cursor) if cursor else None,
+        up_to_version=up_to_version,
+    )
 
-    if sort:
-        if (
-            sort == TransactionSortOption.FIAT_AMOUNT_DESC
-            or sort == TransactionSortOption.FIAT_AMOUNT_ASC
-        ):
-            user = storage.get_user_by_account_id(account_id)
-            fiat_currency = FiatCurrency[user.selected_fiat_currency]
 
-        _sort_transactions(
-            txs=txs, sort_option=sort, fiat_currency_to_sort_by=fiat_currency
-        )
+FIAT_SORT_OPTIONS = (
+    TransactionSortOption.FIAT_AMOUNT_ASC,
+    TransactionSortOption.FIAT_AMOUNT_DESC,
+)
 
-    return txs[:limit]
+_DESCENDING_SORT_OPTIONS = (
+    TransactionSortOption.DATE_DESC,
+    TransactionSortOption.DIEM_AMOUNT_DESC,
+    TransactionSortOption.FIAT_AMOUNT_DESC,
+)
 
 
-def _sort_transactions(
-    txs: List[Transaction],
-    sort_option: TransactionSortOption,
-    fiat_currency_to_sort_by: Optional[FiatCurrency] = None,
-):
-    if sort_option == TransactionSortOption.DATE_ASC:
-        txs.sort(key=attrgetter("created_timestamp"))
-    elif sort_option == TransactionSortOption.DATE_DESC:
-        txs.sort(key=attrgetter("created_timestamp"), reverse=True)
-    elif sort_option == TransactionSortOption.DIEM_AMOUNT_ASC:
-        txs.sort(key=attrgetter("amount"))
-    elif sort_option == TransactionSortOption.DIEM_AMOUNT_DESC:
-        txs.sort(key=attrgetter("amount"), reverse=True)
-    elif sort_option == TransactionSortOption.FIAT_AMOUNT_ASC:
-        _sort_transactions_by_fiat_amount(txs, fiat_currency_to_sort_by)
-    elif sort_option == TransactionSortOption.FIAT_AMOUNT_DESC:
-        _sort_transactions_by_fiat_amount(txs, fiat_currency_to_sort_by, reverse=True)
-    else:
-        # Sort option not implemented
-        pass
+@dataclass(frozen=True)
+class FiatRateSnapshot:
+    """
+    Rates of the Diem currencies to a single fiat currency, taken once per
+    request. Rates are kept in Amount fixed point (Amount.unit is 1.0), so the
+    fiat value of a transaction is the exact integer amount * rate, in
+    1 / Amount.unit ** 2 fiat units, and sorting by it is an integer compare.
+    """
+
+    fiat_currency: FiatCurrency
+    rates: Dict[str, int]
+
+    def fiat_amount_key(self, amount: int, currency: str) -> int:
+        return amount * self.rates.get(currency, 0)
+
+    def fiat_amount_sql_key(self):
+        # multiplied as NUMERIC, the scaled product can exceed 64 bits, but read
+        # back as an integer
+        return type_coerce(
+            cast(Transaction.amount, Numeric(38, 0))
+            * case(self.rates, value=Transaction.currency, else_=0),
+            BigInteger,
+        )
 
 
-def _sort_transactions_by_fiat_amount(
-    txs: List[Transaction], fiat_currency: FiatCurrency, reverse=False
-):
-    latest_rates = _get_rates()
-
-    def tx_fiat_amount(tx: Transaction):
-        rate = latest_rates[f"{tx.currency}_{fiat_currency}"]
-        tx_amount = Amount().deserialize(tx.amount)
-        fiat_amount = rate * tx_amount
-        return fiat_amount.serialize()
+def get_fiat_rate_snapshot(fiat_currency: FiatCurrency) -> FiatRateSnapshot:
+    pairs = {
+        currency: str(CurrencyPair(Currency(currency), Currency(fiat_currency)))
+        for currency in DiemCurrency.__members__
+    }
+    # pairs the liquidity provider does not quote are missing and value at 0
+    try:
+        rates = fx.current_rates(allow_stale=True).rates
+    except LookupError:
+        rates = {}
+
+    return FiatRateSnapshot(
+        fiat_currency=fiat_currency,
+        rates={
+            currency: rates[pair] for currency, pair in pairs.items() if pair in rates
+        },
+    )
 
-    txs.sort(key=tx_fiat_amount, reverse=reverse)
 
+def get_account_fiat_rate_snapshot(account_id: int) -> FiatRateSnapshot:
+    user = storage.get_user_by_account_id(account_id)
+    return get_fiat_rate_snapshot(FiatCurrency[user.selected_fiat_currency])
+
+
+def _sort_key(sort_option: TransactionSortOption, rates: Optional[FiatRateSnapshot]):
+    if sort_option in FIAT_SORT_OPTIONS:
+        return rates.fiat_amount_sql_key()
+    if sort_option in (
+        TransactionSortOption.DIEM_AMOUNT_ASC,
+        TransactionSortOption.DIEM_AMOUNT_DESC,
+    ):
+        return Transaction.amount
+    return Transaction.created_timestamp
+
+
+def transactions_cursor(
+    account_id: int,
+    sort: Optional[TransactionSortOption],
+    tx: Transaction,
+    rates: Optional[FiatRateSnapshot] = None,
+) -> str:
+    """
+    Opaque cursor of the account transactions page that follows tx; fiat
+    sorts must use the rates the page was listed with. Fiat sort cursors carry
+    the rates along, so that all the pages of a listing are sorted alike.
+    """
+    sort = sort or TransactionSortOption.DATE_DESC
+    fields = [sort.value]
+    if sort in FIAT_SORT_OPTIONS:
+        rates = rates or get_account_fiat_rate_snapshot(account_id)
+        fields.append(rates.fiat_amount_key(tx.amount, tx.currency))
+    elif sort in (
+        TransactionSortOption.DIEM_AMOUNT_ASC,
+        TransactionSortOption.DIEM_AMOUNT_DESC,
+    ):
+        fields.append(tx.amount)
+    else:
+        fields.append(tx.created_timestamp.isoformat())
+    fields.append(tx.id)
+    if sort in FIAT_SORT_OPTIONS:
+        fields.append([rates.fiat_currency.value, rates.rates])
+    return base64.urlsafe_b64encode(json.dumps(fields).encode()).decode().rstrip("=")
+
+
+def get_cursor_rate_snapshot(
+    sort: TransactionSortOption, cursor: str
+) -> Optional[FiatRateSnapshot]:
+    """The rates the listing of a fiat sort cursor was sorted with"""
+    fields = _load_cursor(sort, cursor)
+    if sort not in FIAT_SORT_OPTIONS:
+        return None
+    try:
+        fiat_currency, rates = fields[3]
+        return FiatRateSnapshot(
+            fiat_currency=FiatCurrency(fiat_currency),
+            rates={currency: int(rate) for currency, rate in rates.items()},
+        )
+    except (ValueError, TypeError, AttributeError, IndexError):
+        raise ValueError(f"invalid cursor {cursor}")
 
-def _get_rates() -> Dict[str, Amount]:
-    rates = {}
 
-    for base_currency in DiemCurrency.__members__:
-        for fiat_currency in FiatCurrency.__members__:
-            try:
-                rate = get_rate(
-                    base_currency=Currency(base_currency),
-                    quote_currency=Currency(fiat_currency),
-                )
+def _decode_cursor(sort: TransactionSortOption, cursor: str) -> Tuple[Any, str]:
+    _, key, tx_id = _load_cursor(sort, cursor)[:3]
+    if sort in (TransactionSortOption.DATE_ASC, TransactionSortOption.DATE_DESC):
+        key = datetime.fromisoformat(key)
+    return key, tx_id
 
-                rates[f"{base_currency}_{fiat_currency}"] = rate
-            except LookupError:
-                pass
 
-    return rates
+def _load_cursor(sort: TransactionSortOption, cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        fields = json.loads(base64.urlsafe_b64decode(padded))
+        sort_value = fields[0]
+        if len(fields) < 3:
+            raise ValueError()
+    except (ValueError, TypeError, KeyError, IndexError):
+        raise ValueError(f"invalid cursor {cursor}")
+    if sort_value != sort.value:
+        raise ValueError(f"cursor of a {sort_value} listing used with {sort.value}")
+    return fields
 
 
 def get_account_balance_by_name(
@@ -165,6 +252,9 @@ def get_account_balance_by_id(
 
 
 def get_account_balance(account, up_to_version=None):
+    if not up_to_version:
+        return get_ledger_balance(account_id=account.id)
+
     account_transactions = get_account_transactions(
         account_id=account.id, up_to_version=up_to_version
     )
@@ -191,6 +281,60 @@ def calc_account_balance(account_id: int, transactions: List[Transaction]) -> Ba
     return account_balance
 
 
+def get_wallet_balance(up_to_version=None) -> Balance:
+    """Balance of all the wallet accounts together, in a single aggregate query"""
+    wallet_balance = Balance()
+    for totals in storage.get_balance_totals(up_to_version=up_to_version):
+        _add_balance_totals(wallet_balance, totals)
+
+    return wallet_balance
+
+
+def get_accounts_balances(up_to_version=None) -> Dict[int, Balance]:
+    """Balances of every account with transactions, in a single aggregate query"""
+    balances: Dict[int, Balance] = defaultdict(Balance)
+    for totals in storage.get_balance_totals(
+        up_to_version=up_to_version, by_account=True
+    ):
+        _add_balance_totals(balances[totals.account_id], totals)
+
+    return dict(balances)
+
+
+def get_account_names() -> Dict[int, str]:
+    return storage.get_account_names()
+
+
+def _add_balance_totals(balance: Balance, totals) -> None:
+    # same rules as calc_account_balance, applied to pre-summed amounts
+    currency = DiemCurrency[totals.currency]
+    amount = int(totals.amount)
+    if totals.direction == TransactionDirection.RECEIVED:
+        if totals.status == TransactionStatus.COMPLETED:
+            balance.total[currency] += amount
+    else:
+        if (
+            totals.status == TransactionStatus.PENDING
+            or totals.status == TransactionStatus.LOCKED
+        ):
+            balance.frozen[currency] += amount
+        if totals.status != TransactionStatus.CANCELED:
+            balance.total[currency] -= amount
+
+
+def get_ledger_balance(account_id: int) -> Balance:
+    account_balance = Balance()
+    for row in storage.get_account_balance_rows(account_id):
+        account_balance.total[DiemCurrency[row.currency]] += row.total
+        account_balance.frozen[DiemCurrency[row.currency]] += row.frozen
+
+    return account_balance
+
+
+def reconcile_account_balances(rebuild: bool = True) -> List[BalanceDrift]:
+    return storage.reconcile_account_balances(rebuild=rebuild)
+
+
 def generate_new_subaddress(account_id: int) -> str:
     sub_address = generate_sub_address()
     add_subaddress(account_id=account_id, subaddr=sub_address)
@@ -0,0 +1,189 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Settles the transactions submit_onchain submitted without waiting: completed
+once executed on-chain, canceled when their execution failed. Transactions
+that expired without being executed are submitted again, at most
+TRANSACTION_RESUBMIT_LIMIT times, then canceled.
+
+All submitted transactions are watched together: every tick fetches the VASP
+account transactions in the range of the pending sequence numbers with a
+single jsonrpc call, and settles the rows matched by transaction hash in a
+single DB transaction. A single process of the deployment runs the tracker,
+the one holding its lease.
+"""
+
+import logging
+import os
+import typing
+
+import context
+from diem import diem_types, jsonrpc, utils
+from wallet import storage
+from wallet.logging import log_execution
+from wallet.services.log import add_transaction_log
+from wallet.storage import Transaction
+from wallet.types import TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_CONFIRMATION_INTERVAL: float = float(
+    os.getenv("TRANSACTION_CONFIRMATION_INTERVAL", 1)
+)
+TRANSACTION_RESUBMIT_LIMIT: int = int(os.getenv("TRANSACTION_RESUBMIT_LIMIT", 2))
+TRANSACTION_CONFIRMATION_LEASE_SECS: float = float(
+    os.getenv("TRANSACTION_CONFIRMATION_LEASE_SECS", 10)
+)
+
+TRACKER_LEASE = "confirm-transactions"
+
+# jsonrpc get_account_transactions page size limit
+MAX_RANGE = 1000
+
+
+def confirm_submitted_transactions_as_leader() -> int:
+    """
+    Confirms the submitted transactions when this process holds the tracker
+    lease, so a single tracker runs per deployment
+    """
+
+    if not storage.acquire_lease(
+        TRACKER_LEASE, storage.lease_holder(), TRANSACTION_CONFIRMATION_LEASE_SECS
+    ):
+        return 0
+    return confirm_submitted_transactions()
+
+
+def confirm_submitted_transactions() -> int:
+    """Returns the number of transactions settled or resubmitted"""
+
+    transactions = storage.get_submitted_transactions()
+    if not transactions:
+        return 0
+
+    ctx = context.get()
+    client = ctx.jsonrpc_client
+    sender = utils.account_address_hex(ctx.config.vasp_account_address())
+
+    start = transactions[0].sequence
+    limit = min(transactions[-1].sequence - start + 1, MAX_RANGE)
+    executed = {
+        (onchain.transaction.sender, onchain.transaction.sequence_number): onchain
+        for onchain in client.get_account_transactions(sender, start, limit)
+    }
+    # refreshed by the range scan response
+    state = client.get_last_known_state()
+
+    completed: typing.Dict[str, int] = {}
+    canceled: typing.Dict[str, str] = {}
+    expired: typing.List[Transaction] = []
+    reset_sequence = False
+    # still pending and not expired, possibly executed later
+    waiting = False
+    for transaction in transactions:
+        if transaction.sequence >= start + limit:
+            waiting = waiting or not _is_expired(transaction, state)
+            continue
+        onchain = executed.get((sender, transaction.sequence))
+        if onchain is not None and _is_submitted(transaction, onchain):
+            if onchain.vm_status.type == jsonrpc.VM_STATUS_EXECUTED:
+                completed[transaction.id] = onchain.version
+            else:
+                canceled[transaction.id] = "On Chain Transfer Failed"
+        elif onchain is not None or _is_expired(transaction, state):
+            # expired, or replaced by another transaction that took its
+            # sequence number: it is never executed
+            reset_sequence = reset_sequence or onchain is None
+            if (transaction.resubmit_count or 0) < TRANSACTION_RESUBMIT_LIMIT:
+                expired.append(transaction)
+            else:
+                canceled[transaction.id] = "On Chain Transfer Expired"
+        else:
+            waiting = True
+
+    storage.settle_transactions(completed, canceled)
+    for transaction_id, version in completed.items():
+        log_execution(
+            f"On chain transfer complete txid: {transaction_id} v: {version} "
+        )
+    for transaction_id, log in canceled.items():
+        log_execution(f"{log} txid: {transaction_id}")
+
+    if reset_sequence and not waiting:
+        # the sequence numbers of the expired transactions are not used
+        # on-chain; while a transaction is waiting, the ones from the on-chain
+        # sequence number on may still be, so they are not reserved again
+        ctx.reset_sequence()
+    if expired:
+        _resubmit(expired)
+
+    return len(completed) + len(canceled) + len(expired)
+
+
+def _resubmit(transactions: typing.List[Transaction]) -> None:
+    from wallet.services.transaction import submit_onchain
+
+    claimed = storage.release_expired_transactions(
+        {transaction.id: transaction.sequence for transaction in transactions}
+    )
+    for transaction_id in claimed:
+        log_execution(f"On chain transfer expired, resubmit txid: {transaction_id}")
+        submit_onchain(transaction_id)
+
+
+def complete_transaction(transaction_id: str, version: int) -> None:
+    storage.update_transaction(
+        transaction_id=transaction_id,
+        status=TransactionStatus.COMPLETED,
+        blockchain_version=version,
+    )
+    add_transaction_log(transaction_id, "On Chain Transfer Complete")
+    log_execution(f"On chain transfer complete txid: {transaction_id} v: {version} ")
+
+
+def fail_transaction(transaction_id: str, reason: str) -> None:
+    storage.update_transaction(
+        transaction_id=transaction_id, status=TransactionStatus.CANCELED
+    )
+    add_transaction_log(transaction_id, "On Chain Transfer Failed")
+    log_execution(f"On Chain Transfer Failed txid: {transaction_id} {reason}")
+
+
+def wait_for_transaction(
+    transaction_id: str, txn: diem_types.SignedTransaction
+) -> None:
+    """
+    Waits for the execution of a transaction submit_onchain submitted and
+    settles it, when no background tasks run
+    """
+
+    try:
+        onchain = context.get().jsonrpc_client.wait_for_transaction(txn)
+    except (jsonrpc.TransactionExecutionFailed, jsonrpc.TransactionExpired) as e:
+        fail_transaction(transaction_id, str(e))
+        return
+    except Exception:
+        # left to the confirmation tracker
+        logger.exception(f"wait for transaction {transaction_id} failed")
+        return
+
+    complete_transaction(transaction_id, onchain.version)
+
+
+def _is_submitted(transaction: Transaction, onchain: jsonrpc.Transaction) -> bool:
+    # sequence numbers are reserved again after transactions expired, the one
+    # at the sequence number of the row may be another transaction; rows
+    # submitted before their hash was recorded are matched by sequence number
+    return (
+        transaction.transaction_hash is None
+        or onchain.hash == transaction.transaction_hash
+    )
+
+
+def _is_expired(transaction: Transaction, state: typing.Any) -> bool:
+    return (
+        state is not None
+        and transaction.expiration_timestamp_secs is not None
+        and transaction.expiration_timestamp_secs * 1_000_000 <= state.timestamp_usecs
+    )
@@ -1,49 +1,262 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
+"""
+Exchange rates quoted by the liquidity provider, kept in an immutable
+RateTable that is replaced as a whole on every refresh, so readers never lock
+and never see a half updated table.
+
+The table is refreshed every FX_REFRESH_INTERVAL seconds by the refresher
+thread of each web process (run_rate_refresher). With FX_RATES_REDIS set the
+processes share it through Redis: a single process per interval fetches the
+rates from the liquidity provider and stores the table, the others load it.
+
+Requests never wait on the liquidity provider, except in a process that has
+no table at all yet. A table older than FX_MAX_STALENESS seconds is still
+served when FX_STALE_RATES is "serve" (the default), with a warning;
+get_rate raises StaleRatesError instead when it is "fail".
+"""
+
+import json
+import logging
+import os
+import threading
+import typing
+from dataclasses import dataclass, field
 from itertools import chain
+from time import time
+from types import MappingProxyType
+
 from diem_utils.precise_amount import Amount
-from diem_utils.sdks.liquidity import LpClient
+from diem_utils.sdks.liquidity import LpClient, LpError, quote_executor
 from diem_utils.types.currencies import DiemCurrency, FiatCurrency
 from diem_utils.types.liquidity.currency import Currency, CurrencyPair, CurrencyPairs
 
-RATES = {}
+logger = logging.getLogger(__name__)
+
+FX_REFRESH_INTERVAL: float = float(os.getenv("FX_REFRESH_INTERVAL", 60))
+FX_MAX_STALENESS: float = float(os.getenv("FX_MAX_STALENESS", 300))
+FX_STALE_RATES: str = os.getenv("FX_STALE_RATES", "serve")
+FX_RATES_REDIS: bool = os.getenv("FX_RATES_REDIS") is not None
+
+REDIS_KEY_PREFIX = "lrw:fx-rates"
+
+
+class StaleRatesError(LookupError):
+    ...
+
+
+@dataclass(frozen=True)
+class RateTable:
+    """Rates by currency pair string, in Amount fixed point"""
+
+    version: int
+    timestamp: float
+    rates: typing.Mapping[str, int] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+
+    def age(self) -> float:
+        return time() - self.timestamp
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "version": self.version,
+                "timestamp": self.timestamp,
+                "rates": dict(self.rates),
+            }
+        )
+
+    @staticmethod
+    def from_json(value: typing.Union[str, bytes]) -> "RateTable":
+        obj = json.loads(value)
+        return RateTable(
+            version=obj["version"],
+            timestamp=obj["timestamp"],
+            rates=MappingProxyType(obj["rates"]),
+        )
+
+
+class SharedRates:
+    """Redis tier of the rate table"""
+
+    def __init__(self, redis_client: typing.Any) -> None:
+        self.redis = redis_client
+
+    def load(self) -> typing.Optional[RateTable]:
+        value = self.redis.get(f"{REDIS_KEY_PREFIX}:table")
+        return RateTable.from_json(value) if value is not None else None
+
+    def store(self, table: RateTable) -> None:
+        self.redis.set(f"{REDIS_KEY_PREFIX}:table", table.to_json())
+
+    def next_version(self) -> int:
+        return self.redis.incr(f"{REDIS_KEY_PREFIX}:version")
+
+    def try_lead(self, interval: float) -> bool:
+        """Whether this process refreshes the rates for the next interval"""
+        return bool(
+            self.redis.set(
+                f"{REDIS_KEY_PREFIX}:leader",
+                os.getpid(),
+                nx=True,
+                ex=max(1, int(interval)),
+            )
+        )
+
+
+_table = RateTable(version=0, timestamp=0.0)
+_shared: typing.Optional[SharedRates] = None
+_load_lock = threading.Lock()
+_warned_version = 0
+
+
+def current_rates(allow_stale: bool = False) -> RateTable:
+    global _warned_version
+
+    table = _table
+    if table.version == 0:
+        table = _load_first_table()
+
+    if table.age() > FX_MAX_STALENESS:
+        if FX_STALE_RATES == "fail" and not allow_stale:
+            raise StaleRatesError(
+                f"rates version {table.version} are {table.age():.0f} seconds old"
+            )
+        if _warned_version != table.version:
+            _warned_version = table.version
+            logger.warning(
+                f"serving rates version {table.version}, {table.age():.0f} seconds old"
+            )
+    return table
 
 
 def get_rate(base_currency: Currency, quote_currency: Currency) -> Amount:
     pair_str = str(CurrencyPair(base_currency, quote_currency))
-    if pair_str not in RATES:
-        update_rates()
-    return RATES[pair_str]
+    rate = current_rates().rates.get(pair_str)
+    if rate is None:
+        raise LookupError(f"No conversion to currency pair {pair_str}")
+    return Amount().deserialize(rate)
 
 
-def update_rates():
+def update_rates() -> RateTable:
+    """Fetches the rates from the liquidity provider and swaps the table"""
+
+    rates = _fetch_rates()
+    version = _shared.next_version() if _shared else _table.version + 1
+    table = RateTable(version=version, timestamp=time(), rates=MappingProxyType(rates))
+    if _shared:
+        _shared.store(table)
+    _swap(table)
+    return table
+
+
+def refresh_rates() -> RateTable:
+    """A refresh tick: with the Redis tier only one process fetches the rates"""
+
+    if _shared is not None and not _shared.try_lead(FX_REFRESH_INTERVAL):
+        table = _shared.load()
+        if table is not None:
+            _swap(table)
+            return _table
+    return update_rates()
+
+
+def run_rate_refresher(stop: typing.Optional[threading.Event] = None) -> None:
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            refresh_rates()
+        except Exception:
+            logger.exception("refresh rates failed")
+        stop.wait(FX_REFRESH_INTERVAL)
+
+
+def use_shared_rates(shared: typing.Optional[SharedRates]) -> None:
+    global _shared
+    _shared = shared
+
+
+def _swap(table: RateTable) -> None:
+    global _table
+    # a single reference assignment, readers hold on to the table they got
+    if table.version > _table.version or _shared is None:
+        _table = table
+
+
+def _load_first_table() -> RateTable:
+    with _load_lock:
+        if _table.version == 0:
+            table = _shared.load() if _shared else None
+            if table is not None:
+                _swap(table)
+            else:
+                update_rates()
+        return _table
+
+
+def _fetch_rates() -> typing.Dict[str, int]:
     all_currencies = [
         Currency(c)
         for c in chain(list(FiatCurrency.__members__), list(DiemCurrency.__members__))
     ]
     base_currencies = [Currency(c) for c in DiemCurrency]
 
+    pairs = []
     for base_currency in base_currencies:
         for quote_currency in all_currencies:
             if base_currency == quote_currency:
                 continue
 
-            try:
-                _set_rate(base_currency, quote_currency)
-            except LookupError:
-                _set_rate(quote_currency, base_currency)
+            pair = _quoted_pair(base_currency, quote_currency)
+            if pair not in pairs:
+                pairs.append(pair)
 
+    rates: typing.Dict[str, int] = {}
+    try:
+        # a single request to the liquidity provider for all the pairs
+        quotes = LpClient().get_quotes(pairs=pairs, amount=1)
+    except (LookupError, LpError):
+        # a pair the liquidity provider does not quote fails the whole batch,
+        # the pairs are then quoted one by one, concurrently
+        with quote_executor(len(pairs)) as pool:
+            for pair, rate in pool.map(_quote_pair, pairs):
+                _store_rate(rates, pair, rate)
+        return rates
 
-def _set_rate(base_currency: Currency, quote_currency: Currency):
-    global RATES
-    rate = _get_rate_internal(
-        base_currency=base_currency, quote_currency=quote_currency
+    for pair, quote in zip(pairs, quotes):
+        _store_rate(rates, pair, Amount().deserialize(quote.rate.rate))
+    return rates
+
+
+def _quoted_pair(base_currency: Currency, quote_currency: Currency) -> CurrencyPair:
+    for pair in (
+        CurrencyPair(base_currency, quote_currency),
+        CurrencyPair(quote_currency, base_currency),
+    ):
+        if f"{pair.base.value}_{pair.quote.value}" in CurrencyPairs.__members__:
+            return pair
+
+    raise LookupError(
+        f"No conversion to currency pair {CurrencyPair(quote_currency, base_currency)}"
     )
-    RATES[str(CurrencyPair(base_currency, quote_currency))] = rate
+
+
+def _quote_pair(pair: CurrencyPair) -> typing.Tuple[CurrencyPair, Amount]:
+    try:
+        return pair, _get_rate_internal(pair.base, pair.quote)
+    except LookupError:
+        return (
+            CurrencyPair(pair.quote, pair.base),
+            _get_rate_internal(pair.quote, pair.base),
+        )
+
+
+def _store_rate(rates: typing.Dict[str, int], pair: CurrencyPair, rate: Amount):
+    rates[str(pair)] = rate.serialize()
     unit = Amount().deserialize(Amount.unit)
-    rate = unit / rate
-    RATES[str(CurrencyPair(quote_currency, base_currency))] = rate
+    rates[str(CurrencyPair(pair.quote, pair.base))] = (unit / rate).serialize()
 
 
 def _get_rate_internal(base_currency: Currency, quote_currency: Currency) -> Amount:
@@ -55,3 +268,16 @@ def _get_rate_internal(base_currency: Currency, quote_currency: Currency) -> Amo
         return Amount().deserialize(quote.rate.rate)
 
     raise LookupError(f"No conversion to currency pair {currency_pair}")
+
+
+def _redis_client():
+    import redis
+    from wallet.config import REDIS_DB, REDIS_HOST, REDIS_PASSWORD, REDIS_PORT
+
+    return redis.StrictRedis(
+        host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD
+    )
+
+
+if FX_RATES_REDIS:
+    use_shared_rates(SharedRates(_redis_client()))
@@ -0,0 +1,230 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Sends outbound offchain commands on a bounded worker pool, so a slow or
+unreachable counterparty VASP does not hold back the commands to the others.
+
+Per counterparty VASP (destination) at most OFFCHAIN_DISPATCH_PER_DESTINATION
+commands are in flight. A failed command is retried on a later round after an
+exponential backoff with jitter. OFFCHAIN_DISPATCH_BREAKER_THRESHOLD consecutive
+transport failures open the destination circuit for
+OFFCHAIN_DISPATCH_BREAKER_COOLDOWN seconds; after that a single probe command
+is let through, and its outcome closes or re-opens the circuit.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+OFFCHAIN_DISPATCH_WORKERS: int = int(os.getenv("OFFCHAIN_DISPATCH_WORKERS", 16))
+OFFCHAIN_DISPATCH_PER_DESTINATION: int = int(
+    os.getenv("OFFCHAIN_DISPATCH_PER_DESTINATION", 4)
+)
+OFFCHAIN_DISPATCH_BACKOFF_BASE: float = float(
+    os.getenv("OFFCHAIN_DISPATCH_BACKOFF_BASE", 1)
+)
+OFFCHAIN_DISPATCH_BACKOFF_MAX: float = float(
+    os.getenv("OFFCHAIN_DISPATCH_BACKOFF_MAX", 300)
+)
+OFFCHAIN_DISPATCH_BREAKER_THRESHOLD: int = int(
+    os.getenv("OFFCHAIN_DISPATCH_BREAKER_THRESHOLD", 5)
+)
+OFFCHAIN_DISPATCH_BREAKER_COOLDOWN: float = float(
+    os.getenv("OFFCHAIN_DISPATCH_BREAKER_COOLDOWN", 60)
+)
+
+MAX_TRACKED_RETRIES = 10_000
+
+
+@dataclass
+class DestinationState:
+    inflight: int = 0
+    failures: int = 0
+    open_until: float = 0.0
+    sent: int = 0
+    failed: int = 0
+
+
+@dataclass
+class RetryState:
+    attempts: int
+    not_before: float
+
+
+def is_transport_failure(e: BaseException) -> bool:
+    """Failures that say something about the destination health"""
+    return isinstance(e, requests.RequestException)
+
+
+class OutboundDispatcher:
+    def __init__(
+        self,
+        workers: int = OFFCHAIN_DISPATCH_WORKERS,
+        per_destination: int = OFFCHAIN_DISPATCH_PER_DESTINATION,
+        backoff_base: float = OFFCHAIN_DISPATCH_BACKOFF_BASE,
+        backoff_max: float = OFFCHAIN_DISPATCH_BACKOFF_MAX,
+        breaker_threshold: int = OFFCHAIN_DISPATCH_BREAKER_THRESHOLD,
+        breaker_cooldown: float = OFFCHAIN_DISPATCH_BREAKER_COOLDOWN,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.workers = workers
+        self.per_destination = per_destination
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.clock = clock
+        self.destinations: typing.Dict[str, DestinationState] = {}
+        self._retries: typing.Dict[str, RetryState] = {}
+        self._inflight: typing.Dict[str, Future] = {}
+        self._executor: typing.Optional[ThreadPoolExecutor] = None
+        self._executor_pid: typing.Optional[int] = None
+        self._lock = threading.Lock()
+
+    def submit(
+        self, key: str, destination: str, task: typing.Callable[[], None]
+    ) -> bool:
+        """
+        Runs task on the worker pool, unless the command identified by key is
+        already in flight or backing off, or the destination is saturated or
+        its circuit is open; the command is then picked up on a later round.
+        """
+        now = self.clock()
+        with self._lock:
+            if key in self._inflight:
+                return False
+            retry = self._retries.get(key)
+            if retry and now < retry.not_before:
+                return False
+
+            state = self.destinations.setdefault(destination, DestinationState())
+            limit = self.per_destination
+            if state.failures >= self.breaker_threshold:
+                if now < state.open_until:
+                    return False
+                # half-open: a single probe
+                limit = 1
+            if state.inflight >= limit:
+                return False
+
+            pool = self._pool()
+            state.inflight += 1
+            future = pool.submit(self._run, key, destination, task)
+            self._inflight[key] = future
+        return True
+
+    def wait(self, timeout: typing.Optional[float] = None) -> None:
+        """Waits for the commands in flight"""
+        with self._lock:
+            futures = list(self._inflight.values())
+        wait(futures, timeout=timeout)
+
+    def backing_off(self, key: str) -> bool:
+        """Whether the command identified by key failed and waits for its retry"""
+        with self._lock:
+            retry = self._retries.get(key)
+            return retry is not None and self.clock() < retry.not_before
+
+    def pending(self, key: str) -> bool:
+        """Whether the command identified by key is in flight or backing off"""
+        with self._lock:
+            if key in self._inflight:
+                return True
+            retry = self._retries.get(key)
+            return retry is not None and self.clock() < retry.not_before
+
+    def record(self, key: str, error: typing.Optional[Exception]) -> None:
+        """
+        Records the outcome of a command sent within the task of another key
+        (a batch of commands), so a failed command backs off on its own.
+        """
+        now = self.clock()
+        with self._lock:
+            if error is None:
+                self._retries.pop(key, None)
+            else:
+                self._back_off(key, now)
+
+    def is_open(self, destination: str) -> bool:
+        state = self.destinations.get(destination)
+        return (
+            state is not None
+            and state.failures >= self.breaker_threshold
+            and self.clock() < state.open_until
+        )
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # a forked process does not inherit the worker threads
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="offchain-dispatch"
+            )
+            self._executor_pid = os.getpid()
+            self._inflight.clear()
+            for state in self.destinations.values():
+                state.inflight = 0
+        return self._executor
+
+    def _run(self, key: str, destination: str, task: typing.Callable[[], None]):
+        error = None
+        try:
+            task()
+        except Exception as e:
+            error = e
+            logger.exception(f"send offchain command {key} to {destination} failed")
+        finally:
+            self._done(key, destination, error)
+
+    def _done(
+        self, key: str, destination: str, error: typing.Optional[Exception]
+    ) -> None:
+        now = self.clock()
+        with self._lock:
+            self._inflight.pop(key, None)
+            state = self.destinations[destination]
+            state.inflight -= 1
+
+            if error is None:
+                state.sent += 1
+                state.failures = 0
+                self._retries.pop(key, None)
+                return
+
+            state.failed += 1
+            if is_transport_failure(error):
+                state.failures += 1
+                if state.failures >= self.breaker_threshold:
+                    state.open_until = now + self.breaker_cooldown
+            self._back_off(key, now)
+
+    def _back_off(self, key: str, now: float) -> None:
+        if len(self._retries) > MAX_TRACKED_RETRIES:
+            self._forget_stale_retries(now)
+        retry = self._retries.setdefault(key, RetryState(0, now))
+        retry.attempts += 1
+        backoff = min(self.backoff_max, self.backoff_base * 2 ** (retry.attempts - 1))
+        # jittered between half and the full backoff, so the retries of
+        # commands that failed together spread out
+        retry.not_before = now + backoff * random.uniform(0.5, 1)
+
+    def _forget_stale_retries(self, now: float) -> None:
+        # commands that left the outbound statuses are never submitted again
+        for key in [
+            key
+            for key, retry in self._retries.items()
+            if retry.not_before + self.backoff_max < now
+        ]:
+            del self._retries[key]
+
+
+outbound_dispatcher = OutboundDispatcher()
@@ -2,15 +2,23 @@
 #  SPDX-License-Identifier: Apache-2.0
 import dataclasses
 import logging
+import zlib
+from collections import defaultdict
 from datetime import datetime
+from functools import partial
 from operator import attrgetter
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import context
 from diem import identifier
 import offchain
 from offchain import FundPullPreApprovalStatus
+from wallet.services.offchain.dispatcher import (
+    OutboundDispatcher,
+    is_transport_failure,
+)
 from wallet.services.offchain.utils import generate_my_address
+from wallet.storage import db_session
 
 from wallet.storage.account import get_account_id_from_subaddr
 
@@ -25,6 +33,9 @@ from wallet.storage.funds_pull_pre_approval_command import (
     get_account_command_by_id,
     get_account_commands_by_status,
     get_command_by_id_and_role,
+    get_accounts_and_commands_by_subaddresses,
+    get_unsent_commands,
+    mark_commands_sent,
     FundsPullPreApprovalCommandNotFound,
 )
 
@@ -49,6 +60,19 @@ class FPPAObject(offchain.FundsPullPreApprovalCommand):
     approved_at: int = None
 
 
+@dataclasses.dataclass(frozen=True)
+class Party:
+    """The payer or the payee of an inbound pre-approval, as known to this VASP"""
+
+    is_mine: bool
+    account_id: Optional[int] = None
+    command: Optional[models.FundsPullPreApprovalCommand] = None
+
+    @property
+    def existing_status(self) -> Optional[str]:
+        return self.command.status if self.command is not None else None
+
+
 def create_and_approve(
     account_id: int,
     biller_address: str,
@@ -192,29 +216,121 @@ def validate_expiration_timestamp(expiration_timestamp):
         raise ValueError("expiration timestamp must be in the future")
 
 
-def process_funds_pull_pre_approvals_requests():
-    commands = get_commands_by_sent_status(False)
+def process_funds_pull_pre_approvals_requests(
+    dispatcher: Optional[OutboundDispatcher] = None,
+) -> None:
+    send_funds_pull_pre_approvals(get_commands_by_sent_status(False), dispatcher)
+
+
+def send_funds_pull_pre_approvals(
+    commands: List[models.FundsPullPreApprovalCommand],
+    dispatcher: Optional[OutboundDispatcher] = None,
+) -> bool:
+    """
+    Sends the pre-approval commands to the counterparty VASPs.
+
+    Without a dispatcher the commands are sent right away, one after another.
+    With one, the commands are grouped by counterparty VASP into up to
+    per_destination batches, each sent by a dispatcher task. A command always
+    falls in the same batch, so it is never in flight twice, and a command that
+    failed is left out until its backoff is over. Returns False when some
+    command was not taken, to be retried later.
+    """
+    if dispatcher is None:
+        _send_funds_pull_pre_approvals(commands)
+        return True
 
+    taken = True
+    batches = defaultdict(list)
     for command in commands:
+        key = _dispatch_key(command)
+        if dispatcher.backing_off(key):
+            taken = False
+            continue
         cmd = preapproval_model_to_command(command)
-
-        logger.info(
-            f"Outgoing pre-approval: "
-            f"ID={cmd.funds_pull_pre_approval.funds_pull_pre_approval_id} "
-            f"status={cmd.funds_pull_pre_approval.status} "
-            f"my_address={cmd.my_address()} "
-            f"opponent_address={cmd.opponent_address()} "
-            f"payer={cmd.funds_pull_pre_approval.address} "
-            f"payee={cmd.funds_pull_pre_approval.biller_address}"
+        opponent_address, _ = identifier.decode_account(
+            cmd.opponent_address(), context.get().config.diem_address_hrp()
+        )
+        batch = zlib.crc32(key.encode()) % dispatcher.per_destination
+        batches[(opponent_address.to_hex(), batch)].append(
+            (command.account_id, command.funds_pull_pre_approval_id)
         )
 
-        context.get().offchain_client.send_command(
-            cmd, context.get().config.compliance_private_key().sign
+    for (destination, batch), keys in batches.items():
+        taken &= dispatcher.submit(
+            f"fppa:{destination}:{batch}",
+            destination,
+            partial(_send_funds_pull_pre_approvals_in_worker, dispatcher, keys),
         )
+    return taken
+
+
+def _dispatch_key(command: models.FundsPullPreApprovalCommand) -> str:
+    return dispatch_key(command.account_id, command.funds_pull_pre_approval_id)
+
 
-        command.offchain_sent = True
+def dispatch_key(account_id: int, funds_pull_pre_approval_id: str) -> str:
+    """Outbound dispatcher key of a pre-approval command"""
+    return f"fppa:{account_id}:{funds_pull_pre_approval_id}"
 
-        update_command(command)
+
+def _send_funds_pull_pre_approvals_in_worker(
+    dispatcher: OutboundDispatcher, keys: List[Tuple[int, str]]
+) -> None:
+    try:
+        _send_funds_pull_pre_approvals(get_unsent_commands(keys), dispatcher)
+    finally:
+        db_session.remove()
+
+
+def _send_funds_pull_pre_approvals(
+    commands: List[models.FundsPullPreApprovalCommand],
+    dispatcher: Optional[OutboundDispatcher] = None,
+) -> List[models.FundsPullPreApprovalCommand]:
+    """
+    Sends the commands and marks the sent ones at once. A failed command does
+    not stop the others, except for a transport failure in a dispatcher task:
+    the counterparty VASP is likely down, so the task fails and the dispatcher
+    backs off the batch. Returns the sent commands.
+    """
+    sent = []
+    try:
+        for command in commands:
+            try:
+                _send_funds_pull_pre_approval(command)
+            except Exception as e:
+                if dispatcher is not None and is_transport_failure(e):
+                    raise
+                logger.exception(
+                    f"send pre-approval {command.funds_pull_pre_approval_id} failed"
+                )
+                error = e
+            else:
+                sent.append(command)
+                error = None
+            if dispatcher is not None:
+                dispatcher.record(_dispatch_key(command), error)
+    finally:
+        mark_commands_sent(sent)
+    return sent
+
+
+def _send_funds_pull_pre_approval(command: models.FundsPullPreApprovalCommand):
+    cmd = preapproval_model_to_command(command)
+
+    logger.info(
+        f"Outgoing pre-approval: "
+        f"ID={cmd.funds_pull_pre_approval.funds_pull_pre_approval_id} "
+        f"status={cmd.funds_pull_pre_approval.status} "
+        f"my_address={cmd.my_address()} "
+        f"opponent_address={cmd.opponent_address()} "
+        f"payer={cmd.funds_pull_pre_approval.address} "
+        f"payee={cmd.funds_pull_pre_approval.biller_address}"
+    )
+
+    context.get().offchain_client.send_command(
+        cmd, context.get().config.compliance_private_key().sign
+    )
 
 
 def preapproval_command_to_model(
@@ -222,8 +338,10 @@ def preapproval_command_to_model(
     role: Role,
     offchain_sent: Optional[bool] = None,
     biller_name: Optional[str] = None,
+    account_id: Optional[int] = None,
 ) -> models.FundsPullPreApprovalCommand:
-    account_id = get_account_id_from_command(command, role)
+    if account_id is None:
+        account_id = get_account_id_from_command(command, role)
     preapproval_object = command.funds_pull_pre_approval
 
     max_cumulative_amount = preapproval_object.scope.max_cumulative_amount
@@ -363,52 +481,87 @@ def is_my_address(address_bech32: str) -> bool:
     return address.to_hex() == context.get().config.vasp_address
 
 
+def resolve_parties(
+    approval: offchain.FundPullPreApprovalObject,
+) -> Tuple[Party, Party]:
+    """
+    The payee and the payer of a pre-approval: whether their addresses belong
+    to this VASP, their accounts and their commands, read in a single query
+    """
+
+    hrp = context.get().config.diem_address_hrp()
+    vasp_address = context.get().config.vasp_address
+
+    subaddresses = []
+    for address_bech32 in (approval.biller_address, approval.address):
+        address, sub_address = identifier.decode_account(address_bech32, hrp)
+        is_mine = address.to_hex() == vasp_address
+        subaddresses.append(sub_address.hex() if is_mine and sub_address else None)
+
+    records = get_accounts_and_commands_by_subaddresses(
+        approval.funds_pull_pre_approval_id,
+        [sub_address for sub_address in subaddresses if sub_address],
+    )
+
+    payee, payer = [
+        Party(True, *records.get(sub_address, (None, None)))
+        if sub_address is not None
+        else Party(False)
+        for sub_address in subaddresses
+    ]
+    return payee, payer
+
+
 def handle_fund_pull_pre_approval_command(
     command: offchain.FundsPullPreApprovalCommand,
 ):
     approval = command.funds_pull_pre_approval
     validate_expiration_timestamp(approval.scope.expiration_timestamp)
 
-    fppa_id = approval.funds_pull_pre_approval_id
-    payee_address = approval.biller_address
-    payer_address = approval.address
-
+    payee, payer = resolve_parties(approval)
     role = reduce_role(
         incoming_status=approval.status,
-        is_payee_address_mine=is_my_address(payee_address),
-        is_payer_address_mine=is_my_address(approval.address),
-        existing_status_as_payee=get_existing_command_status(payee_address, fppa_id),
-        existing_status_as_payer=get_existing_command_status(payer_address, fppa_id),
+        is_payee_address_mine=payee.is_mine,
+        is_payer_address_mine=payer.is_mine,
+        existing_status_as_payee=payee.existing_status,
+        existing_status_as_payer=payer.existing_status,
     )
 
-    command_in_db = get_command_by_id_and_role(
-        approval.funds_pull_pre_approval_id, role
-    )
+    party = payer if role == Role.PAYER else payee
+    command_in_db = party.command
+    if command_in_db is not None and command_in_db.role != role:
+        command_in_db = None
+
     if command_in_db:
         validate_addresses(approval, command_in_db, role)
         validate_status(approval, command_in_db)
         update_command(
-            preapproval_command_to_model(command, role),
+            preapproval_command_to_model(command, role, account_id=party.account_id),
             approved_at=datetime.utcnow()
             if command.funds_pull_pre_approval.status == FundPullPreApprovalStatus.valid
             else None,
+            command_in_db=command_in_db,
         )
     else:
         biller_name = get_biller_name(command)
         commit_command(
-            preapproval_command_to_model(command, role, biller_name=biller_name)
+            preapproval_command_to_model(
+                command, role, biller_name=biller_name, account_id=party.account_id
+            )
         )
 
 
-def get_biller_name(command):
+def get_biller_name(command) -> Optional[str]:
+    """Cached with the other on-chain metadata of the biller account"""
+
     address, _ = identifier.decode_account(
         command.funds_pull_pre_approval.biller_address,
         context.get().config.diem_address_hrp(),
     )
-    biller_account = context.get().jsonrpc_client.get_account(address)
+    biller_account = context.get().offchain_client.resolver.get_account(address)
 
     if biller_account:
-        return biller_account.role.human_name
+        return biller_account.human_name
     else:
         return None
 
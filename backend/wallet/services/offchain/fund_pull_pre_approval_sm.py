@@ -3,7 +3,7 @@
 import logging
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from typing import Dict, Optional, Tuple, Union
 
 from offchain import FundPullPreApprovalStatus
 
@@ -30,14 +30,18 @@ def reduce_role(
     existing_status_as_payee: Optional[str],
     existing_status_as_payer: Optional[str],
 ) -> Role:
-    state = FppaState(
-        incoming_status=incoming_status,
-        is_payee_address_mine=is_payee_address_mine,
-        is_payer_address_mine=is_payer_address_mine,
-        existing_status_as_payee=existing_status_as_payee,
-        existing_status_as_payer=existing_status_as_payer,
-    )
-    return _reduce_role(state)
+    role = _role_table[
+        state_index(
+            incoming_status,
+            is_payee_address_mine,
+            is_payer_address_mine,
+            existing_status_as_payee,
+            existing_status_as_payer,
+        )
+    ]
+    if isinstance(role, Role):
+        return role
+    raise FundsPullPreApprovalStateError(role)
 
 
 @dataclass(frozen=True)
@@ -129,6 +133,22 @@ class FppaState:
 
 
 def build_role_reducer():
+    """The reducer as a dict lookup, reduce_role uses the compiled role table"""
+
+    all_states = build_role_states()
+
+    def reducer(state: FppaState) -> Role:
+        x = all_states[state]
+
+        if isinstance(x, FundsPullPreApprovalStateError):
+            raise x
+
+        return x
+
+    return reducer
+
+
+def build_role_states() -> Dict[FppaState, Union[Role, FundsPullPreApprovalStateError]]:
     Incoming = FundPullPreApprovalStatus
     Existing = FundPullPreApprovalStatus
 
@@ -236,15 +256,7 @@ def build_role_reducer():
     all_states.update(explicit_states)
     # fmt: on
 
-    def reducer(state: FppaState) -> Role:
-        x = all_states[state]
-
-        if isinstance(x, FundsPullPreApprovalStateError):
-            raise x
-
-        return x
-
-    return reducer
+    return all_states
 
 
 def make_error_states(states, error_description) -> dict:
@@ -422,4 +434,57 @@ def invalid_states_for_incoming_closed():
     ]
 
 
-_reduce_role = build_role_reducer()
+_STATUSES = (
+    FundPullPreApprovalStatus.pending,
+    FundPullPreApprovalStatus.valid,
+    FundPullPreApprovalStatus.rejected,
+    FundPullPreApprovalStatus.closed,
+)
+_INCOMING_INDEX = {status: i for i, status in enumerate(_STATUSES)}
+_EXISTING_INDEX = {**_INCOMING_INDEX, None: len(_STATUSES)}
+_EXISTING_COUNT = len(_EXISTING_INDEX)
+ROLE_TABLE_SIZE = len(_INCOMING_INDEX) * 2 * 2 * _EXISTING_COUNT * _EXISTING_COUNT
+
+
+def state_index(
+    incoming_status: str,
+    is_payee_address_mine: bool,
+    is_payer_address_mine: bool,
+    existing_status_as_payee: Optional[str],
+    existing_status_as_payer: Optional[str],
+) -> int:
+    """Packs the inputs of reduce_role into an index of the role table"""
+
+    index = _INCOMING_INDEX[incoming_status]
+    index = index * 2 + bool(is_payee_address_mine)
+    index = index * 2 + bool(is_payer_address_mine)
+    index = index * _EXISTING_COUNT + _EXISTING_INDEX[existing_status_as_payee]
+    return index * _EXISTING_COUNT + _EXISTING_INDEX[existing_status_as_payer]
+
+
+def compile_role_table(
+    all_states: Dict[FppaState, Union[Role, FundsPullPreApprovalStateError]]
+) -> Tuple[Union[Role, str], ...]:
+    """
+    The roles by state_index, an error message where the state is illegal.
+    Raises KeyError if a possible state is unknown
+    """
+
+    table = [None] * ROLE_TABLE_SIZE
+    for state in _all_possible_states:
+        x = all_states[state]
+        table[
+            state_index(
+                state.incoming_status,
+                state.is_payee_address_mine,
+                state.is_payer_address_mine,
+                state.existing_status_as_payee,
+                state.existing_status_as_payer,
+            )
+        ] = (
+            x if isinstance(x, Role) else str(x)
+        )
+    return tuple(table)
+
+
+_role_table = compile_role_table(build_role_states())
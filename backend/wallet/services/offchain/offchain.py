@@ -1,15 +1,23 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 import logging
+import os
+import threading
+import time
 import typing
+from concurrent.futures import ThreadPoolExecutor
 
 import context
 import offchain
 from offchain import CommandType
 from wallet.services.kyc import xstr
 from wallet.services.offchain import utils
+from wallet.services.offchain.dispatcher import outbound_dispatcher
+from wallet import storage
 from wallet.services.offchain.fund_pull_pre_approval import (
+    dispatch_key as funds_pull_pre_approval_dispatch_key,
     process_funds_pull_pre_approvals_requests,
+    send_funds_pull_pre_approvals,
     handle_fund_pull_pre_approval_command,
 )
 from wallet.services.offchain.p2m_payment_as_receiver import (
@@ -20,6 +28,7 @@ from wallet.services.offchain.p2m_payment_as_receiver import (
 )
 from wallet.services.offchain.p2p_payment import (
     process_payment_by_status,
+    process_payment,
     lock_and_save_inbound_command,
     model_to_payment_command,
     update_model_base_on_payment_command,
@@ -32,23 +41,82 @@ from wallet.services.offchain.p2p_payment_as_receiver import (
     save_payment_command_as_receiver,
 )
 from wallet.services.offchain.utils import evaluate_kyc_data
+from wallet.storage import db_session
 from wallet.types import (
     TransactionStatus,
 )
 
 logger = logging.getLogger(__name__)
 
+OFFCHAIN_OUTBOX_POLL_INTERVAL: float = float(
+    os.getenv("OFFCHAIN_OUTBOX_POLL_INTERVAL", 0.5)
+)
+OFFCHAIN_OUTBOX_BATCH_SIZE: int = int(os.getenv("OFFCHAIN_OUTBOX_BATCH_SIZE", 100))
+OFFCHAIN_SWEEP_INTERVAL: float = float(os.getenv("OFFCHAIN_SWEEP_INTERVAL", 30))
+# renewed by every sweep, taken over by another process when its holder
+# missed a couple of them
+OFFCHAIN_SWEEP_LEASE_SECS: float = float(
+    os.getenv("OFFCHAIN_SWEEP_LEASE_SECS", 2 * OFFCHAIN_SWEEP_INTERVAL)
+)
+OFFCHAIN_SWEEP_LEASE = "offchain-sweep"
+OFFCHAIN_VERIFY_WORKERS: int = int(os.getenv("OFFCHAIN_VERIFY_WORKERS", 4))
+OFFCHAIN_BATCH_MAX_COMMANDS: int = int(os.getenv("OFFCHAIN_BATCH_MAX_COMMANDS", 100))
+OFFCHAIN_BATCH_MAX_BYTES: int = int(
+    os.getenv("OFFCHAIN_BATCH_MAX_BYTES", OFFCHAIN_BATCH_MAX_COMMANDS * 64 * 1024)
+)
+
+_verify_executor: typing.Optional[ThreadPoolExecutor] = None
+_verify_executor_pid: typing.Optional[int] = None
+_verify_lock = threading.Lock()
+
 
 def process_inbound_command(
     request_sender_address: str,
     request_body_bytes: bytes,
 ) -> (int, bytes):
-    command = None
     try:
         request = utils.offchain_client().deserialize_jws_request(
             request_sender_address, request_body_bytes
         )
+    except offchain.Error as e:
+        logger.exception(e)
+        return utils.jws_response(None, e.obj)
+
+    return _process_inbound_request(request_sender_address, request)
+
+
+def process_inbound_commands(
+    request_sender_address: str,
+    requests_bytes: typing.List[bytes],
+) -> typing.List[typing.Tuple[int, bytes]]:
+    """
+    Processes a batch of commands of a sender: the JWS signatures are verified
+    concurrently, then the commands are processed one by one, in order
+    """
+
+    try:
+        requests = utils.offchain_client().deserialize_jws_requests(
+            request_sender_address, requests_bytes, _verify_pool().map
+        )
+    except offchain.Error as e:
+        logger.exception(e)
+        return [utils.jws_response(None, e.obj)] * len(requests_bytes)
+
+    responses = []
+    for request in requests:
+        if isinstance(request, offchain.Error):
+            logger.error(request)
+            responses.append(utils.jws_response(None, request.obj))
+        else:
+            responses.append(_process_inbound_request(request_sender_address, request))
+    return responses
+
 
+def _process_inbound_request(
+    request_sender_address: str, request: offchain.CommandRequestObject
+) -> (int, bytes):
+    command = None
+    try:
         # LRW as RECEIVER
         if request.command_type == CommandType.GetPaymentInfo:
             return handle_incoming_get_payment_info_request(request)
@@ -87,110 +155,257 @@ def process_inbound_command(
         return utils.jws_response(command.id() if command else None, e.obj)
 
 
-def process_offchain_tasks() -> None:
-    def send_command(model) -> None:
-        assert not model.inbound
-        model.status = TransactionStatus.OFF_CHAIN_WAIT
-        cmd = model_to_payment_command(model)
-        utils.offchain_client().send_command(cmd, utils.compliance_private_key().sign)
+def _verify_pool() -> ThreadPoolExecutor:
+    global _verify_executor, _verify_executor_pid
+    # a forked process does not inherit the worker threads
+    with _verify_lock:
+        if _verify_executor is None or _verify_executor_pid != os.getpid():
+            _verify_executor = ThreadPoolExecutor(
+                max_workers=OFFCHAIN_VERIFY_WORKERS,
+                thread_name_prefix="offchain-verify",
+            )
+            _verify_executor_pid = os.getpid()
+        return _verify_executor
 
-    def offchain_action(model) -> None:
-        assert model.inbound
-        cmd = model_to_payment_command(model)
-        action = cmd.follow_up_action()
 
+def _send_command(model) -> None:
+    assert not model.inbound
+    model.status = TransactionStatus.OFF_CHAIN_WAIT
+    cmd = model_to_payment_command(model)
+    utils.offchain_client().send_command(cmd, utils.compliance_private_key().sign)
+
+
+def _offchain_action(model) -> None:
+    assert model.inbound
+    cmd = model_to_payment_command(model)
+    action = cmd.follow_up_action()
+
+    logger.info(
+        f"handling offchain_action reference_id: {model.reference_id}, "
+        f"sender address: {model.sender_address}, "
+        f"sender status: {model.sender_status}, "
+        f"receiver address: {model.receiver_address}, "
+        f"receiver status: {model.receiver_status}, "
+        f"action: {action}"
+    )
+
+    if action is None:
+        return
+    if action == offchain.Action.EVALUATE_KYC_DATA:
+        new_cmd = evaluate_kyc_data(cmd)
+        status = payment_command_status(new_cmd, TransactionStatus.OFF_CHAIN_OUTBOUND)
+        update_model_base_on_payment_command(model, new_cmd, status)
+    else:
+        # todo: handle REVIEW_KYC_DATA and CLEAR_SOFT_MATCH
+        raise ValueError(f"unsupported offchain action: {action}, command: {cmd}")
+
+
+def _submit_txn(model) -> None:
+    if model.sender_address == model.my_actor_address:
+        cmd = model_to_payment_command(model)
+        utils.offchain_client().send_command(cmd, utils.compliance_private_key().sign)
         logger.info(
-            f"handling offchain_action reference_id: {model.reference_id}, "
-            f"sender address: {model.sender_address}, "
-            f"sender status: {model.sender_status}, "
-            f"receiver address: {model.receiver_address}, "
-            f"receiver status: {model.receiver_status}, "
-            f"action: {action}"
+            f"Submitting transaction base on command ref id:{model.reference_id} {model.amount} {model.currency}"
+        )
+        rpc_txn = context.get().p2p_by_travel_rule(
+            cmd.receiver_account_address(utils.hrp()),
+            cmd.payment.action.currency,
+            cmd.payment.action.amount,
+            cmd.travel_rule_metadata(utils.hrp()),
+            bytes.fromhex(cmd.payment.recipient_signature),
         )
+        transaction = add_transaction_based_on_payment_command(
+            command=cmd,
+            status=TransactionStatus.COMPLETED,
+            sequence=rpc_txn.transaction.sequence_number,
+            blockchain_version=rpc_txn.version,
+        )
+        logger.info(
+            f"Submitted transaction ID:{transaction.id} V:{transaction.blockchain_version} {transaction.amount} {transaction.currency}"
+        )
+        model.status = TransactionStatus.COMPLETED
+
+
+def _send_command_as_receiver(model) -> None:
+    payment_command = model_to_payment_command(model)
+    kyc_data = {
+        "payload_version": 1,
+        "type": "individual",
+        "given_name": xstr("Bond"),
+        "surname": xstr("Marton"),
+        "dob": xstr("2010-21-01"),
+        "address": {
+            "city": xstr("Dogcity"),
+            "country": xstr("Dogland"),
+            "line1": xstr("1234 Puppy Street"),
+            "line2": xstr("dogpalace 3"),
+            "postal_code": xstr("123456"),
+            "state": xstr("Dogstate"),
+        },
+    }
+
+    if not model.recipient_signature:
+        sig_msg = payment_command.travel_rule_metadata_signature_message(utils.hrp())
+    else:
+        sig_msg = model.recipient_signature
+
+    new_command = payment_command.new_command(
+        recipient_signature=utils.compliance_private_key().sign(sig_msg).hex(),
+        kyc_data=kyc_data,
+        status=offchain.Status.ready_for_settlement,
+        inbound=payment_command.inbound,
+    )
+
+    update_model_base_on_payment_command(
+        model, new_command, TransactionStatus.OFF_CHAIN_WAIT
+    )
+
+    utils.offchain_client().send_command(
+        new_command, utils.compliance_private_key().sign
+    )
 
-        if action is None:
-            return
-        if action == offchain.Action.EVALUATE_KYC_DATA:
-            new_cmd = evaluate_kyc_data(cmd)
-            status = payment_command_status(
-                new_cmd, TransactionStatus.OFF_CHAIN_OUTBOUND
-            )
-            update_model_base_on_payment_command(model, new_cmd, status)
-        else:
-            # todo: handle REVIEW_KYC_DATA and CLEAR_SOFT_MATCH
-            raise ValueError(f"unsupported offchain action: {action}, command: {cmd}")
-
-    def submit_txn(model) -> None:
-        if model.sender_address == model.my_actor_address:
-            cmd = model_to_payment_command(model)
-            utils.offchain_client().send_command(
-                cmd, utils.compliance_private_key().sign
-            )
-            logger.info(
-                f"Submitting transaction base on command ref id:{model.reference_id} {model.amount} {model.currency}"
-            )
-            rpc_txn = context.get().p2p_by_travel_rule(
-                cmd.receiver_account_address(utils.hrp()),
-                cmd.payment.action.currency,
-                cmd.payment.action.amount,
-                cmd.travel_rule_metadata(utils.hrp()),
-                bytes.fromhex(cmd.payment.recipient_signature),
-            )
-            transaction = add_transaction_based_on_payment_command(
-                command=cmd,
-                status=TransactionStatus.COMPLETED,
-                sequence=rpc_txn.transaction.sequence_number,
-                blockchain_version=rpc_txn.version,
-            )
-            logger.info(
-                f"Submitted transaction ID:{transaction.id} V:{transaction.blockchain_version} {transaction.amount} {transaction.currency}"
-            )
-            model.status = TransactionStatus.COMPLETED
-
-    def send_command_as_receiver(model) -> None:
-        payment_command = model_to_payment_command(model)
-        kyc_data = {
-            "payload_version": 1,
-            "type": "individual",
-            "given_name": xstr("Bond"),
-            "surname": xstr("Marton"),
-            "dob": xstr("2010-21-01"),
-            "address": {
-                "city": xstr("Dogcity"),
-                "country": xstr("Dogland"),
-                "line1": xstr("1234 Puppy Street"),
-                "line2": xstr("dogpalace 3"),
-                "postal_code": xstr("123456"),
-                "state": xstr("Dogstate"),
-            },
-        }
-
-        if not model.recipient_signature:
-            sig_msg = payment_command.travel_rule_metadata_signature_message(
-                utils.hrp()
-            )
-        else:
-            sig_msg = model.recipient_signature
 
-        new_command = payment_command.new_command(
-            recipient_signature=utils.compliance_private_key().sign(sig_msg).hex(),
-            kyc_data=kyc_data,
-            status=offchain.Status.ready_for_settlement,
-            inbound=payment_command.inbound,
+# payment command status -> (handler, whether it sends a command to the
+# counterparty VASP and so runs on the outbound dispatcher)
+PAYMENT_STATUS_HANDLERS = {
+    TransactionStatus.OFF_CHAIN_OUTBOUND: (_send_command, True),
+    TransactionStatus.OFF_CHAIN_INBOUND: (_offchain_action, False),
+    # sends the command and submits the on-chain transaction, kept serial so
+    # the transactions do not compete for the VASP account sequence number
+    TransactionStatus.OFF_CHAIN_READY: (_submit_txn, False),
+    TransactionStatus.OFF_CHAIN_RECEIVER_OUTBOUND: (_send_command_as_receiver, True),
+}
+
+
+def process_offchain_tasks(wait: bool = True) -> None:
+    """
+    Processes every actionable offchain command. Commands to counterparty
+    VASPs are sent concurrently by the outbound dispatcher; with wait=False
+    the commands still in flight are left to it, and skipped by the following
+    rounds until they are done.
+    """
+
+    for status, (handler, dispatched) in PAYMENT_STATUS_HANDLERS.items():
+        process_payment_by_status(
+            status, handler, outbound_dispatcher if dispatched else None
         )
+    process_funds_pull_pre_approvals_requests(outbound_dispatcher)
+    if wait:
+        outbound_dispatcher.wait()
+
+
+def process_offchain_tasks_as_leader() -> bool:
+    """
+    Processes every actionable offchain command when this process holds the
+    sweep lease, so a single process of the deployment sweeps. Returns False
+    when another process holds it.
+    """
 
-        update_model_base_on_payment_command(
-            model, new_command, TransactionStatus.OFF_CHAIN_WAIT
+    if not storage.acquire_lease(
+        OFFCHAIN_SWEEP_LEASE, storage.lease_holder(), OFFCHAIN_SWEEP_LEASE_SECS
+    ):
+        return False
+    process_offchain_tasks(wait=False)
+    return True
+
+
+def process_offchain_task(kind: str, key: str) -> bool:
+    """
+    Processes the offchain command of an outbox task in its current state.
+    Returns True once the task is done: the command is not actionable anymore,
+    or was processed inline. A command left to the outbound dispatcher is
+    checked again on the next call, so a failed send is submitted again as
+    soon as its backoff is over.
+    """
+
+    if kind == storage.PAYMENT_TASK:
+        model = storage.get_payment_command(key)
+        status = TransactionStatus(model.status) if model else None
+        if status not in PAYMENT_STATUS_HANDLERS:
+            return True
+        handler, dispatched = PAYMENT_STATUS_HANDLERS[status]
+        if not dispatched:
+            return process_payment(model, status, handler)
+        process_payment(model, status, handler, outbound_dispatcher)
+        return False
+
+    if kind == storage.FUNDS_PULL_PRE_APPROVAL_TASK:
+        account_id, funds_pull_pre_approval_id = key.split(":", 1)
+        command = storage.get_account_command_by_id(
+            int(account_id), funds_pull_pre_approval_id
         )
+        if command is None or command.offchain_sent:
+            return True
+        send_funds_pull_pre_approvals([command], outbound_dispatcher)
+        return False
+
+    logger.warning(f"unknown offchain task kind: {kind}, key: {key}")
+    return True
 
-        utils.offchain_client().send_command(
-            new_command, utils.compliance_private_key().sign
+
+def process_offchain_outbox(
+    deferred: typing.Optional[typing.Dict[typing.Tuple[str, str], None]] = None,
+) -> int:
+    """
+    Claims the outbox tasks and processes them. Tasks not done yet, mostly
+    commands left to the outbound dispatcher, are kept in deferred and tried
+    again on the next call, skipped while their command is in flight or
+    backing off. Returns the number of claimed tasks.
+    """
+
+    if deferred is None:
+        deferred = {}
+    tasks = storage.claim_offchain_tasks(OFFCHAIN_OUTBOX_BATCH_SIZE)
+    for task in tasks:
+        deferred[task] = None
+
+    for task in list(deferred):
+        if outbound_dispatcher.pending(_dispatch_key(*task)):
+            continue
+        try:
+            if process_offchain_task(*task):
+                del deferred[task]
+        except Exception:
+            del deferred[task]
+            logger.exception(f"process offchain task {task} failed")
+        finally:
+            db_session.remove()
+    return len(tasks)
+
+
+def _dispatch_key(kind: str, key: str) -> str:
+    if kind == storage.FUNDS_PULL_PRE_APPROVAL_TASK:
+        account_id, funds_pull_pre_approval_id = key.split(":", 1)
+        return funds_pull_pre_approval_dispatch_key(
+            int(account_id), funds_pull_pre_approval_id
         )
+    return key
 
-    process_payment_by_status(TransactionStatus.OFF_CHAIN_OUTBOUND, send_command)
-    process_payment_by_status(TransactionStatus.OFF_CHAIN_INBOUND, offchain_action)
-    process_payment_by_status(TransactionStatus.OFF_CHAIN_READY, submit_txn)
-    process_payment_by_status(
-        TransactionStatus.OFF_CHAIN_RECEIVER_OUTBOUND, send_command_as_receiver
-    )
-    process_funds_pull_pre_approvals_requests()
+
+def run_offchain_worker(stop: typing.Optional[threading.Event] = None) -> None:
+    """
+    Processes offchain commands as their state changes: woken up by the
+    commits of this process, and polling the outbox every
+    OFFCHAIN_OUTBOX_POLL_INTERVAL seconds for the commits of the others.
+    Every OFFCHAIN_SWEEP_INTERVAL seconds all the actionable commands are
+    processed, for the ones whose task was lost or dropped, by the one worker
+    of the deployment holding the sweep lease.
+    """
+
+    deferred: typing.Dict[typing.Tuple[str, str], None] = {}
+    next_sweep = 0.0
+    while stop is None or not stop.is_set():
+        try:
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + OFFCHAIN_SWEEP_INTERVAL
+                process_offchain_tasks_as_leader()
+                db_session.remove()
+            # a full batch: more tasks are waiting
+            if process_offchain_outbox(deferred) == OFFCHAIN_OUTBOX_BATCH_SIZE:
+                continue
+        except Exception:
+            logger.exception("process offchain outbox failed")
+            db_session.remove()
+
+        storage.offchain_tasks_committed.wait(OFFCHAIN_OUTBOX_POLL_INTERVAL)
+        storage.offchain_tasks_committed.clear()
@@ -1,5 +1,6 @@
 import logging
 from datetime import datetime
+from functools import partial
 from typing import Optional, Callable, List
 
 import context
@@ -9,6 +10,7 @@ from diem_utils.types.currencies import DiemCurrency
 from offchain import Status
 from wallet import storage
 from wallet.services import account
+from wallet.services.offchain.dispatcher import OutboundDispatcher
 from wallet.services.offchain.utils import (
     hrp,
     account_address_and_subaddress,
@@ -22,6 +24,7 @@ from wallet.storage import (
     get_account_id_from_subaddr,
     Transaction,
     TransactionType,
+    db_session,
 )
 from wallet.storage import save_payment_command
 
@@ -89,28 +92,76 @@ def get_payment_command(reference_id: str) -> Optional[offchain.PaymentCommand]:
 def process_payment_by_status(
     status: TransactionStatus,
     callback: Callable[[PaymentCommandModel], Optional[PaymentCommandModel]],
+    dispatcher: Optional[OutboundDispatcher] = None,
 ) -> None:
+    """
+    Runs callback on every payment command in the given status, each under its
+    row lock; with a dispatcher, on its worker pool, one DB session per worker
+    """
     commands_models = storage.get_payment_commands_by_status(status)
     for model in commands_models:
+        process_payment(model, status, callback, dispatcher)
 
-        def callback_with_status_check(model):
-            if model.status == status:
-                callback(model)
-            return model
-
-        logger.info(
-            f"lock model for update ["
-            f"reference_id: {model.reference_id}, "
-            f"status: {model.status}, "
-            f"{model.sender_address} ({model.sender_status}) "
-            f"--> "
-            f"{model.receiver_address} ({model.receiver_status})"
-            f"]"
+
+def process_payment(
+    model: PaymentCommandModel,
+    status: TransactionStatus,
+    callback: Callable[[PaymentCommandModel], Optional[PaymentCommandModel]],
+    dispatcher: Optional[OutboundDispatcher] = None,
+) -> bool:
+    """
+    Runs callback on the payment command under its row lock, if it is still in
+    the given status by then. Returns False when the dispatcher did not take
+    the command, to be retried later.
+    """
+
+    def callback_with_status_check(model):
+        if model.status == status:
+            callback(model)
+        return model
+
+    logger.info(
+        f"lock model for update ["
+        f"reference_id: {model.reference_id}, "
+        f"status: {model.status}, "
+        f"{model.sender_address} ({model.sender_status}) "
+        f"--> "
+        f"{model.receiver_address} ({model.receiver_status})"
+        f"]"
+    )
+    if dispatcher is not None:
+        return dispatcher.submit(
+            model.reference_id,
+            _counterparty_vasp_address(model),
+            partial(
+                _lock_for_update_in_worker,
+                model.reference_id,
+                callback_with_status_check,
+            ),
         )
-        try:
-            lock_for_update(model.reference_id, callback_with_status_check)
-        except Exception:
-            logger.exception("process offchain transaction failed")
+
+    try:
+        lock_for_update(model.reference_id, callback_with_status_check)
+    except Exception:
+        logger.exception("process offchain transaction failed")
+    return True
+
+
+def _lock_for_update_in_worker(reference_id: str, callback) -> None:
+    try:
+        lock_for_update(reference_id, callback)
+    finally:
+        db_session.remove()
+
+
+def _counterparty_vasp_address(model: PaymentCommandModel) -> str:
+    counterparty = (
+        model.receiver_address
+        if model.my_actor_address == model.sender_address
+        else model.sender_address
+    )
+    address, _ = identifier.decode_account(counterparty, hrp())
+    return address.to_hex()
 
 
 def lock_and_save_inbound_command(
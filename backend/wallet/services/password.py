@@ -0,0 +1,125 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Password hashing off the request threads: the key derivation runs on a pool
+of PASSWORD_HASH_WORKERS processes. At most PASSWORD_HASH_QUEUE_SIZE
+derivations wait for a free worker; more are rejected right away with
+PasswordHashingBusyError, so a login storm is answered with 503 instead of
+piling up requests behind the CPU.
+
+Stored hashes carry their parameters, "pbkdf2_sha256$<iterations>$<hex>",
+so PASSWORD_HASH_ITERATIONS can be tuned per deployment: a password hashed
+with other parameters is rehashed on the next successful login. Hashes
+without parameters are the former pbkdf2_sha256 with 100,000 iterations.
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import typing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from dataclasses import dataclass
+
+PASSWORD_HASH_ITERATIONS: int = int(os.getenv("PASSWORD_HASH_ITERATIONS", 100_000))
+PASSWORD_HASH_WORKERS: int = int(
+    os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+)
+PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 32))
+PASSWORD_HASH_TIMEOUT: float = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+
+PBKDF2_SHA256 = "pbkdf2_sha256"
+LEGACY_ITERATIONS = 100_000
+
+
+class PasswordHashingBusyError(Exception):
+    ...
+
+
+@dataclass(frozen=True)
+class HashParams:
+    algorithm: str
+    iterations: int
+
+    def encode(self, password_hash: bytes) -> str:
+        return f"{self.algorithm}${self.iterations}${password_hash.hex()}"
+
+    @staticmethod
+    def decode(stored_hash: str) -> typing.Tuple["HashParams", str]:
+        if "$" not in stored_hash:
+            return HashParams(PBKDF2_SHA256, LEGACY_ITERATIONS), stored_hash
+        algorithm, iterations, password_hash = stored_hash.split("$")
+        return HashParams(algorithm, int(iterations)), password_hash
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        iterations: int = PASSWORD_HASH_ITERATIONS,
+        workers: int = PASSWORD_HASH_WORKERS,
+        queue_size: int = PASSWORD_HASH_QUEUE_SIZE,
+        timeout: float = PASSWORD_HASH_TIMEOUT,
+    ) -> None:
+        self.params = HashParams(PBKDF2_SHA256, iterations)
+        self.workers = workers
+        self.timeout = timeout
+        # derivations running or waiting for a worker
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor: typing.Optional[ProcessPoolExecutor] = None
+        self._executor_pid: typing.Optional[int] = None
+        self._lock = threading.Lock()
+
+    def hash(self, password: str) -> typing.Tuple[str, str]:
+        """Returns the stored hash and the hex salt of a new password"""
+
+        salt = os.urandom(32)
+        password_hash = self._derive(self.params, password, salt)
+        return self.params.encode(password_hash), salt.hex()
+
+    def verify(self, password: str, stored_hash: str, salt: str) -> bool:
+        params, expected = HashParams.decode(stored_hash)
+        password_hash = self._derive(params, password, bytes.fromhex(salt))
+        return hmac.compare_digest(password_hash.hex(), expected)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        return HashParams.decode(stored_hash)[0] != self.params
+
+    def _derive(self, params: HashParams, password: str, salt: bytes) -> bytes:
+        if params.algorithm != PBKDF2_SHA256:
+            raise ValueError(f"unknown password hash algorithm {params.algorithm}")
+
+        args = ("sha256", password.encode("utf-8"), salt, params.iterations)
+        if self.workers == 0:
+            return hashlib.pbkdf2_hmac(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusyError("too many password hashing requests")
+        try:
+            future = self._pool().submit(hashlib.pbkdf2_hmac, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHashingBusyError("password hashing timed out")
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # a forked process does not inherit the worker processes; the workers
+        # are spawned, forking the threads of the web process could deadlock
+        # them on a lock held by one of the threads
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,33 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Callable, Optional
+
+import context
+from context.sequence import SequenceAllocator
+from wallet import storage
+
+
+class DbSequenceAllocator(SequenceAllocator):
+    """Allocator shared by the wallet processes through the account_sequence
+    table"""
+
+    def reserve(self, address: str, chain_sequence: Callable[[], int]) -> int:
+        return storage.reserve_account_sequence(address, chain_sequence)
+
+    def resync(self, address: str, chain_sequence: int) -> None:
+        storage.resync_account_sequence(address, chain_sequence)
+
+    def peek(self, address: str) -> Optional[int]:
+        return storage.get_account_sequence(address)
+
+    def reset(self, address: str, sequence: int, observed: Optional[int]) -> bool:
+        return storage.reset_account_sequence(address, sequence, observed)
+
+    def release(self, address: str, sequence: int) -> None:
+        storage.release_account_sequence(address, sequence)
+
+
+def with_db_sequence_allocator(ctx: context.Context) -> context.Context:
+    ctx.sequence_allocator = DbSequenceAllocator()
+    return ctx
@@ -1,25 +1,53 @@
 import logging
 import os
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from diem import jsonrpc, diem_types
-from sqlalchemy import desc
-from sqlalchemy_paginator import Paginator
 from wallet.services import account as account_service, INVENTORY_ACCOUNT_NAME
 from wallet.services.account import generate_new_subaddress
 from wallet.storage import (
     get_transaction_by_blockchain_version,
-    add_transaction,
+    commit_transaction,
     TransactionStatus,
     TransactionType,
-    delete_transaction_by_id,
     Account,
     Transaction,
     SubAddress,
+    get_chain_sync_progress,
+    get_chain_sync_up_to_version,
+    get_chain_sync_watermarks,
+    save_chain_sync_watermark,
+    get_latest_external_version,
+    get_existing_blockchain_versions,
+    save_chain_sync_page,
+    delete_transactions_missing_from_chain_sync,
+    clear_chain_sync,
+    get_submitted_transaction,
+    complete_submitted_transaction,
+    acquire_lease,
+    release_lease,
+    lease_holder,
 )
 
 CURRENCY = "XUS"
 PAGE_SIZE = 10
+# page size limit of the JSON-RPC get_events and get_transactions methods
+CHAIN_PAGE_SIZE = 1000
+# versions between two wallet transactions are fetched along in one
+# get_transactions call as long as the gap is not wider than this
+SYNC_MAX_VERSION_GAP = int(os.getenv("SYNC_MAX_VERSION_GAP", 32))
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", 4))
+# how often the scheduled sync-db job runs a full reconciliation instead of
+# syncing only the events past the watermarks
+SYNC_DB_FULL_INTERVAL_SECS = int(os.getenv("SYNC_DB_FULL_INTERVAL_SECS", 6 * 60 * 60))
+# a single process of the deployment syncs at a time, the one holding the
+# lease; it is renewed on every synced page
+SYNC_DB_LEASE_SECS = float(os.getenv("SYNC_DB_LEASE_SECS", 120))
+SYNC_DB_LEASE = "sync-db"
 
 VASP_ADDRESS = os.getenv("VASP_ADDR")
 JSON_RPC_URL = os.getenv("JSON_RPC_URL")
@@ -27,29 +55,166 @@ JSON_RPC_URL = os.getenv("JSON_RPC_URL")
 logger = logging.getLogger("sync-db")
 
 
-def sync_db():
-    client = jsonrpc.Client(JSON_RPC_URL)
-    up_to_version = client.get_metadata().version
+class SyncLeaseLostError(Exception):
+    pass
+
+
+@dataclass
+class SyncDbMetrics:
+    last_sync_at: Optional[datetime] = None
+    last_sync_duration_secs: Optional[float] = None
+    last_sync_events: int = 0
+    last_full_sync_at: Optional[datetime] = None
+    last_full_sync_duration_secs: Optional[float] = None
+
+
+metrics = SyncDbMetrics()
+_client: Optional[jsonrpc.Client] = None
+
+
+def get_client() -> jsonrpc.Client:
+    global _client
+    if _client is None:
+        _client = jsonrpc.Client(JSON_RPC_URL)
+    return _client
+
+
+def get_sync_db_metrics() -> Dict:
+    return {
+        "last_sync_at": metrics.last_sync_at,
+        "last_sync_duration_secs": metrics.last_sync_duration_secs,
+        "last_sync_events": metrics.last_sync_events,
+        "last_full_sync_at": metrics.last_full_sync_at,
+        "last_full_sync_duration_secs": metrics.last_full_sync_duration_secs,
+        "watermarks": [
+            {
+                "events_key": watermark.events_key,
+                "next_seq": watermark.next_seq,
+                "version": watermark.version,
+            }
+            for watermark in get_chain_sync_watermarks().values()
+        ],
+    }
+
+
+def run_scheduled_sync_db():
+    """Sync the events past the watermarks, and run a full reconciliation when
+    the last one is older than SYNC_DB_FULL_INTERVAL_SECS"""
+    last_full_sync_at = metrics.last_full_sync_at
+    if (
+        last_full_sync_at is None
+        or (datetime.utcnow() - last_full_sync_at).total_seconds()
+        >= SYNC_DB_FULL_INTERVAL_SECS
+    ):
+        sync_db()
+    else:
+        sync_new_events()
 
-    onchain_account = client.get_account(VASP_ADDRESS)
 
-    transactions_in_db = Transaction.query.filter_by(type=TransactionType.EXTERNAL)
-    count = transactions_in_db.count()
+def sync_db():
+    if not acquire_lease(SYNC_DB_LEASE, lease_holder(), SYNC_DB_LEASE_SECS):
+        logger.info("another process is syncing, skipped")
+        return
+    try:
+        _sync_db()
+    finally:
+        release_lease(SYNC_DB_LEASE, lease_holder())
+
+
+def _sync_db():
+    start_time = time.time()
+    client = get_client()
+    up_to_version = get_latest_external_version()
+    if up_to_version is None:
+        up_to_version = client.get_metadata().version
 
-    if count > 0:
-        db_latest_version = (
-            transactions_in_db.order_by(desc(Transaction.blockchain_version))
-            .first()
-            .blockchain_version
-        )
-        if db_latest_version is not None:
-            up_to_version = db_latest_version
+    onchain_account = client.get_account(VASP_ADDRESS)
 
     if sync_required(onchain_account, up_to_version):
         sync(client, onchain_account, up_to_version)
     else:
         logger.info("balances equal, no synchronization required")
 
+    metrics.last_full_sync_at = datetime.utcnow()
+    metrics.last_full_sync_duration_secs = time.time() - start_time
+
+
+def sync_new_events():
+    """
+    Add the missing transactions of the events past the per event key
+    watermarks. Only events up to the latest external transaction version in
+    the DB are synced, newer ones are left to pubsub as in sync_db.
+    Removing transactions which are not on chain is left to sync_db.
+    """
+    if not acquire_lease(SYNC_DB_LEASE, lease_holder(), SYNC_DB_LEASE_SECS):
+        logger.info("another process is syncing, skipped")
+        return
+    try:
+        _sync_new_events()
+    finally:
+        release_lease(SYNC_DB_LEASE, lease_holder())
+
+
+def _sync_new_events():
+    start_time = time.time()
+    client = get_client()
+    watermarks = {
+        events_key: watermark.next_seq
+        for events_key, watermark in get_chain_sync_watermarks().items()
+    }
+    if not watermarks:
+        onchain_account = client.get_account(VASP_ADDRESS)
+        watermarks = {
+            onchain_account.received_events_key: 0,
+            onchain_account.sent_events_key: 0,
+        }
+        for events_key in watermarks:
+            save_chain_sync_watermark(events_key, 0, None, [])
+
+    up_to_version = get_latest_external_version()
+    if up_to_version is None:
+        up_to_version = client.get_metadata().version
+
+    synced_events = 0
+    with ThreadPoolExecutor(max_workers=SYNC_CONCURRENCY) as executor:
+        for events_key, next_seq in watermarks.items():
+            synced_events += sync_events_after_watermark(
+                events_key, next_seq, client, up_to_version, executor
+            )
+
+    metrics.last_sync_at = datetime.utcnow()
+    metrics.last_sync_duration_secs = time.time() - start_time
+    metrics.last_sync_events = synced_events
+    logger.info(
+        f"synced {synced_events} new events in {metrics.last_sync_duration_secs:.3f}s"
+    )
+
+
+def sync_events_after_watermark(events_key, start, client, up_to_version, executor):
+    synced_events = 0
+
+    while True:
+        renew_sync_lease()
+        events = client.get_events(
+            event_stream_key=events_key, start=start, limit=CHAIN_PAGE_SIZE
+        )
+        # versions grow along an event stream, the rest of the stream is newer
+        covered = [e for e in events if e.transaction_version <= up_to_version]
+        if not covered:
+            return synced_events
+
+        new_transactions = missing_transactions(
+            client, [event.transaction_version for event in covered], executor
+        )
+        start += len(covered)
+        synced_events += len(covered)
+        save_chain_sync_watermark(
+            events_key, start, covered[-1].transaction_version, new_transactions
+        )
+
+        if len(covered) < CHAIN_PAGE_SIZE:
+            return synced_events
+
 
 def sync_required(onchain_account, up_to_version):
     onchain_balance = get_onchain_balance(onchain_account)
@@ -67,66 +232,113 @@ def get_onchain_balance(account):
 
 
 def calculate_lrw_balance(up_to_version):
-    db_balance = 0
-    query = Account.query
-    paginator = Paginator(query, PAGE_SIZE)
-
-    for page in paginator:
-        accounts = page.object_list
-
-        for account in accounts:
-            balance = account_service.get_account_balance_by_id(
-                account_id=account.id,
-                up_to_version=up_to_version,
-            ).total.get(CURRENCY)
-
-            logger.info(f"account name {account.name} balance {balance}")
-            db_balance += balance
+    db_balance = account_service.get_wallet_balance(up_to_version).total.get(CURRENCY)
+    logger.info(f"wallet balance up to version {up_to_version} is {db_balance}")
 
     return db_balance
 
 
 def sync(client, onchain_account, up_to_version):
-    # sync incoming transaction
-    incoming_processed_transactions = sync_transactions(
-        onchain_account.received_events_key, client, up_to_version
-    )
-    # sync outgoing transaction
-    outgoing_processed_transactions = sync_transactions(
-        onchain_account.sent_events_key, client, up_to_version
-    )
-    processed_transactions = incoming_processed_transactions.union(
-        outgoing_processed_transactions
-    )
-    remove_redundant(processed_transactions)
+    # an interrupted re-sync resumes from its checkpoints with the version
+    # bound it started with
+    resumed_up_to_version = get_chain_sync_up_to_version()
+    if resumed_up_to_version is not None:
+        logger.info(f"resuming re-sync up to version {resumed_up_to_version}")
+        up_to_version = resumed_up_to_version
+
+    with ThreadPoolExecutor(max_workers=SYNC_CONCURRENCY) as executor:
+        # sync incoming transaction
+        sync_transactions(
+            onchain_account.received_events_key, client, up_to_version, executor
+        )
+        # sync outgoing transaction
+        sync_transactions(
+            onchain_account.sent_events_key, client, up_to_version, executor
+        )
 
+    remove_redundant()
+    clear_chain_sync()
 
-def sync_transactions(events_key, client, up_to_version):
-    start = 0
-    processed_transactions = set()
+
+def sync_transactions(events_key, client, up_to_version, executor):
+    progress = get_chain_sync_progress(events_key)
+    start = progress.next_seq if progress else 0
 
     while True:
+        renew_sync_lease()
         events = client.get_events(
-            event_stream_key=events_key, start=start, limit=PAGE_SIZE
+            event_stream_key=events_key, start=start, limit=CHAIN_PAGE_SIZE
         )
 
         if not events:
-            return processed_transactions
+            return
+
+        versions = [event.transaction_version for event in events]
+        new_transactions = missing_transactions(
+            client,
+            [version for version in versions if version <= up_to_version],
+            executor,
+        )
+
+        start += len(events)
+        save_chain_sync_page(
+            events_key, start, up_to_version, versions, new_transactions
+        )
+        logger.info(
+            f"synced {len(events)} events of {events_key}, "
+            f"added {len(new_transactions)} transactions"
+        )
+
+
+def renew_sync_lease() -> None:
+    # a page saved after the lease expired could race with the next holder,
+    # the synced pages are checkpointed and resumed by the next run
+    if not acquire_lease(SYNC_DB_LEASE, lease_holder(), SYNC_DB_LEASE_SECS):
+        raise SyncLeaseLostError("sync-db lease expired and taken over")
+
 
-        for event in events:
-            blockchain_version = event.transaction_version
+def missing_transactions(client, versions, executor) -> List[Transaction]:
+    """Fetches the wallet transactions of the given versions which are not in
+    the DB yet, without adding them"""
+    existing_versions = get_existing_blockchain_versions(versions)
+    missing_versions = set(versions) - existing_versions
 
-            transactions = client.get_transactions(blockchain_version, 1)
+    new_transactions = []
+    for transaction in fetch_transactions(client, missing_versions, executor):
+        if transaction.transaction.script.type == "peer_to_peer_with_metadata":
+            new_transaction = transaction_from_chain(transaction)
+            if new_transaction is not None:
+                new_transactions.append(new_transaction)
+    return new_transactions
 
-            if transactions:
-                transaction = transactions[0]
 
-                if transaction and transaction.version <= up_to_version:
-                    sync_transaction(transaction)
+def version_windows(versions: Iterable[int]) -> List[Tuple[int, int]]:
+    """Groups sorted versions into (start, limit) ranges for get_transactions"""
+    windows = []
+    for version in sorted(versions):
+        if windows:
+            start, limit = windows[-1]
+            end = start + limit - 1
+            if (
+                version - end <= SYNC_MAX_VERSION_GAP + 1
+                and version - start < CHAIN_PAGE_SIZE
+            ):
+                windows[-1] = (start, version - start + 1)
+                continue
+        windows.append((version, 1))
+    return windows
 
-                processed_transactions.add(transaction.version)
 
-        start += PAGE_SIZE
+def fetch_transactions(client, versions, executor):
+    """Fetches the transactions of the given versions, one window per RPC call"""
+    pages = executor.map(
+        lambda window: client.get_transactions(*window),
+        version_windows(versions),
+    )
+    for page in pages:
+        for transaction in page:
+            if transaction.version in versions:
+                yield transaction
 
 
 def sync_transaction(transaction):
@@ -142,6 +354,12 @@ def sync_transaction(transaction):
 
 
 def add_transaction_to_db(transaction):
+    new_transaction = transaction_from_chain(transaction)
+    if new_transaction is not None:
+        commit_transaction(new_transaction)
+
+
+def transaction_from_chain(transaction) -> Optional[Transaction]:
     receiver_sub_address, sender_sub_address = subaddreses_from_metadata(
         transaction.transaction.script.metadata
     )
@@ -154,6 +372,13 @@ def add_transaction_to_db(transaction):
 
     # outgoing transaction
     if sender_address.lower() == VASP_ADDRESS.lower():
+        submitted = get_submitted_transaction(
+            transaction.transaction.sequence_number, transaction.hash
+        )
+        if submitted is not None:
+            # submitted without waiting and not confirmed yet (see
+            # services/confirmation.py): settled instead of added again
+            return complete_submitted_transaction(submitted, transaction.version)
         sender_sub_address, source_id = handle_outgoing_transaction(sender_sub_address)
     # incoming transaction
     elif receiver_address.lower() == VASP_ADDRESS.lower():
@@ -167,11 +392,12 @@ def add_transaction_to_db(transaction):
 
         return None
 
-    add_transaction(
+    return Transaction(
         amount=transaction.transaction.script.amount,
         currency=transaction.transaction.script.currency,
-        payment_type=TransactionType.EXTERNAL,
+        type=TransactionType.EXTERNAL,
         status=TransactionStatus.COMPLETED,
+        created_timestamp=datetime.utcnow(),
         source_id=source_id,
         source_address=sender_address,
         source_subaddress=sender_sub_address,
@@ -201,24 +427,12 @@ def subaddreses_from_metadata(metadata_hex: str) -> (Optional[str], Optional[str
     return receiver_sub_address, sender_sub_address
 
 
-def remove_redundant(processed_transactions):
-    query = Transaction.query
-    paginator = Paginator(query, PAGE_SIZE)
-
-    for page in paginator:
-        transactions = page.object_list
-
-        for transaction in transactions:
-            if (
-                transaction.type == TransactionType.EXTERNAL
-                and transaction.blockchain_version not in processed_transactions
-            ):
-                logger.info(
-                    f"transaction with blockchain version {transaction.blockchain_version} was not found in "
-                    f"blockchain while synchronization and therefore is been deleted "
-                )
-
-                delete_transaction_by_id(transaction.id)
+def remove_redundant():
+    for transaction in delete_transactions_missing_from_chain_sync():
+        logger.info(
+            f"transaction with blockchain version {transaction.blockchain_version} was not found in "
+            f"blockchain while synchronization and therefore is been deleted "
+        )
 
 
 def handle_outgoing_transaction(sender_sub_address):
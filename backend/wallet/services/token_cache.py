@@ -0,0 +1,317 @@
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Cache of auth token -> (user snapshot, token expiration), so authenticated
+requests do not have to load the token and the user from the DB.
+
+The local tier is a bounded LRU per process. The web app runs several
+processes, so the local tier of the other processes may serve an invalidated
+entry for at most TOKEN_CACHE_LOCAL_TTL seconds. With TOKEN_CACHE_REDIS set, a
+Redis tier is shared by all processes and invalidations are applied to it
+right away.
+
+Every invalidate_user bumps the generation of the user: a snapshot loaded
+from the DB before an invalidation is not put in the cache after it.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import date
+from time import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from wallet.storage import Token, User, db_session
+
+TOKEN_CACHE_ENABLED: bool = os.getenv("TOKEN_CACHE_ENABLED", "1") != "0"
+TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", 10_000))
+TOKEN_CACHE_TTL: float = float(os.getenv("TOKEN_CACHE_TTL", 60))
+TOKEN_CACHE_REDIS: bool = os.getenv("TOKEN_CACHE_REDIS") is not None
+TOKEN_CACHE_LOCAL_TTL: float = float(os.getenv("TOKEN_CACHE_LOCAL_TTL", 2))
+
+REDIS_KEY_PREFIX = "lrw:token-cache"
+
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Read-only copy of the user columns the API views read from self.user"""
+
+    id: int
+    username: str
+    registration_status: str
+    selected_fiat_currency: str
+    selected_language: str
+    is_admin: bool
+    is_blocked: bool
+    first_name: Optional[str]
+    last_name: Optional[str]
+    dob: Optional[date]
+    phone: Optional[str]
+    country: Optional[str]
+    state: Optional[str]
+    city: Optional[str]
+    address_1: Optional[str]
+    address_2: Optional[str]
+    zip: Optional[str]
+    account_id: Optional[int]
+    account: Optional[AccountSnapshot]
+
+    @staticmethod
+    def from_user(user: User) -> "UserSnapshot":
+        account = user.account
+        return UserSnapshot(
+            id=user.id,
+            username=user.username,
+            registration_status=user.registration_status,
+            selected_fiat_currency=user.selected_fiat_currency,
+            selected_language=user.selected_language,
+            is_admin=user.is_admin,
+            is_blocked=user.is_blocked,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            dob=user.dob,
+            phone=user.phone,
+            country=user.country,
+            state=user.state,
+            city=user.city,
+            address_1=user.address_1,
+            address_2=user.address_2,
+            zip=user.zip,
+            account_id=user.account_id,
+            account=AccountSnapshot(id=account.id, name=account.name)
+            if account
+            else None,
+        )
+
+    def to_json(self) -> dict:
+        value = asdict(self)
+        value["dob"] = self.dob.isoformat() if self.dob else None
+        return value
+
+    @staticmethod
+    def from_json(value: dict) -> "UserSnapshot":
+        value = dict(value)
+        if value["dob"] is not None:
+            value["dob"] = date.fromisoformat(value["dob"])
+        if value["account"] is not None:
+            value["account"] = AccountSnapshot(**value["account"])
+        return UserSnapshot(**value)
+
+
+# token id -> (user snapshot, token expiration time, cached until)
+Entry = Tuple[UserSnapshot, float, float]
+
+
+class TokenCache:
+    def __init__(
+        self,
+        size: int = TOKEN_CACHE_SIZE,
+        ttl: float = TOKEN_CACHE_TTL,
+        redis_client: Any = None,
+        local_ttl: float = TOKEN_CACHE_LOCAL_TTL,
+    ) -> None:
+        self.enabled = TOKEN_CACHE_ENABLED
+        self.size = size
+        self.ttl = ttl
+        self.redis = redis_client
+        self.local_ttl = min(ttl, local_ttl)
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token_id: str) -> Optional[Tuple[UserSnapshot, float]]:
+        if not self.enabled:
+            return None
+
+        now = time()
+        with self._lock:
+            entry = self._entries.get(token_id)
+            if entry is not None:
+                if entry[2] > now:
+                    self._entries.move_to_end(token_id)
+                    return entry[0], entry[1]
+                del self._entries[token_id]
+
+        if self.redis is not None:
+            value = self.redis.get(self._redis_token_key(token_id))
+            if value is not None:
+                # JSON, never pickle: a value read from Redis must not run code
+                try:
+                    cached = json.loads(value)
+                    snapshot = UserSnapshot.from_json(cached["user"])
+                    expiration_time = cached["expiration_time"]
+                except (ValueError, KeyError, TypeError):
+                    # an entry of an older format, loaded from the DB again
+                    return None
+                self._put_local(token_id, snapshot, expiration_time, now)
+                return snapshot, expiration_time
+
+        return None
+
+    def generation(self, user_id: int) -> int:
+        """To be read before loading the user, and passed to put"""
+        if self.redis is not None:
+            return int(self.redis.get(self._redis_generation_key(user_id)) or 0)
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(
+        self,
+        token_id: str,
+        snapshot: UserSnapshot,
+        expiration_time: float,
+        generation: Optional[int] = None,
+    ) -> None:
+        """Dropped when the user was invalidated since generation was read"""
+        if not self.enabled:
+            return
+
+        if self.redis is None:
+            self._put_local(token_id, snapshot, expiration_time, time(), generation)
+        elif self._put_redis(token_id, snapshot, expiration_time, generation):
+            self._put_local(token_id, snapshot, expiration_time, time())
+
+    def _put_redis(
+        self,
+        token_id: str,
+        snapshot: UserSnapshot,
+        expiration_time: float,
+        generation: Optional[int],
+    ) -> bool:
+        from redis.exceptions import WatchError
+
+        generation_key = self._redis_generation_key(snapshot.id)
+        with self.redis.pipeline() as pipe:
+            try:
+                if generation is not None:
+                    pipe.watch(generation_key)
+                    if int(pipe.get(generation_key) or 0) != generation:
+                        return False
+                pipe.multi()
+                pipe.set(
+                    self._redis_token_key(token_id),
+                    json.dumps(
+                        {"user": snapshot.to_json(), "expiration_time": expiration_time}
+                    ),
+                    ex=int(self.ttl) or 1,
+                )
+                pipe.sadd(self._redis_user_key(snapshot.id), token_id)
+                pipe.expire(self._redis_user_key(snapshot.id), int(self.ttl) or 1)
+                pipe.execute()
+            except WatchError:
+                # invalidated meanwhile
+                return False
+        return True
+
+    def invalidate(self, token_id: str) -> None:
+        with self._lock:
+            self._entries.pop(token_id, None)
+        if self.redis is not None:
+            self.redis.delete(self._redis_token_key(token_id))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for token_id in [
+                token_id
+                for token_id, entry in self._entries.items()
+                if entry[0].id == user_id
+            ]:
+                del self._entries[token_id]
+
+        if self.redis is not None:
+            # bumped first, so that a put racing with the deletes is dropped
+            self.redis.incr(self._redis_generation_key(user_id))
+            user_key = self._redis_user_key(user_id)
+            token_ids = self.redis.smembers(user_key)
+            self.redis.delete(
+                user_key,
+                *[self._redis_token_key(token_id.decode()) for token_id in token_ids],
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _put_local(
+        self,
+        token_id: str,
+        snapshot: UserSnapshot,
+        expiration_time: float,
+        now: float,
+        generation: Optional[int] = None,
+    ) -> None:
+        with self._lock:
+            if (
+                generation is not None
+                and self._generations.get(snapshot.id, 0) != generation
+            ):
+                return
+            self._entries[token_id] = (
+                snapshot,
+                expiration_time,
+                min(now + self.local_ttl, expiration_time),
+            )
+            self._entries.move_to_end(token_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _redis_token_key(token_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:token:{token_id}"
+
+    @staticmethod
+    def _redis_user_key(user_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}:user:{user_id}"
+
+    @staticmethod
+    def _redis_generation_key(user_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}:generation:{user_id}"
+
+
+def _redis_client():
+    import redis
+    from wallet.config import REDIS_DB, REDIS_HOST, REDIS_PASSWORD, REDIS_PORT
+
+    return redis.StrictRedis(
+        host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD
+    )
+
+
+token_cache = TokenCache(redis_client=_redis_client() if TOKEN_CACHE_REDIS else None)
+
+
+@event.listens_for(db_session, "after_flush")
+def _collect_changed_users(session, flush_context) -> None:
+    # any committed change of a user row (block, password, KYC, account
+    # creation...) or deleted token drops the cached snapshots
+    changed: Set[int] = session.info.setdefault("token_cache_users", set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            changed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+        elif isinstance(obj, Token):
+            token_cache.invalidate(obj.id)
+
+
+@event.listens_for(db_session, "after_commit")
+def _invalidate_changed_users(session) -> None:
+    for user_id in session.info.pop("token_cache_users", ()):
+        token_cache.invalidate_user(user_id)
+
+
+@event.listens_for(db_session, "after_rollback")
+def _forget_changed_users(session) -> None:
+    session.info.pop("token_cache_users", None)
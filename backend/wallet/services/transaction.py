@@ -6,7 +6,7 @@ from typing import Optional
 
 import context
 import wallet.services.offchain.p2p_payment as pc_service
-from diem import diem_types, offchain, identifier, jsonrpc, txnmetadata
+from diem import diem_types, offchain, identifier, jsonrpc, txnmetadata, utils
 from diem_utils.types.currencies import DiemCurrency
 from wallet.services import (
     account as account_service,
@@ -15,6 +15,7 @@ from wallet.services.risk import risk_check
 from wallet.storage import Transaction
 
 from . import INVENTORY_ACCOUNT_NAME
+from .confirmation import wait_for_transaction
 from .log import add_transaction_log
 from .. import services
 from ..logging import log_execution
@@ -520,12 +521,16 @@ def update_transaction(
     status: Optional[TransactionStatus] = None,
     sequence: Optional[int] = None,
     blockchain_tx_version: Optional[int] = None,
+    expiration_timestamp_secs: Optional[int] = None,
+    transaction_hash: Optional[str] = None,
 ) -> None:
     storage.update_transaction(
         transaction_id=transaction_id,
         sequence=sequence,
         status=status,
         blockchain_version=blockchain_tx_version,
+        expiration_timestamp_secs=expiration_timestamp_secs,
+        transaction_hash=transaction_hash,
     )
 
 
@@ -658,73 +663,90 @@ def external_transaction(
 
         async_external_transaction.send(transaction.id)
     else:
-        submit_onchain(transaction_id=transaction.id)
+        txn = submit_onchain(transaction_id=transaction.id)
+        if txn is not None:
+            wait_for_transaction(transaction.id, txn)
 
     return transaction
 
 
-def submit_onchain(transaction_id: str) -> None:
+def submit_onchain(transaction_id: str) -> Optional[diem_types.SignedTransaction]:
+    """
+    Submits the pending transaction on-chain without waiting for its execution,
+    the transaction is completed by the confirmation tracker (see
+    services/confirmation.py)
+    """
+
     transaction = get_transaction(transaction_id)
-    if transaction.status == TransactionStatus.PENDING:
-        try:
-            diem_currency = DiemCurrency[transaction.currency]
-
-            if transaction.type == TransactionType.EXTERNAL:
-                jsonrpc_txn = context.get().p2p_by_general(
-                    currency=diem_currency.value,
-                    amount=transaction.amount,
-                    receiver_vasp_address=transaction.destination_address,
-                    receiver_sub_address=transaction.destination_subaddress,
-                    sender_sub_address=transaction.source_subaddress,
-                )
-
-                update_transaction(
-                    transaction_id=transaction_id,
-                    status=TransactionStatus.COMPLETED,
-                    sequence=jsonrpc_txn.transaction.sequence_number,
-                    blockchain_tx_version=jsonrpc_txn.version,
-                )
-                add_transaction_log(
-                    transaction_id, "On Chain Transfer of General Txn Complete"
-                )
-                log_execution(
-                    "On chain transfer complete "
-                    f"txid: {transaction_id} "
-                    f"v: {jsonrpc_txn.version} "
-                )
-
-            if transaction.type == TransactionType.REFUND:
-                original_txn_version = get_transaction(
-                    transaction.original_txn_id
-                ).blockchain_version
-                jsonrpc_txn = context.get().p2p_by_refund(
-                    currency=diem_currency.value,
-                    amount=transaction.amount,
-                    receiver_vasp_address=transaction.destination_address,
-                    original_txn_version=original_txn_version,
-                )
-                update_transaction(
-                    transaction_id=transaction_id,
-                    status=TransactionStatus.COMPLETED,
-                    sequence=jsonrpc_txn.transaction.sequence_number,
-                    blockchain_tx_version=jsonrpc_txn.version,
-                )
-                add_transaction_log(
-                    transaction_id, "On Chain Transfer of Refund Txn Complete"
-                )
-                log_execution(
-                    "On chain transfer complete "
-                    f"txid: {transaction_id} "
-                    f"v: {jsonrpc_txn.version} "
-                )
-
-        except Exception:
-            logger.exception(f"Error in _async_start_onchain_transfer")
-            add_transaction_log(transaction_id, "On Chain Transfer Failed")
-            log_execution("On Chain Transfer Failed")
-            update_transaction(
-                transaction_id=transaction_id, status=TransactionStatus.CANCELED
+    if (
+        transaction.status != TransactionStatus.PENDING
+        or transaction.sequence is not None
+    ):
+        return None
+
+    def record_submission(txn: diem_types.SignedTransaction) -> None:
+        update_transaction(
+            transaction_id=transaction_id,
+            sequence=int(txn.raw_txn.sequence_number),
+            expiration_timestamp_secs=int(txn.raw_txn.expiration_timestamp_secs),
+            transaction_hash=utils.transaction_hash(txn),
+        )
+
+    try:
+        diem_currency = DiemCurrency[transaction.currency]
+
+        if transaction.type == TransactionType.EXTERNAL:
+            txn = context.get().submit_p2p_by_general(
+                currency=diem_currency.value,
+                amount=transaction.amount,
+                receiver_vasp_address=transaction.destination_address,
+                receiver_sub_address=transaction.destination_subaddress,
+                sender_sub_address=transaction.source_subaddress,
+                before_submit=record_submission,
+            )
+            add_transaction_log(
+                transaction_id, "On Chain Transfer of General Txn Submitted"
+            )
+
+        elif transaction.type == TransactionType.REFUND:
+            original_txn_version = get_transaction(
+                transaction.original_txn_id
+            ).blockchain_version
+            txn = context.get().submit_p2p_by_refund(
+                currency=diem_currency.value,
+                amount=transaction.amount,
+                receiver_vasp_address=transaction.destination_address,
+                original_txn_version=original_txn_version,
+                before_submit=record_submission,
             )
+            add_transaction_log(
+                transaction_id, "On Chain Transfer of Refund Txn Submitted"
+            )
+        else:
+            return None
+
+        log_execution(
+            "On chain transfer submitted "
+            f"txid: {transaction_id} "
+            f"seq: {txn.raw_txn.sequence_number} "
+        )
+        return txn
+
+    except Exception as e:
+        logger.exception(f"Error in _async_start_onchain_transfer")
+        storage.db_session.rollback()
+        if get_transaction(transaction_id).sequence is not None and not isinstance(
+            e, jsonrpc.JsonRpcError
+        ):
+            # may still be executed, the confirmation tracker settles it
+            add_transaction_log(transaction_id, "On Chain Transfer Submit Unknown")
+            return None
+
+        add_transaction_log(transaction_id, "On Chain Transfer Failed")
+        log_execution("On Chain Transfer Failed")
+        update_transaction(
+            transaction_id=transaction_id, status=TransactionStatus.CANCELED
+        )
 
 
 def get_total_balance() -> Balance:
@@ -1,8 +1,6 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
-import hashlib
-import os
 from enum import Enum
 from time import time
 from typing import Optional, List
@@ -22,6 +20,8 @@ from wallet.storage import (
     create_token,
     PaymentMethod,
 )
+from wallet.services.password import password_hasher, PasswordHashingBusyError
+from wallet.services.token_cache import token_cache, UserSnapshot
 from wallet.types import LoginError, UsernameExistsError
 from datetime import datetime, timedelta
 
@@ -54,12 +54,12 @@ def create_new_user(
     if is_admin:
         registration_status = RegistrationStatus.Approved
 
-    password_hash, salt = _generate_password_hash_and_salt(password)
+    password_hash, salt = password_hasher.hash(password)
 
     return add_user(
         username=username,
-        password_hash=bytes.hex(password_hash),
-        salt=bytes.hex(salt),
+        password_hash=password_hash,
+        salt=salt,
         is_admin=is_admin,
         registration_status=registration_status,
         first_name=first_name,
@@ -117,21 +117,33 @@ def authorize(
     if user.is_admin and not ADMIN_LOGIN_ENABLED:
         return LoginError.ADMIN_DISABLED
 
-    if is_correct_password(user, password):
-        return LoginError.SUCCESS
-    else:
+    if not is_correct_password(user, password):
         return LoginError.WRONG_PASSWORD
 
+    if password_hasher.needs_rehash(user.password_hash):
+        _rehash_password(user, password)
+    return LoginError.SUCCESS
+
 
 def is_correct_password(user: User, password: str):
-    password_hash, salt = user.password_hash, user.password_salt
-    given_password_hash, _ = _generate_password_hash_and_salt(password, salt)
-    return password_hash == bytes.hex(given_password_hash)
+    return password_hasher.verify(password, user.password_hash, user.password_salt)
+
+
+def _rehash_password(user: User, password: str) -> None:
+    """Moves a password hashed with former parameters to the current ones"""
+
+    try:
+        password_hash, salt = password_hasher.hash(password)
+    except PasswordHashingBusyError:
+        # rehashed on a later login
+        return
+    update_user_password(user.id, password_hash, salt, clear_reset_token=False)
 
 
 def update_password(user_id, new_password):
-    password_hash, salt = _generate_password_hash_and_salt(new_password)
-    update_user_password(user_id, bytes.hex(password_hash), bytes.hex(salt))
+    password_hash, salt = password_hasher.hash(new_password)
+    update_user_password(user_id, password_hash, salt)
+    token_cache.invalidate_user(user_id)
 
 
 def create_password_reset_token(user: User) -> str:
@@ -157,10 +169,26 @@ def is_valid_token(token_id: str) -> bool:
     """
     Token validity needs to be checked every time and session should be extended with every service call.
     """
+    return get_user_snapshot_by_token(token_id) is not None
+
+
+def get_user_snapshot_by_token(token_id: str) -> Optional[UserSnapshot]:
+    """
+    Returns the user of a valid token, from the token cache when possible.
+    None if the token does not exist or is expired.
+    """
+    cached = token_cache.get(token_id)
+    if cached is not None and time() < cached[1]:
+        return cached[0]
+
     token = get_token(token_id)
-    if token is None:
-        return False
-    return time() < token.expiration_time
+    if token is None or time() >= token.expiration_time:
+        return None
+
+    generation = token_cache.generation(token.user_id)
+    snapshot = UserSnapshot.from_user(get_user(token.user_id))
+    token_cache.put(token_id, snapshot, token.expiration_time, generation)
+    return snapshot
 
 
 def get_user_by_reset_token(reset_token: str) -> User:
@@ -173,6 +201,7 @@ def get_user_by_token(token_id: str) -> User:
 
 
 def revoke_token(token_id: str) -> None:
+    token_cache.invalidate(token_id)
     storage.delete_token(token_id=token_id)
 
 
@@ -182,20 +211,7 @@ def extend_token_expiration(token_id) -> None:
         raise KeyError(token_id)
     new_expiration_time = token.expiration_time + TOKEN_VALID_TIME
     update_token(token_id=token_id, expiration_time=new_expiration_time)
-
-
-def _generate_password_hash_and_salt(
-    password: str, salt: Optional[str] = None
-) -> (str, str):
-    if not salt:
-        salt = os.urandom(32)
-    else:
-        salt = bytes.fromhex(salt)
-    password_hash = hashlib.pbkdf2_hmac(
-        "sha256", password.encode("utf-8"), salt, 100000
-    )
-
-    return password_hash, salt
+    token_cache.invalidate(token_id)
 
 
 def get_users(_filter: UsersFilter = UsersFilter.All):
@@ -220,3 +236,4 @@ def get_user_count():
 def block_user(user_id: int):
     storage.delete_user_tokens(user_id)
     storage.block_user(user_id)
+    token_cache.invalidate_user(user_id)
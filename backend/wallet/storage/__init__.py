@@ -29,7 +29,13 @@ from .account import *
 from .order import *
 from .token import *
 from .transaction import *
+from .account_balance import *
 from .logs import *
 from .funds_pull_pre_approval_command import *
 from .p2p_payment import *
 from .p2m_payment import *
+from .pubsub_progress import *
+from .chain_sync import *
+from .offchain_outbox import *
+from .account_sequence import *
+from .lease import *
@@ -3,7 +3,7 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
-from typing import Optional
+from typing import Dict, Optional
 
 from . import db_session, get_user
 from .models import Account, SubAddress
@@ -32,6 +32,10 @@ def get_account(
     return None
 
 
+def get_account_names() -> Dict[int, str]:
+    return dict(Account.query.with_entities(Account.id, Account.name).all())
+
+
 def get_account_id_from_subaddr(subaddr: str) -> Optional[int]:
     subaddr_record = SubAddress.query.filter_by(address=subaddr).first()
     return subaddr_record.account_id if subaddr_record else None
@@ -0,0 +1,189 @@
+# pyre-ignore-all-errors
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from sqlalchemy import and_, event, inspect
+
+from . import db_session
+from .models import AccountBalance, Transaction
+from ..types import TransactionStatus
+
+BalanceKey = Tuple[int, str]
+
+# transaction columns that affect account balances, in the order
+# expected by balance_deltas
+_BALANCE_COLUMNS = ("amount", "currency", "status", "source_id", "destination_id")
+
+
+@dataclass
+class BalanceDrift:
+    account_id: int
+    currency: str
+    ledger_total: int
+    ledger_frozen: int
+    expected_total: int
+    expected_frozen: int
+
+
+def balance_deltas(
+    amount, currency, status, source_id, destination_id
+) -> List[Tuple[BalanceKey, int, int]]:
+    """(account, currency), total and frozen contribution of a single transaction.
+    Must stay in line with wallet.services.account.calc_account_balance"""
+    currency = getattr(currency, "value", currency)
+    deltas = []
+
+    if destination_id is not None and status == TransactionStatus.COMPLETED:
+        deltas.append(((destination_id, currency), amount, 0))
+
+    if source_id is not None and status != TransactionStatus.CANCELED:
+        frozen = (
+            amount
+            if status in (TransactionStatus.PENDING, TransactionStatus.LOCKED)
+            else 0
+        )
+        deltas.append(((source_id, currency), -amount, frozen))
+
+    return deltas
+
+
+def _accumulate(changes: Dict[BalanceKey, List[int]], values, sign: int) -> None:
+    for key, total, frozen in balance_deltas(*values):
+        changes[key][0] += sign * total
+        changes[key][1] += sign * frozen
+
+
+def _flushed_values(tx: Transaction):
+    return [getattr(tx, column) for column in _BALANCE_COLUMNS]
+
+
+def _previous_values(tx: Transaction):
+    attrs = inspect(tx).attrs
+    values = []
+    for column in _BALANCE_COLUMNS:
+        history = attrs[column].history
+        values.append(history.deleted[0] if history.deleted else getattr(tx, column))
+    return values
+
+
+def _apply_changes(connection, changes: Dict[BalanceKey, List[int]]) -> None:
+    table = AccountBalance.__table__
+    for (account_id, currency), (total, frozen) in changes.items():
+        if total == 0 and frozen == 0:
+            continue
+
+        result = connection.execute(
+            table.update()
+            .where(and_(table.c.account_id == account_id, table.c.currency == currency))
+            .values(total=table.c.total + total, frozen=table.c.frozen + frozen)
+        )
+        if result.rowcount == 0:
+            connection.execute(
+                table.insert().values(
+                    account_id=account_id, currency=currency, total=total, frozen=frozen
+                )
+            )
+
+
+@event.listens_for(db_session, "after_flush")
+def _update_account_balances(session, flush_context) -> None:
+    # runs inside the flushing DB transaction, so the ledger is committed
+    # (or rolled back) together with the transactions that changed it
+    changes: Dict[BalanceKey, List[int]] = defaultdict(lambda: [0, 0])
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            _accumulate(changes, _flushed_values(obj), 1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj):
+            _accumulate(changes, _previous_values(obj), -1)
+            _accumulate(changes, _flushed_values(obj), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            _accumulate(changes, _previous_values(obj), -1)
+
+    if changes:
+        _apply_changes(session.connection(), changes)
+
+
+def is_account_balance_ledger_empty() -> bool:
+    return AccountBalance.query.first() is None
+
+
+def get_account_balance_rows(account_id: int):
+    return (
+        AccountBalance.query.with_entities(
+            AccountBalance.currency, AccountBalance.total, AccountBalance.frozen
+        )
+        .filter_by(account_id=account_id)
+        .all()
+    )
+
+
+def calc_balances_from_history() -> Dict[BalanceKey, List[int]]:
+    balances: Dict[BalanceKey, List[int]] = defaultdict(lambda: [0, 0])
+    query = Transaction.query.with_entities(
+        *[getattr(Transaction, column) for column in _BALANCE_COLUMNS]
+    ).yield_per(1000)
+
+    for row in query:
+        _accumulate(balances, row, 1)
+
+    return balances
+
+
+def reconcile_account_balances(rebuild: bool = True) -> List[BalanceDrift]:
+    """
+    Compare the account balance ledger with the balances folded from the full
+    transaction history, and optionally overwrite the drifted ledger rows.
+    Transactions written while the history is folded are not accounted for,
+    so rebuild is best run when the wallet is idle.
+    """
+    expected = calc_balances_from_history()
+    ledger = {
+        (row.account_id, row.currency): (row.total, row.frozen)
+        for row in AccountBalance.query.with_entities(
+            AccountBalance.account_id,
+            AccountBalance.currency,
+            AccountBalance.total,
+            AccountBalance.frozen,
+        )
+    }
+
+    drifts = []
+    for key in sorted(set(expected) | set(ledger)):
+        expected_total, expected_frozen = expected.get(key, (0, 0))
+        ledger_total, ledger_frozen = ledger.get(key, (0, 0))
+        if (expected_total, expected_frozen) != (ledger_total, ledger_frozen):
+            drifts.append(
+                BalanceDrift(
+                    account_id=key[0],
+                    currency=key[1],
+                    ledger_total=ledger_total,
+                    ledger_frozen=ledger_frozen,
+                    expected_total=expected_total,
+                    expected_frozen=expected_frozen,
+                )
+            )
+
+    if rebuild and drifts:
+        _apply_changes(
+            db_session.connection(),
+            {
+                (drift.account_id, drift.currency): [
+                    drift.expected_total - drift.ledger_total,
+                    drift.expected_frozen - drift.ledger_frozen,
+                ]
+                for drift in drifts
+            },
+        )
+        db_session.commit()
+
+    return drifts
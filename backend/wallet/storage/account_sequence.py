@@ -0,0 +1,118 @@
+# pyre-ignore-all-errors
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Callable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import engine
+from .models import AccountSequence
+
+# Every function runs in a DB transaction of its own, committed right away:
+# a reserved sequence number must not wait for, nor be rolled back with, the
+# caller session.
+
+_table = AccountSequence.__table__
+
+
+def reserve_account_sequence(address: str, chain_sequence: Callable[[], int]) -> int:
+    while True:
+        with engine.begin() as connection:
+            # the update locks the row (the DB on SQLite) until commit
+            updated = connection.execute(
+                update(_table)
+                .where(_table.c.address == address)
+                .values(next_sequence=_table.c.next_sequence + 1)
+            )
+            if updated.rowcount:
+                return (
+                    connection.execute(
+                        select(_table.c.next_sequence).where(
+                            _table.c.address == address
+                        )
+                    ).scalar_one()
+                    - 1
+                )
+
+        seq = chain_sequence()
+        try:
+            with engine.begin() as connection:
+                connection.execute(
+                    _table.insert().values(address=address, next_sequence=seq + 1)
+                )
+            return seq
+        except IntegrityError:
+            # reserved concurrently, take the next one
+            continue
+
+
+def resync_account_sequence(address: str, chain_sequence: int) -> None:
+    _set_account_sequence(
+        address, chain_sequence, _table.c.next_sequence < chain_sequence
+    )
+
+
+def get_account_sequence(address: str) -> Optional[int]:
+    with engine.begin() as connection:
+        return connection.execute(
+            select(_table.c.next_sequence).where(_table.c.address == address)
+        ).scalar_one_or_none()
+
+
+def reset_account_sequence(
+    address: str, sequence: int, observed: Optional[int]
+) -> bool:
+    """Compare-and-set: only while next_sequence is still the observed one"""
+
+    if observed is None:
+        try:
+            with engine.begin() as connection:
+                connection.execute(
+                    _table.insert().values(address=address, next_sequence=sequence)
+                )
+            return True
+        except IntegrityError:
+            return False
+
+    with engine.begin() as connection:
+        updated = connection.execute(
+            update(_table)
+            .where(_table.c.address == address, _table.c.next_sequence == observed)
+            .values(next_sequence=sequence)
+        )
+        return updated.rowcount == 1
+
+
+def release_account_sequence(address: str, sequence: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            update(_table)
+            .where(_table.c.address == address, _table.c.next_sequence == sequence + 1)
+            .values(next_sequence=sequence)
+        )
+
+
+def _set_account_sequence(address: str, sequence: int, *conditions) -> None:
+    with engine.begin() as connection:
+        updated = connection.execute(
+            update(_table)
+            .where(_table.c.address == address, *conditions)
+            .values(next_sequence=sequence)
+        )
+        if (
+            updated.rowcount
+            or connection.execute(
+                select(_table.c.address).where(_table.c.address == address)
+            ).first()
+        ):
+            return
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                _table.insert().values(address=address, next_sequence=sequence)
+            )
+    except IntegrityError:
+        _set_account_sequence(address, sequence, *conditions)
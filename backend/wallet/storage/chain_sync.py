@@ -0,0 +1,138 @@
+# pyre-ignore-all-errors
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import and_, not_, or_, select
+
+from . import db_session
+from .models import (
+    ChainSyncProgress,
+    ChainSyncVersion,
+    ChainSyncWatermark,
+    Transaction,
+    TransactionLog,
+)
+from ..types import TransactionStatus, TransactionType
+
+
+def get_chain_sync_progress(events_key: str) -> Optional[ChainSyncProgress]:
+    return ChainSyncProgress.query.get(events_key)
+
+
+def get_chain_sync_up_to_version() -> Optional[int]:
+    progress = ChainSyncProgress.query.first()
+    return progress.up_to_version if progress else None
+
+
+def get_chain_sync_watermarks() -> Dict[str, ChainSyncWatermark]:
+    return {row.events_key: row for row in ChainSyncWatermark.query.all()}
+
+
+def save_chain_sync_watermark(
+    events_key: str,
+    next_seq: int,
+    version: Optional[int],
+    transactions: List[Transaction],
+) -> None:
+    """Stores the synced transactions together with the watermark that moves
+    past them, in a single DB transaction"""
+    db_session.add_all(transactions)
+    db_session.merge(
+        ChainSyncWatermark(events_key=events_key, next_seq=next_seq, version=version)
+    )
+    db_session.commit()
+
+
+def get_latest_external_version() -> Optional[int]:
+    row = (
+        Transaction.query.with_entities(Transaction.blockchain_version)
+        .filter(
+            Transaction.type == TransactionType.EXTERNAL,
+            Transaction.blockchain_version.isnot(None),
+        )
+        .order_by(Transaction.blockchain_version.desc())
+        .first()
+    )
+    return row.blockchain_version if row else None
+
+
+def get_existing_blockchain_versions(versions: Iterable[int]) -> Set[int]:
+    versions = list(versions)
+    if not versions:
+        return set()
+
+    rows = (
+        Transaction.query.with_entities(Transaction.blockchain_version)
+        .filter(Transaction.blockchain_version.in_(versions))
+        .all()
+    )
+    return {row.blockchain_version for row in rows}
+
+
+def save_chain_sync_page(
+    events_key: str,
+    next_seq: int,
+    up_to_version: int,
+    versions: Iterable[int],
+    transactions: List[Transaction],
+) -> None:
+    """Stores the synced transactions of an events page together with the
+    checkpoint that moves past it, in a single DB transaction"""
+    versions = set(versions)
+    seen = {
+        row.version
+        for row in ChainSyncVersion.query.filter(ChainSyncVersion.version.in_(versions))
+    }
+    if versions - seen:
+        db_session.execute(
+            ChainSyncVersion.__table__.insert(),
+            [{"version": version} for version in versions - seen],
+        )
+
+    db_session.add_all(transactions)
+    db_session.merge(
+        ChainSyncProgress(
+            events_key=events_key, next_seq=next_seq, up_to_version=up_to_version
+        )
+    )
+    db_session.commit()
+
+
+def delete_transactions_missing_from_chain_sync() -> List[Transaction]:
+    """Deletes the external transactions whose version was not seen on chain by
+    the re-sync, including the ones which never got a version, except the
+    submitted ones the confirmation tracker has not settled yet"""
+    seen_versions = select(ChainSyncVersion.version)
+    transactions = Transaction.query.filter(
+        Transaction.type == TransactionType.EXTERNAL,
+        or_(
+            Transaction.blockchain_version.is_(None),
+            Transaction.blockchain_version.not_in(seen_versions),
+        ),
+        not_(
+            and_(
+                Transaction.status == TransactionStatus.PENDING,
+                Transaction.sequence.isnot(None),
+            )
+        ),
+    ).all()
+
+    if transactions:
+        TransactionLog.query.filter(
+            TransactionLog.tx_id.in_([tx.id for tx in transactions])
+        ).delete(synchronize_session=False)
+        for tx in transactions:
+            # deleted through the session so the account balance ledger is updated
+            db_session.delete(tx)
+        db_session.commit()
+
+    return transactions
+
+
+def clear_chain_sync() -> None:
+    ChainSyncProgress.query.delete()
+    ChainSyncVersion.query.delete()
+    db_session.commit()
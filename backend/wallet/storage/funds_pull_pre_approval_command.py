@@ -1,4 +1,6 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, tuple_
 
 from . import db_session, models, datetime
 
@@ -44,14 +46,91 @@ def get_command_by_id_and_role(
     ).first()
 
 
+def get_accounts_and_commands_by_subaddresses(
+    funds_pull_pre_approval_id: str, subaddresses: List[str]
+) -> Dict[str, Tuple[int, Optional[models.FundsPullPreApprovalCommand]]]:
+    """
+    The account of each subaddress and its command with the given id, if any,
+    in a single query
+    """
+
+    if not subaddresses:
+        return {}
+
+    Command = models.FundsPullPreApprovalCommand
+    rows = (
+        db_session.query(
+            models.SubAddress.address, models.SubAddress.account_id, Command
+        )
+        .outerjoin(
+            Command,
+            and_(
+                Command.account_id == models.SubAddress.account_id,
+                Command.funds_pull_pre_approval_id == funds_pull_pre_approval_id,
+            ),
+        )
+        .filter(models.SubAddress.address.in_(subaddresses))
+        .all()
+    )
+    return {address: (account_id, command) for address, account_id, command in rows}
+
+
+def get_unsent_commands(
+    keys: Iterable[Tuple[int, str]],
+) -> List[models.FundsPullPreApprovalCommand]:
+    """The commands of the given (account id, pre-approval id) keys not sent yet"""
+
+    keys = list(keys)
+    if not keys:
+        return []
+
+    Command = models.FundsPullPreApprovalCommand
+    return (
+        Command.query.filter_by(offchain_sent=False)
+        .filter(
+            tuple_(Command.account_id, Command.funds_pull_pre_approval_id).in_(keys)
+        )
+        .all()
+    )
+
+
+def mark_commands_sent(commands: Iterable[models.FundsPullPreApprovalCommand]) -> int:
+    """
+    Marks the sent commands with a single UPDATE. A command whose status
+    changed after it was read is left unsent, its new status is sent next.
+    Returns the number of marked commands.
+    """
+
+    keys = [(c.account_id, c.funds_pull_pre_approval_id, c.status) for c in commands]
+    if not keys:
+        return 0
+
+    Command = models.FundsPullPreApprovalCommand
+    count = Command.query.filter(
+        tuple_(
+            Command.account_id, Command.funds_pull_pre_approval_id, Command.status
+        ).in_(keys)
+    ).update(
+        {Command.offchain_sent: True, Command.updated_at: datetime.utcnow()},
+        synchronize_session=False,
+    )
+    db_session.commit()
+    return count
+
+
 class FundsPullPreApprovalCommandNotFound(Exception):
     ...
 
 
-def update_command(command: models.FundsPullPreApprovalCommand, approved_at=None):
-    command_in_db = get_account_command_by_id(
-        command.account_id, command.funds_pull_pre_approval_id
-    )
+def update_command(
+    command: models.FundsPullPreApprovalCommand,
+    approved_at=None,
+    command_in_db: Optional[models.FundsPullPreApprovalCommand] = None,
+):
+    if command_in_db is None:
+        command_in_db = get_account_command_by_id(
+            command.account_id, command.funds_pull_pre_approval_id
+        )
 
     if command_in_db:
         if approved_at:
@@ -0,0 +1,62 @@
+# pyre-ignore-all-errors
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import socket
+import time
+import uuid
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from . import engine
+from .models import Lease
+
+# Runs in a DB transaction of its own, like storage/account_sequence.py: a
+# lease must not wait for, nor be rolled back with, the caller session.
+
+_table = Lease.__table__
+_PROCESS_ID = uuid.uuid4().hex
+
+
+def lease_holder() -> str:
+    """This process' holder id; a forked process is another holder"""
+    return f"{socket.gethostname()}:{os.getpid()}:{_PROCESS_ID}"
+
+
+def acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    """
+    Takes or renews the lease for ttl seconds. Returns False when another
+    holder has it and it did not expire.
+    """
+
+    now = time.time()
+    with engine.begin() as connection:
+        updated = connection.execute(
+            update(_table)
+            .where(
+                _table.c.name == name,
+                or_(_table.c.holder == holder, _table.c.expires_at < now),
+            )
+            .values(holder=holder, expires_at=now + ttl)
+        )
+        if updated.rowcount:
+            return True
+
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                _table.insert().values(name=name, holder=holder, expires_at=now + ttl)
+            )
+        return True
+    except IntegrityError:
+        return False
+
+
+def release_lease(name: str, holder: str) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            _table.delete().where(_table.c.name == name, _table.c.holder == holder)
+        )
@@ -4,17 +4,44 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from datetime import datetime
-from . import db_session
+from typing import List, Optional, Sequence, Tuple
+
+from . import engine
 from .models import ExecutionLog
 
+EXECUTION_LOGS_PAGE_SIZE = 100
+EXECUTION_LOGS_MAX_PAGE_SIZE = 1000
+
 
 # logs to both database and stdout
 def add_execution_log(message) -> None:
-    # get the previous frame in the stack
-    log = ExecutionLog(log=message, timestamp=datetime.utcnow())
-    db_session.add(log)
-    db_session.commit()
+    add_execution_logs([(message, datetime.utcnow())])
+
+
+def add_execution_logs(records: Sequence[Tuple[str, datetime]]) -> None:
+    """
+    Bulk insert of (message, timestamp) records, on a connection of its own so
+    the caller DB session transaction is neither committed nor blocked
+    """
+    with engine.begin() as connection:
+        connection.execute(
+            ExecutionLog.__table__.insert(),
+            [
+                {"log": message, "timestamp": timestamp}
+                for message, timestamp in records
+            ],
+        )
 
 
-def get_execution_logs():
-    return [log for log in ExecutionLog.query.all()]
+def get_execution_logs(
+    limit: int = EXECUTION_LOGS_PAGE_SIZE, before_id: Optional[int] = None
+) -> List[ExecutionLog]:
+    """
+    Newest first; before_id is the id of the last log of the previous page.
+    limit is clamped to 1..EXECUTION_LOGS_MAX_PAGE_SIZE.
+    """
+    limit = max(1, min(limit, EXECUTION_LOGS_MAX_PAGE_SIZE))
+    query = ExecutionLog.query
+    if before_id is not None:
+        query = query.filter(ExecutionLog.id < before_id)
+    return query.order_by(ExecutionLog.id.desc()).limit(limit).all()
@@ -15,6 +15,7 @@ from sqlalchemy import (
     ForeignKey,
     BigInteger,
     Float,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from . import Base
@@ -99,6 +100,12 @@ class Transaction(Base):
     original_txn_id = Column(String, nullable=True)
     refund_reason = Column(String, nullable=True)
     sequence = Column(Integer, nullable=True)
+    # on-chain expiration of the submitted transaction, unix seconds
+    expiration_timestamp_secs = Column(BigInteger, nullable=True)
+    # times the transaction was submitted again after it expired
+    resubmit_count = Column(Integer, nullable=False, default=0)
+    # hash of the signed transaction submitted on-chain, hex
+    transaction_hash = Column(String, nullable=True)
     logs = relationship("TransactionLog", backref="tx", lazy=True)
     source_account = relationship(
         "Account", backref="sent_transactions", foreign_keys=[source_id]
@@ -114,6 +121,91 @@ class Transaction(Base):
         index=True,
     )
 
+    # account transaction listing walks these in created_timestamp order
+    __table_args__ = (
+        Index("ix_transaction_source_created", "source_id", "created_timestamp"),
+        Index(
+            "ix_transaction_destination_created", "destination_id", "created_timestamp"
+        ),
+    )
+
+
+# Materialized running balance per account and currency, maintained on every flush
+# of the transaction table (see storage/account_balance.py)
+class AccountBalance(Base):
+    __tablename__ = "account_balance"
+
+    account_id = Column(Integer, ForeignKey("account.id"), primary_key=True)
+    currency = Column(String, primary_key=True)
+    total = Column(BigInteger, nullable=False, default=0)
+    frozen = Column(BigInteger, nullable=False, default=0)
+
+
+# Last synced event sequence number per event key, one of the pubsub client
+# progress backends (see pubsub/progress.py)
+class PubSubProgress(Base):
+    __tablename__ = "pubsub_progress"
+
+    events_key = Column(String, primary_key=True)
+    seq = Column(BigInteger, nullable=False)
+
+
+# Next sequence number to use for the transactions sent from an on-chain account,
+# shared by the wallet processes (see storage/account_sequence.py)
+class AccountSequence(Base):
+    __tablename__ = "account_sequence"
+
+    address = Column(String, primary_key=True)
+    next_sequence = Column(BigInteger, nullable=False)
+
+
+# Background task run by a single wallet process at a time: the holder renews
+# the lease before it expires (see storage/lease.py)
+class Lease(Base):
+    __tablename__ = "lease"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(Float, nullable=False)
+
+
+# Checkpoint of an in-progress chain re-sync (see services/system.py): the next
+# event to fetch per event key and the version bound the re-sync started with
+class ChainSyncProgress(Base):
+    __tablename__ = "chain_sync_progress"
+
+    events_key = Column(String, primary_key=True)
+    next_seq = Column(BigInteger, nullable=False)
+    up_to_version = Column(BigInteger, nullable=False)
+
+
+# Versions of the wallet events seen on chain by an in-progress re-sync
+class ChainSyncVersion(Base):
+    __tablename__ = "chain_sync_version"
+
+    version = Column(BigInteger, primary_key=True)
+
+
+# High-water mark of the incremental sync-db run per event key: the next event
+# to fetch and the version of the last event synced
+class ChainSyncWatermark(Base):
+    __tablename__ = "chain_sync_watermark"
+
+    events_key = Column(String, primary_key=True)
+    next_seq = Column(BigInteger, nullable=False)
+    version = Column(BigInteger, nullable=True)
+
+
+# Outbox of offchain commands whose state changed and may need processing,
+# filled on flush (see storage/offchain_outbox.py)
+class OffchainTask(Base):
+    __tablename__ = "offchain_task"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    enqueued_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
 
 class PaymentCommand(Base):
     __tablename__ = "paymentcommand"
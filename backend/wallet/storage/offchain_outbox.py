@@ -0,0 +1,113 @@
+# pyre-ignore-all-errors
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import event, inspect
+
+from . import db_session
+from .models import FundsPullPreApprovalCommand, OffchainTask, PaymentCommand
+from ..types import TransactionStatus
+
+PAYMENT_TASK = "payment"
+FUNDS_PULL_PRE_APPROVAL_TASK = "fppa"
+
+# payment command statuses the offchain worker acts on
+ACTIONABLE_PAYMENT_STATUSES = (
+    TransactionStatus.OFF_CHAIN_OUTBOUND,
+    TransactionStatus.OFF_CHAIN_INBOUND,
+    TransactionStatus.OFF_CHAIN_READY,
+    TransactionStatus.OFF_CHAIN_RECEIVER_OUTBOUND,
+)
+
+# set on commit of new offchain tasks, wakes up the worker of this process
+offchain_tasks_committed = threading.Event()
+
+
+def funds_pull_pre_approval_task_key(account_id, funds_pull_pre_approval_id) -> str:
+    return f"{account_id}:{funds_pull_pre_approval_id}"
+
+
+def _changed(obj, column: str) -> bool:
+    return inspect(obj).attrs[column].history.has_changes()
+
+
+@event.listens_for(db_session, "after_flush")
+def _enqueue_offchain_tasks(session, flush_context) -> None:
+    # inserted in the flushing DB transaction, so a task exists if and only if
+    # the state change that caused it is committed
+    tasks = []
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, PaymentCommand):
+            if obj.status in ACTIONABLE_PAYMENT_STATUSES and (
+                obj in session.new or _changed(obj, "status")
+            ):
+                tasks.append((PAYMENT_TASK, obj.reference_id))
+        elif isinstance(obj, FundsPullPreApprovalCommand):
+            if not obj.offchain_sent and (
+                obj in session.new or session.is_modified(obj)
+            ):
+                tasks.append(
+                    (
+                        FUNDS_PULL_PRE_APPROVAL_TASK,
+                        funds_pull_pre_approval_task_key(
+                            obj.account_id, obj.funds_pull_pre_approval_id
+                        ),
+                    )
+                )
+
+    if tasks:
+        now = datetime.utcnow()
+        session.connection().execute(
+            OffchainTask.__table__.insert(),
+            [{"kind": kind, "key": key, "enqueued_at": now} for kind, key in tasks],
+        )
+        session.info["offchain_tasks_enqueued"] = True
+
+
+@event.listens_for(db_session, "after_commit")
+def _notify_offchain_tasks(session) -> None:
+    if session.info.pop("offchain_tasks_enqueued", False):
+        offchain_tasks_committed.set()
+
+
+@event.listens_for(db_session, "after_rollback")
+def _forget_offchain_tasks(session) -> None:
+    session.info.pop("offchain_tasks_enqueued", None)
+
+
+def claim_offchain_tasks(limit: int = 100) -> List[Tuple[str, str]]:
+    """
+    Removes and returns up to limit (kind, key) tasks, oldest first and without
+    duplicates. Rows locked by a concurrent claim are skipped, so several
+    workers can consume the outbox. A task is claimed before it is processed;
+    the ones lost in a crash are left to the periodic sweep.
+    """
+    try:
+        rows = (
+            OffchainTask.query.with_entities(
+                OffchainTask.id, OffchainTask.kind, OffchainTask.key
+            )
+            .order_by(OffchainTask.id)
+            .with_for_update(skip_locked=True)
+            .limit(limit)
+            .all()
+        )
+        if rows:
+            OffchainTask.query.filter(
+                OffchainTask.id.in_([row.id for row in rows])
+            ).delete(synchronize_session=False)
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+
+    return list(dict.fromkeys((row.kind, row.key) for row in rows))
+
+
+def count_offchain_tasks() -> int:
+    return OffchainTask.query.count()
@@ -0,0 +1,31 @@
+# pyre-ignore-all-errors
+
+# Copyright (c) The Diem Core Contributors
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Dict
+
+from . import db_session
+from .models import PubSubProgress
+
+
+def get_pubsub_progress() -> Dict[str, int]:
+    return {row.events_key: row.seq for row in PubSubProgress.query.all()}
+
+
+def save_pubsub_progress(state: Dict[str, int]) -> None:
+    # all keys are written in a single DB transaction
+    table = PubSubProgress.__table__
+    try:
+        for events_key, seq in state.items():
+            result = db_session.execute(
+                table.update().where(table.c.events_key == events_key).values(seq=seq)
+            )
+            if result.rowcount == 0:
+                db_session.execute(
+                    table.insert().values(events_key=events_key, seq=seq)
+                )
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
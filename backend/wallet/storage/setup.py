@@ -3,8 +3,42 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
-from wallet.storage import Base, engine
+import logging
+import os
+
+from wallet.storage import Base, Transaction, engine
+from wallet.storage.account_balance import (
+    is_account_balance_ledger_empty,
+    reconcile_account_balances,
+)
+from wallet.storage.lease import acquire_lease, lease_holder
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_BALANCE_BACKFILL_LEASE_SECS: float = float(
+    os.getenv("ACCOUNT_BALANCE_BACKFILL_LEASE_SECS", 600)
+)
+
+BACKFILL_LEASE = "account-balance-backfill"
 
 
 def setup_wallet_storage():
     Base.metadata.create_all(bind=engine)
+    backfill_account_balances()
+
+
+def backfill_account_balances() -> None:
+    """
+    Databases created before the account balance ledger have transactions but
+    no ledger rows, fold their history into the ledger once. The lease keeps
+    the web app processes starting together from folding it twice.
+    """
+    if not is_account_balance_ledger_empty() or Transaction.query.first() is None:
+        return
+    if not acquire_lease(
+        BACKFILL_LEASE, lease_holder(), ACCOUNT_BALANCE_BACKFILL_LEASE_SECS
+    ):
+        return
+    # a no-op when another process backfilled the ledger meanwhile
+    drifts = reconcile_account_balances()
+    logger.info(f"backfilled {len(drifts)} account balances")
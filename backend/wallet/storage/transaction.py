@@ -3,15 +3,16 @@
 # Copyright (c) The Diem Core Contributors
 # SPDX-License-Identifier: Apache-2.0
 
+import heapq
 from datetime import datetime
-from typing import Optional, List, Callable
+from typing import Any, Optional, List, Callable, Mapping, Sequence, Tuple
 
 from diem_utils.types.currencies import DiemCurrency
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, literal, select, union_all, update
 
 from . import db_session, get_user
 from .models import Transaction, TransactionLog
-from ..types import TransactionStatus, TransactionType
+from ..types import TransactionStatus, TransactionType, TransactionDirection
 
 
 def add_transaction(
@@ -59,17 +60,130 @@ def update_transaction(
     status: Optional[TransactionStatus] = None,
     blockchain_version: Optional[int] = None,
     sequence: Optional[int] = None,
+    expiration_timestamp_secs: Optional[int] = None,
+    transaction_hash: Optional[str] = None,
 ) -> None:
     tx = Transaction.query.get(transaction_id)
     if status:
         tx.status = status
     if blockchain_version:
         tx.blockchain_version = blockchain_version
-    if sequence:
+    if sequence is not None:
         tx.sequence = sequence
+    if expiration_timestamp_secs:
+        tx.expiration_timestamp_secs = expiration_timestamp_secs
+    if transaction_hash:
+        tx.transaction_hash = transaction_hash
     commit_transaction(tx)
 
 
+def get_submitted_transactions() -> List[Transaction]:
+    """Pending transactions submitted on-chain, waiting for their execution"""
+    return (
+        Transaction.query.filter(
+            Transaction.status == TransactionStatus.PENDING,
+            Transaction.sequence.isnot(None),
+        )
+        .order_by(Transaction.sequence)
+        .all()
+    )
+
+
+def settle_transactions(
+    completed: Mapping[str, int], canceled: Mapping[str, str]
+) -> None:
+    """
+    Completes (transaction id -> blockchain version) and cancels (transaction
+    id -> log) submitted transactions in a single DB transaction
+    """
+
+    ids = list(completed) + list(canceled)
+    if not ids:
+        return
+
+    now = datetime.utcnow()
+    # the sync-db job may have settled them meanwhile
+    for tx in Transaction.query.filter(
+        Transaction.id.in_(ids), Transaction.status == TransactionStatus.PENDING
+    ):
+        if tx.id in completed:
+            tx.status = TransactionStatus.COMPLETED
+            tx.blockchain_version = completed[tx.id]
+            log = "On Chain Transfer Complete"
+        else:
+            tx.status = TransactionStatus.CANCELED
+            log = canceled[tx.id]
+        tx.logs.append(TransactionLog(log=log, timestamp=now))
+    db_session.commit()
+
+
+def get_submitted_transaction(
+    sequence: int, transaction_hash: Optional[str]
+) -> Optional[Transaction]:
+    """
+    The pending transaction submitted on-chain with the given sequence number
+    and hash; rows submitted before their hash was recorded are matched by
+    sequence number
+    """
+    return Transaction.query.filter(
+        Transaction.status == TransactionStatus.PENDING,
+        Transaction.sequence == sequence,
+        or_(
+            Transaction.transaction_hash == transaction_hash,
+            Transaction.transaction_hash.is_(None),
+        ),
+    ).first()
+
+
+def complete_submitted_transaction(tx: Transaction, version: int) -> Transaction:
+    """Completes a submitted transaction in the session, committed by the caller"""
+    tx.status = TransactionStatus.COMPLETED
+    tx.blockchain_version = version
+    tx.logs.append(
+        TransactionLog(log="On Chain Transfer Complete", timestamp=datetime.utcnow())
+    )
+    return tx
+
+
+def release_expired_transactions(submitted: Mapping[str, int]) -> List[str]:
+    """
+    Clears the sequence number of submitted transactions (transaction id ->
+    the sequence number it was submitted with) that expired without being
+    executed, so they are submitted again. A transaction is claimed only while
+    it is still pending with that sequence number: when several trackers
+    release it, one of them submits it again. Returns the claimed ids.
+    """
+
+    claimed = []
+    for transaction_id, sequence in submitted.items():
+        updated = db_session.execute(
+            update(Transaction)
+            .where(
+                Transaction.id == transaction_id,
+                Transaction.sequence == sequence,
+                Transaction.status == TransactionStatus.PENDING,
+            )
+            .values(
+                sequence=None,
+                expiration_timestamp_secs=None,
+                transaction_hash=None,
+                resubmit_count=Transaction.resubmit_count + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount:
+            claimed.append(transaction_id)
+            db_session.add(
+                TransactionLog(
+                    tx_id=transaction_id,
+                    log="On Chain Transfer Expired, resubmit",
+                    timestamp=datetime.utcnow(),
+                )
+            )
+    db_session.commit()
+    return claimed
+
+
 def commit_transaction(txn: Transaction) -> Transaction:
     db_session.add(txn)
     db_session.commit()
@@ -78,7 +192,10 @@ def commit_transaction(txn: Transaction) -> Transaction:
 
 def delete_transaction_by_id(transaction_id: int) -> None:
     TransactionLog.query.filter_by(tx_id=transaction_id).delete()
-    Transaction.query.filter_by(id=transaction_id).delete()
+    tx = Transaction.query.get(transaction_id)
+    if tx is not None:
+        # deleted through the session so the account balance ledger is updated
+        db_session.delete(tx)
     db_session.commit()
 
 
@@ -138,6 +255,75 @@ def get_account_transactions(
     return query.order_by(Transaction.id.desc()).all()
 
 
+def get_sorted_account_transactions(
+    account_id: int,
+    sort_key=Transaction.created_timestamp,
+    descending: bool = True,
+    currency: Optional[DiemCurrency] = None,
+    direction: Optional[TransactionDirection] = None,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[Any, str]] = None,
+    up_to_version=None,
+) -> List[Transaction]:
+    """
+    Account transactions ordered by sort_key (a column or an expression of the
+    transaction columns), with the transaction id as tie breaker.
+    after is the (sort key value, id) of the last row of the previous page.
+
+    Received and sent transactions are queried separately, so each query walks
+    the (destination_id, created_timestamp) / (source_id, created_timestamp)
+    index, and the two pages are merged.
+    """
+    branches = []
+    if direction in (None, TransactionDirection.RECEIVED):
+        branches.append(Transaction.destination_id == account_id)
+    if direction in (None, TransactionDirection.SENT):
+        # transactions to self count as received, like get_transaction_direction
+        branches.append(
+            and_(
+                Transaction.source_id == account_id,
+                or_(
+                    Transaction.destination_id.is_(None),
+                    Transaction.destination_id != account_id,
+                ),
+            )
+        )
+
+    ordering = [sort_key, Transaction.id]
+    pages = []
+    for branch in branches:
+        query = Transaction.query.add_columns(sort_key).filter(branch)
+        if currency:
+            query = query.filter(Transaction.currency == DiemCurrency(currency))
+        if up_to_version:
+            query = query.filter(Transaction.blockchain_version <= up_to_version)
+        if after is not None:
+            after_key, after_id = after
+            if descending:
+                query = query.filter(
+                    or_(
+                        sort_key < after_key,
+                        and_(sort_key == after_key, Transaction.id < after_id),
+                    )
+                )
+            else:
+                query = query.filter(
+                    or_(
+                        sort_key > after_key,
+                        and_(sort_key == after_key, Transaction.id > after_id),
+                    )
+                )
+        query = query.order_by(
+            *[column.desc() if descending else column.asc() for column in ordering]
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        pages.append([(key, tx.id, tx) for tx, key in query])
+
+    merged = heapq.merge(*pages, key=lambda row: (row[0], row[1]), reverse=descending)
+    return [tx for _, _, tx in merged][:limit]
+
+
 def get_account_transaction_ids(account_id: int):
     return [tx.id for tx in get_account_transactions(account_id)]
 
@@ -218,3 +404,34 @@ def get_total_currency_debits():
         )
         .all()
     )
+
+
+def get_balance_totals(up_to_version: Optional[int] = None, by_account: bool = False):
+    """
+    Amounts summed per (currency, status, direction), optionally also per account,
+    in a single statement over the whole transaction table.
+    A transaction between two wallet accounts is counted once in each direction.
+    """
+    selects = []
+    for direction, account_column in (
+        (TransactionDirection.RECEIVED, Transaction.destination_id),
+        (TransactionDirection.SENT, Transaction.source_id),
+    ):
+        columns = [Transaction.currency, Transaction.status]
+        group_by = [Transaction.currency, Transaction.status]
+        if by_account:
+            columns.insert(0, account_column.label("account_id"))
+            group_by.insert(0, account_column)
+
+        stmt = select(
+            *columns,
+            literal(direction.value).label("direction"),
+            func.sum(Transaction.amount).label("amount"),
+        ).where(account_column.isnot(None))
+
+        if up_to_version:
+            stmt = stmt.where(Transaction.blockchain_version <= up_to_version)
+
+        selects.append(stmt.group_by(*group_by))
+
+    return db_session.execute(union_all(*selects)).all()
@@ -84,13 +84,16 @@ def get_user_by_reset_token(token: str) -> Optional[User]:
     return User.query.filter_by(password_reset_token=token).first()
 
 
-def update_user_password(user_id: int, password_hash: str, salt: str) -> None:
+def update_user_password(
+    user_id: int, password_hash: str, salt: str, clear_reset_token: bool = True
+) -> None:
     user = User.query.get(user_id)
     if user is not None:
         user.password_hash = password_hash
         user.password_salt = salt
-        user.password_reset_token_expiration = None
-        user.password_reset_token = None
+        if clear_reset_token:
+            user.password_reset_token_expiration = None
+            user.password_reset_token = None
         db_session.commit()
     else:
         raise Exception("User does not exist!")
@@ -3,21 +3,31 @@
 
 # pyre-strict
 import logging
+import os
 
+import click
 import context
 import time
 import uuid
+from http import HTTPStatus
 from threading import Thread
 from flasgger import Swagger
-from flask import Flask
-from wallet.services.system import sync_db
+from flask import Flask, request
+from wallet.services.system import run_scheduled_sync_db, sync_db
 from werkzeug.middleware.proxy_fix import ProxyFix
-
-from wallet.config import ADMIN_USERNAME
-from wallet.services.fx.fx import update_rates
+from werkzeug.serving import WSGIRequestHandler
+
+from wallet.config import ADMIN_USERNAME, MAX_CONTENT_LENGTH
+from wallet.services import account as account_service
+from wallet.services.fx.fx import run_rate_refresher
+from wallet.services.confirmation import (
+    TRANSACTION_CONFIRMATION_INTERVAL,
+    confirm_submitted_transactions_as_leader,
+)
 from wallet.services.inventory import setup_inventory_account
+from wallet.services.sequence import with_db_sequence_allocator
 from wallet.services.user import create_new_user
-from wallet.services.offchain.offchain import process_offchain_tasks
+from wallet.services.offchain.offchain import run_offchain_worker
 from wallet.storage import db_session
 from wallet.storage.setup import setup_wallet_storage
 from wallet.types import UsernameExistsError
@@ -52,19 +62,14 @@ def _init_admin_user():
 
 
 def _schedule_update_rates() -> None:
-    def run():
-        while True:
-            update_rates()
-            time.sleep(60)
-
-    Thread(target=run, daemon=True).start()
+    Thread(target=run_rate_refresher, daemon=True).start()
 
 
 def _sync_db() -> None:
     def run():
         while True:
             try:
-                sync_db()
+                run_scheduled_sync_db()
             except Exception:
                 logging.getLogger("sync-db").exception("sync db failed")
 
@@ -73,19 +78,40 @@ def _sync_db() -> None:
     Thread(target=run, daemon=True).start()
 
 
-def _offchain_tasks() -> None:
+def _confirm_transactions() -> None:
     def run():
         while True:
             try:
-                process_offchain_tasks()
-                db_session.remove()
+                confirm_submitted_transactions_as_leader()
             except Exception:
-                logging.getLogger("offchain-tasks").exception("process failed")
-            time.sleep(0.5)
+                logging.getLogger("confirm-transactions").exception("confirm failed")
+            finally:
+                db_session.remove()
+            time.sleep(TRANSACTION_CONFIRMATION_INTERVAL)
 
     Thread(target=run, daemon=True).start()
 
 
+def _offchain_tasks() -> None:
+    # a deployment running `flask offchain-worker` next to the web servers
+    # turns this off
+    if os.getenv("OFFCHAIN_WORKER_IN_WEB", "1") == "0":
+        return
+    Thread(target=run_offchain_worker, daemon=True).start()
+
+
+def _drain_request_body(response):
+    # a body rejected as too large is not read at all, the connection is closed
+    if response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE:
+        response.headers["Connection"] = "close"
+        return response
+    # an unread request body would be read as the next request of the connection
+    exhaust = getattr(request.stream, "exhaust", None)
+    if exhaust is not None:
+        exhaust()
+    return response
+
+
 def _create_app() -> Flask:
     app = Flask(__name__)
     # register api endpoints
@@ -105,6 +131,9 @@ def _create_app() -> Flask:
     # pyre-ignore[8]
     app.wsgi_app = ProxyFix(app.wsgi_app, x_prefix=1)
 
+    app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
+    app.after_request(_drain_request_body)
+
     Swagger(app, template=swagger_template)
 
     return app
@@ -113,12 +142,51 @@ def _create_app() -> Flask:
 app: Flask = _create_app()
 
 
+@app.cli.command("reconcile-balances")
+@click.option("--dry-run", is_flag=True, help="Only report drift, keep the ledger")
+def reconcile_balances(dry_run: bool) -> None:
+    """Rebuild the account balance ledger from transaction history."""
+    drifts = account_service.reconcile_account_balances(rebuild=not dry_run)
+    for drift in drifts:
+        click.echo(
+            f"account {drift.account_id} {drift.currency}: "
+            f"ledger total={drift.ledger_total} frozen={drift.ledger_frozen}, "
+            f"history total={drift.expected_total} frozen={drift.expected_frozen}"
+        )
+    click.echo(f"{len(drifts)} drifted balance(s) {'found' if dry_run else 'rebuilt'}")
+
+
+@app.cli.command("sync-db")
+def full_sync_db() -> None:
+    """Reconcile the wallet transactions with the whole on-chain history."""
+    sync_db()
+    click.echo("sync-db done")
+
+
+@app.cli.command("offchain-worker")
+def offchain_worker() -> None:
+    """Process offchain commands as their state changes, until interrupted."""
+    _init_context()
+    run_offchain_worker()
+
+
+def _init_web_server():
+    # keep-alive connections on the development server (`flask run` in
+    # run_web.sh), counterparty VASPs send their offchain commands one after
+    # another on a single connection
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    # the response headers and body are separate writes, without TCP_NODELAY the
+    # body waits for the delayed ACK of the headers on a kept alive connection
+    WSGIRequestHandler.disable_nagle_algorithm = True
+
+
 def _init_context():
-    context.set(context.from_env())
+    context.set(with_db_sequence_allocator(context.from_env()))
 
 
 def init():
     with app.app_context():
+        _init_with_log("web_server", _init_web_server)
         _init_with_log("context", _init_context)
         _init_with_log("storage", setup_wallet_storage)
         _init_with_log("admin_user", _init_admin_user)
@@ -126,6 +194,7 @@ def init():
         _init_with_log("update_rates_thread", _schedule_update_rates)
         _init_with_log("sync-db", _sync_db)
         _init_with_log("offchain-tasks", _offchain_tasks)
+        _init_with_log("confirm-transactions", _confirm_transactions)
     return app
 
 
@@ -5,9 +5,11 @@ from typing import Union
 from flask import (
     Blueprint,
     render_template,
+    request,
 )
 from werkzeug.wrappers import Response
-from wallet.storage import get_execution_logs
+from wallet.logging import execution_log_sink
+from wallet.storage import get_execution_logs, EXECUTION_LOGS_PAGE_SIZE
 
 
 root = Blueprint("root", __name__, url_prefix="/")
@@ -15,5 +17,13 @@ root = Blueprint("root", __name__, url_prefix="/")
 
 @root.route("/execution_logs", methods=["GET"])
 def list_execution_logs() -> Union[str, Response]:
-    logs = get_execution_logs()
-    return render_template("execution_logs.html", logs=logs)
+    limit = request.args.get("limit", EXECUTION_LOGS_PAGE_SIZE, type=int)
+    before = request.args.get("before", type=int)
+    logs = get_execution_logs(limit=limit, before_id=before)
+    return render_template(
+        "execution_logs.html",
+        logs=logs,
+        limit=limit,
+        next_before=logs[-1].id if len(logs) == limit else None,
+        sink=execution_log_sink,
+    )
@@ -6,6 +6,7 @@ from http import HTTPStatus
 from json import JSONDecodeError
 
 from flask import Blueprint, jsonify, make_response, current_app
+from wallet.services.password import PasswordHashingBusyError
 from werkzeug.exceptions import HTTPException
 
 errors = Blueprint("errors", __name__)
@@ -34,3 +35,15 @@ def handle_unexpected_error(error):
     current_app.logger.error(f"error: {error}, exec: {traceback.format_exc()}")
 
     return make_response(jsonify(response), status_code)
+
+
+@errors.app_errorhandler(PasswordHashingBusyError)
+def handle_password_hashing_busy(error):
+    status_code = HTTPStatus.SERVICE_UNAVAILABLE
+    response = {"code": status_code, "error": "Too many requests, try again later"}
+
+    current_app.logger.warning(f"password hashing rejected: {error}")
+
+    response = make_response(jsonify(response), status_code)
+    response.headers["Retry-After"] = "1"
+    return response
@@ -107,6 +107,16 @@ def admin_routes():
         view_func=AdminRoutes.GetWalletTotalBalancesView.as_view("total_balances"),
         methods=["GET"],
     )
+    admin.add_url_rule(
+        rule="/admin/accounts/balances",
+        view_func=AdminRoutes.GetAccountsBalancesView.as_view("accounts_balances"),
+        methods=["GET"],
+    )
+    admin.add_url_rule(
+        rule="/admin/sync-db",
+        view_func=AdminRoutes.GetSyncDbMetricsView.as_view("sync_db_metrics"),
+        methods=["GET"],
+    )
 
 
 def user_routes():
@@ -177,6 +187,11 @@ def offchain_api_routes():
         view_func=OffchainMainRoute.OffchainV2View.as_view("command_response"),
         methods=["POST"],
     )
+    offchain.add_url_rule(
+        rule="/offchain/v2/commands",
+        view_func=OffchainMainRoute.OffchainV2BatchView.as_view("commands_response"),
+        methods=["POST"],
+    )
     # p2p payments end points
     p2p_payments.add_url_rule(
         rule="/offchain/query/payment_command/<reference_id>",
@@ -10,7 +10,7 @@ from flask import request, Blueprint
 import context
 
 from diem import identifier, utils
-from diem_utils.types.currencies import DiemCurrency
+from diem_utils.types.currencies import DiemCurrency, FiatCurrency
 from wallet.services import account as account_service
 from wallet.services import transaction as transaction_service
 from wallet.services.transaction import get_transaction_direction, FundsTransfer
@@ -154,15 +154,22 @@ class AccountRoutes:
                     "fiat_amount_asc",
                 ],
             ),
+            query_str_param(
+                name="cursor",
+                description="next_cursor of the previous page, requires the same filters and sort",
+                required=False,
+            ),
         ]
         responses = {
             HTTPStatus.OK: response_definition(
                 "Account transactions", schema=AccountTransactionsSchema
             ),
+            HTTPStatus.BAD_REQUEST: response_definition("Invalid cursor", schema=Error),
         }
 
         def get(self):
             currency, direction, limit, sort_option = self.get_request_params()
+            cursor = request.args.get("cursor")
 
             user = self.user
 
@@ -171,19 +178,40 @@ class AccountRoutes:
 
             account_name = user.account.name
 
-            transactions = account_service.get_account_transactions(
-                account_name=account_name,
-                currency=currency,
-                direction_filter=direction,
-                limit=limit,
-                sort=sort_option,
-            )
+            try:
+                rates = None
+                if sort_option in account_service.FIAT_SORT_OPTIONS:
+                    # the next pages of a listing use the rates of the first one
+                    if cursor:
+                        rates = account_service.get_cursor_rate_snapshot(
+                            sort_option, cursor
+                        )
+                    rates = rates or account_service.get_fiat_rate_snapshot(
+                        FiatCurrency[user.selected_fiat_currency]
+                    )
+                transactions = account_service.get_account_transactions(
+                    account_name=account_name,
+                    currency=currency,
+                    direction_filter=direction,
+                    limit=limit,
+                    sort=sort_option,
+                    cursor=cursor,
+                    rates=rates,
+                )
+            except ValueError as e:
+                return self.respond_with_error(HTTPStatus.BAD_REQUEST, str(e))
+
             transaction_list = [
                 AccountRoutes.get_transaction_response_object(user.account_id, tx)
                 for tx in transactions
             ]
+            response = {"transaction_list": transaction_list}
+            if limit and len(transactions) == limit:
+                response["next_cursor"] = account_service.transactions_cursor(
+                    user.account_id, sort_option, transactions[-1], rates
+                )
 
-            return {"transaction_list": transaction_list}, HTTPStatus.OK
+            return response, HTTPStatus.OK
 
         @staticmethod
         def get_request_params():
@@ -11,7 +11,9 @@ from flask import Blueprint, request
 from requests import HTTPError
 
 from diem_utils.sdks.liquidity import LpClient
+from wallet.services import account as account_service
 from wallet.services import user as user_service
+from wallet.services.system import get_sync_db_metrics
 from wallet.services.transaction import get_total_balance
 from wallet.types import UsernameExistsError
 from webapp.schemas import (
@@ -22,10 +24,13 @@ from webapp.schemas import (
     Error,
     TotalUsers,
     Balances,
+    AccountsBalances,
+    SyncDbMetrics,
 )
 from .strict_schema_view import (
     StrictSchemaView,
     query_bool_param,
+    query_int_param,
     response_definition,
     url_bool_to_python,
     body_parameter,
@@ -192,6 +197,55 @@ class AdminRoutes:
                 HTTPStatus.OK,
             )
 
+    class GetAccountsBalancesView(AdminView):
+        summary = "Get balances of every wallet account"
+        parameters = [
+            query_int_param(
+                name="up_to_version",
+                description="Only count transactions up to this blockchain version",
+                required=False,
+            ),
+        ]
+        responses = {
+            HTTPStatus.OK: response_definition(
+                "Wallet accounts balances", schema=AccountsBalances
+            )
+        }
+
+        def get(self):
+            up_to_version = request.args.get("up_to_version", default=None, type=int)
+            account_names = account_service.get_account_names()
+            balances = account_service.get_accounts_balances(up_to_version)
+
+            return (
+                {
+                    "accounts": [
+                        {
+                            "account_id": account_id,
+                            "account_name": account_names.get(account_id, ""),
+                            "balances": [
+                                {
+                                    "currency": currency.value,
+                                    "balance": int(balance),
+                                }
+                                for currency, balance in account_balance.total.items()
+                            ],
+                        }
+                        for account_id, account_balance in sorted(balances.items())
+                    ]
+                },
+                HTTPStatus.OK,
+            )
+
+    class GetSyncDbMetricsView(AdminView):
+        summary = "Get the sync-db job watermarks and durations"
+        responses = {
+            HTTPStatus.OK: response_definition("Sync-db metrics", schema=SyncDbMetrics)
+        }
+
+        def get(self):
+            return get_sync_db_metrics(), HTTPStatus.OK
+
     class GetWalletUserCountView(AdminView):
         summary = "Get total wallet user count"
         responses = {
@@ -2,12 +2,13 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import logging
+from http import HTTPStatus
 
 from offchain import (
     X_REQUEST_ID,
     X_REQUEST_SENDER_ADDRESS,
 )
-from flask import Blueprint, request
+from flask import Blueprint, abort, request
 from flask.views import MethodView
 from wallet.services.offchain import (
     offchain as offchain_service,
@@ -41,3 +42,47 @@ class OffchainMainRoute:
             )
 
             return (response, code, {X_REQUEST_ID: x_request_id})
+
+    class OffchainV2BatchView(MethodView):
+        """
+        Commands of a sender as newline separated JWS messages; the response
+        has their JWS responses in the same order, one per line
+        """
+
+        def dispatch_request(self, *args, **kwargs):
+            x_request_id = request.headers.get(X_REQUEST_ID)
+            sender_address = request.headers.get(X_REQUEST_SENDER_ADDRESS)
+            # rejected before the body is read
+            if (
+                request.content_length or 0
+            ) > offchain_service.OFFCHAIN_BATCH_MAX_BYTES:
+                abort(
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    f"at most {offchain_service.OFFCHAIN_BATCH_MAX_BYTES} bytes",
+                )
+            requests_bytes = request.get_data().split()
+
+            logger.info(
+                f"[{sender_address}:{x_request_id}] offchain v2 income batch of "
+                f"{len(requests_bytes)} requests"
+            )
+            if len(requests_bytes) > offchain_service.OFFCHAIN_BATCH_MAX_COMMANDS:
+                abort(
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    f"at most {offchain_service.OFFCHAIN_BATCH_MAX_COMMANDS} commands",
+                )
+
+            responses = offchain_service.process_inbound_commands(
+                sender_address, requests_bytes
+            )
+
+            logger.info(
+                f"[{sender_address}:{x_request_id}] response codes: "
+                f"{[code for code, _ in responses]}"
+            )
+
+            return (
+                b"\n".join(response for _, response in responses),
+                HTTPStatus.OK,
+                {X_REQUEST_ID: x_request_id},
+            )
@@ -65,13 +65,14 @@ class StrictSchemaView(SwaggerView):
     def dispatch_request(self, *args, **kwargs):
         if self.require_authenticated_user:
             token = get_auth_token_from_headers(request.headers)
-            if not user.is_valid_token(token):
+            # a read-only snapshot of the user, served from the token cache
+            the_user = user.get_user_snapshot_by_token(token)
+            if the_user is None:
                 return self.respond_with_error(
                     HTTPStatus.UNAUTHORIZED, "Unauthenticated"
                 )
 
             self._token = token
-            the_user = user.get_user_by_token(token)
             self._user = the_user
 
         if self.require_admin_privileges and not the_user.is_admin:
@@ -41,6 +41,9 @@ class UserRoutes:
             HTTPStatus.CONFLICT: response_definition(
                 "User already exist", schema=Error
             ),
+            HTTPStatus.SERVICE_UNAVAILABLE: response_definition(
+                "Too many sign up requests", schema=Error
+            ),
         }
         require_authenticated_user = False
 
@@ -127,6 +130,9 @@ class UserRoutes:
             HTTPStatus.UNAUTHORIZED: response_definition(
                 "Wrong Password", schema=Error
             ),
+            HTTPStatus.SERVICE_UNAVAILABLE: response_definition(
+                "Too many sign in requests", schema=Error
+            ),
         }
         require_authenticated_user = False
 
@@ -156,6 +156,31 @@ class Balances(Schema):
     balances = fields.List(fields.Nested(Balance), required=True)
 
 
+class AccountBalances(Schema):
+    account_id = fields.Int(required=True)
+    account_name = fields.Str(required=True)
+    balances = fields.List(fields.Nested(Balance), required=True)
+
+
+class AccountsBalances(Schema):
+    accounts = fields.List(fields.Nested(AccountBalances), required=True)
+
+
+class SyncDbWatermark(Schema):
+    events_key = fields.Str(required=True)
+    next_seq = fields.Int(required=True)
+    version = fields.Int(required=True, allow_none=True)
+
+
+class SyncDbMetrics(Schema):
+    last_sync_at = fields.DateTime(required=True, allow_none=True)
+    last_sync_duration_secs = fields.Float(required=True, allow_none=True)
+    last_sync_events = fields.Int(required=True)
+    last_full_sync_at = fields.DateTime(required=True, allow_none=True)
+    last_full_sync_duration_secs = fields.Float(required=True, allow_none=True)
+    watermarks = fields.List(fields.Nested(SyncDbWatermark), required=True)
+
+
 class UserAddress(Schema):
     user_id = fields.Str(required=False, allow_none=True)
     vasp_name = fields.Str(required=False, allow_none=True)
@@ -199,6 +224,7 @@ class CreateTransaction(Schema):
 
 class AccountTransactions(Schema):
     transaction_list = fields.List(fields.Nested(Transaction))
+    next_cursor = fields.Str(required=False)
 
 
 class FullAddress(Schema):